@@ -0,0 +1,64 @@
+'''
+Measures the client-side cost of building regions and transfer requests.
+
+Usage (from the repository root, with pdc_server on the PATH)::
+
+    python benchmarks/bench_requests.py [number of requests]
+
+Prints the time per operation in microseconds, and the peak memory allocated per operation.  Run it before and after a change to compare.
+'''
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pdc
+
+def bench(name, fn, n):
+    fn(min(n, 100)) #warm up
+    start = time.perf_counter()
+    fn(n)
+    elapsed = time.perf_counter() - start
+
+    #tracemalloc slows everything down, so memory is measured in a separate, shorter run
+    m = max(1, n // 100)
+    tracemalloc.start()
+    fn(m)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:<32} {elapsed / n * 1e6:8.2f} us/op  {peak / m:10.1f} B/op peak')
+
+def main(n):
+    cont = pdc.Container('bench_requests_cont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    obj = cont.object_from_array('bench_requests_obj', np.zeros((1024, 1024), dtype=np.float32))
+    tile = np.ones((16, 16), dtype=np.float32)
+    out = np.empty((16, 16), dtype=np.float32)
+
+    def build_regions(n):
+        for i in range(n):
+            pdc.region[i % 64 * 16:i % 64 * 16 + 16, 0:16]
+
+    def region_bounds(n):
+        r = pdc.region[16:32, :]
+        for _ in range(n):
+            r._bounds((1024, 1024))
+
+    def create_requests(n):
+        #requests are created but never started, so this measures only client-side bookkeeping
+        batch = pdc.TransferBatch()
+        for i in range(n):
+            batch.get(obj, pdc.region[i % 64 * 16:i % 64 * 16 + 16, 0:16], out=out)
+
+    def set_and_wait(n):
+        for i in range(n):
+            obj.set_data(tile, pdc.region[i % 64 * 16:i % 64 * 16 + 16, 0:16]).wait()
+
+    bench('build region', build_regions, n)
+    bench('region bounds', region_bounds, n)
+    bench('create transfer request', create_requests, n)
+    bench('set_data + wait (round trip)', set_and_wait, max(1, n // 10))
+    print(f'region pool: {pdc.Region.pool.hits} hits, {pdc.Region.pool.misses} misses')
+
+if __name__ == '__main__':
+    with pdc.ServerContext():
+        pdc.init()
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
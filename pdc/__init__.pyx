@@ -1,5 +1,9 @@
 from pdc.main import uint32, uint64, Type, KVTags, PDCError, init, ready, ServerContext, enable_ctrace, disable_ctrace
-from pdc.object import Object
-from pdc.container import Container, all_local_containers
-from pdc.region import region, Region
-from pdc.query import Query, QueryComponent
\ No newline at end of file
+from pdc.object import Object, BufferPool, bulk_get_tags
+from pdc.container import Container, BulkCreateRequest, all_local_containers
+from pdc.region import region, Region, RegionPool, RegionSet
+from pdc.query import Query, QueryComponent, ObjectStatistics, QueryCache, TagIndex, tag_query
+from pdc.transfer import TransferBatch, TransferExecutor, RegionSetRequest, SelectionRequest, WriteBuffer, as_completed, wait_any
+from pdc.array import ArrayView, compute
+from pdc.cache import BlockCache, CachedRequest
+from pdc import mpi
\ No newline at end of file
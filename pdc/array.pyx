@@ -0,0 +1,184 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+
+from .main import checktype
+from .object import Object
+from .region import Region
+
+class ArrayView:
+    '''
+    | A lazy, numpy-compatible view of an object's data.  Created with :attr:`Object.array`, or by slicing another view.
+    | Slicing a view doesn't read anything: it returns a new view of the selected data.  Integers, slices (including negative and step values), ``...``, and one 1 dimensional array of indices are supported, with the same meaning as for numpy arrays.
+    | The data is read when the view is converted to a numpy array (``np.asarray(view)``), when :func:`compute` is called, or when it is passed to a numpy ufunc.
+    | Use :func:`pdc.compute` to read several views at once, which starts every transfer together and reads identical selections only once.
+
+    Usage::
+
+        view = obj.array[10:20][:, ::2]
+        data = view.compute()
+        total = np.add(obj.array[0], obj.array[1])
+    '''
+
+    def __init__(self, obj:Object, *, _selection:Optional[Tuple[Union[range, npt.NDArray, int], ...]]=None):
+        '''
+        :param Object obj: the object to view
+        '''
+        checktype(obj, 'object', Object)
+        self.obj = obj
+        #for each dimension of the object, a range or array of the selected coordinates, or an int for dimensions indexed away
+        self._selection = tuple(range(d) for d in obj.dims) if _selection is None else _selection
+
+    @property
+    def _axes(self) -> List[int]:
+        #the dimensions of the object that are dimensions of this view
+        return [i for i, s in enumerate(self._selection) if not isinstance(s, int)]
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        '''
+        The shape of the data this view selects
+        '''
+        return tuple(len(self._selection[i]) for i in self._axes)
+
+    @property
+    def ndim(self) -> int:
+        return len(self._axes)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.obj.type.as_numpy_type()
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        if self.ndim == 0:
+            raise TypeError('len() of a 0 dimensional view')
+        return self.shape[0]
+
+    def __getitem__(self, key) -> 'ArrayView':
+        if not isinstance(key, tuple):
+            key = (key,)
+        axes = self._axes
+        ellipses = [i for i, k in enumerate(key) if k is Ellipsis]
+        if len(ellipses) > 1:
+            raise IndexError('an index can only have a single ellipsis')
+        if ellipses:
+            i = ellipses[0]
+            key = key[:i] + (slice(None),) * (len(axes) - len(key) + 1) + key[i + 1:]
+        if len(key) > len(axes):
+            raise IndexError(f'too many indices: the view has {len(axes)} dimensions, but {len(key)} were indexed')
+        if sum(1 for k in key if isinstance(k, (list, np.ndarray))) > 1:
+            raise IndexError('only one index array is supported')
+        #numpy moves the dimension of an index array to the front when it is separated from integer indices by a slice
+        advanced = [i for i, k in enumerate(key) if not isinstance(k, slice)]
+        if any(isinstance(k, (list, np.ndarray)) for k in key) and advanced and advanced[-1] - advanced[0] != len(advanced) - 1:
+            raise IndexError('an index array and integers separated by slices are not supported.  Index in two steps instead')
+
+        selection = list(self._selection)
+        for axis, k in zip(axes, key):
+            s = selection[axis]
+            if isinstance(k, slice):
+                selection[axis] = s[k]
+            elif isinstance(k, (list, np.ndarray)):
+                k = np.asarray(k)
+                if k.ndim != 1 or (len(k) > 0 and k.dtype.kind not in 'ui'):
+                    raise IndexError('index arrays must be 1 dimensional arrays of integers')
+                selection[axis] = np.asarray(s)[k.astype(np.int64)]
+            else:
+                checktype(k, 'index', int, np.integer)
+                selection[axis] = int(s[int(k)])
+        return ArrayView(self.obj, _selection=tuple(selection))
+
+    def _plan(self) -> Tuple[Optional[Region], Tuple[slice, ...]]:
+        '''
+        The region to read, and the index that turns the data read into the data of this view.
+        The region is None if the view is empty.
+        '''
+        slices = []
+        post = []
+        for s in self._selection:
+            if isinstance(s, int):
+                slices.append(slice(s, s + 1))
+                post.append(0)
+            elif len(s) == 0:
+                return None, ()
+            elif isinstance(s, np.ndarray):
+                slices.append(s)
+                post.append(slice(None))
+            elif s.step > 0:
+                slices.append(slice(s[0], s[-1] + 1, s.step))
+                post.append(slice(None))
+            else:
+                #read the same elements in increasing order, then reverse them
+                slices.append(slice(s[-1], s[0] + 1, -s.step))
+                post.append(slice(None, None, -1))
+        return Region(tuple(slices)), tuple(post)
+
+    def compute(self) -> npt.NDArray:
+        '''
+        Read the data of this view.
+
+        :return: A new numpy array
+        '''
+        return compute(self)[0]
+
+    def __array__(self, dtype=None, copy=None):
+        if copy is False:
+            raise ValueError('the data of an array view is read from the server, so it can not be used without copying')
+        data = self.compute()
+        if dtype is not None and data.dtype != dtype:
+            data = data.astype(dtype)
+        return data
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if any(isinstance(x, ArrayView) for x in kwargs.get('out', ())):
+            raise TypeError('array views are read-only, so they can not be used as ufunc outputs')
+        views = [x for x in inputs if isinstance(x, ArrayView)]
+        arrays = dict(zip(map(id, views), compute(*views)))
+        inputs = tuple(arrays[id(x)] if isinstance(x, ArrayView) else x for x in inputs)
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __repr__(self) -> str:
+        return f'ArrayView({self.obj.name!r}, shape={self.shape}, dtype={self.dtype})'
+
+def compute(*views:ArrayView) -> Tuple[npt.NDArray, ...]:
+    '''
+    | Read the data of several array views at once.
+    | Every transfer is started before any is waited on, and views that select the same data of the same object share one transfer.
+
+    :param views: the views to read
+    :return: a numpy array for each view, in order
+    '''
+    for view in views:
+        checktype(view, 'view', ArrayView)
+    plans = [view._plan() for view in views]
+
+    requests:Dict[tuple, object] = {}
+    for view, (region, _) in zip(views, plans):
+        if region is not None:
+            key = (view.obj._id, region)
+            if key not in requests:
+                requests[key] = view.obj.get_data(region)
+
+    results = []
+    used = set()
+    for view, (region, post) in zip(views, plans):
+        if region is None:
+            results.append(np.empty(view.shape, dtype=view.dtype))
+            continue
+        key = (view.obj._id, region)
+        data = np.asarray(requests[key].wait()[post])
+        #views sharing a transfer get their own copy of the data
+        if key in used:
+            data = data.copy()
+        used.add(key)
+        results.append(data)
+    return tuple(results)
@@ -0,0 +1,299 @@
+from typing import List, Optional, Tuple
+from weakref import WeakKeyDictionary
+import itertools
+
+import numpy as np
+import numpy.typing as npt
+
+from .main import checktype, uint64, _write_hooks, _LRUCache
+from .object import Object, BufferPool, _as_array, _check_copy_mode, _region_view
+from .region import Region, RegionSet
+from .region import region as region_
+from .transfer import TransferBatch, RegionSetRequest, _CompoundRequest
+
+_default_block_bytes = 1024 * 1024
+
+def _default_block_shape(dims:Tuple[int, ...], itemsize:int) -> Tuple[int, ...]:
+    #blocks of whole rows (along the first dimension) of about _default_block_bytes each
+    row_bytes = itemsize * int(np.prod(dims[1:], dtype=np.int64))
+    return (max(1, _default_block_bytes // max(1, row_bytes)),) + tuple(dims[1:])
+
+def _block_range(offsets:Tuple[int, ...], sizes:Tuple[int, ...], block_shape:Tuple[int, ...]) -> List[range]:
+    #the indices of the blocks overlapping a box, in each dimension
+    return [range(o // b, (o + s - 1) // b + 1) for o, s, b in zip(offsets, sizes, block_shape)]
+
+def _block_box(index:Tuple[int, ...], block_shape:Tuple[int, ...], dims:Tuple[int, ...]) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    #the offsets and sizes of a block, clipped to the object
+    offsets = tuple(i * b for i, b in zip(index, block_shape))
+    return offsets, tuple(min(b, d - o) for o, b, d in zip(offsets, block_shape, dims))
+
+class BlockCache:
+    '''
+    | A client-side cache of object data, used by :func:`Object.get_data` for objects it is enabled for.
+    | Each object's data is split into blocks of a fixed shape.  Reads that only cover cached blocks are served from memory, and reads that partially hit only fetch the missing blocks.
+    | The least recently used blocks are evicted once the cached blocks hold more than :attr:`max_bytes`.
+    | Setting data in an object through this client discards the cached blocks that overlap the region that was set.
+    | Writes by other clients are not seen, so only enable the cache for objects this client is the only writer of, or call :func:`invalidate`.
+    | There is one block cache, ``pdc.Object.block_cache``.
+
+    Usage::
+
+        pdc.Object.block_cache.enable(coordinates, block_shape=(4096,))
+        x = coordinates.get_data(region[:100]).wait() #reads block 0
+        y = coordinates.get_data(region[50:80]).wait() #served from memory
+    '''
+
+    def __init__(self, max_bytes:int = 256 * 1024 * 1024):
+        self._lru = _LRUCache(max_bytes)
+        self._block_shapes = WeakKeyDictionary()
+        #incremented when an object is written to, so blocks read before the write are not cached
+        self._generations = WeakKeyDictionary()
+        self.bytes_saved = 0
+
+    def enable(self, obj:Object, block_shape:Optional[Tuple[uint64, ...]]=None) -> None:
+        '''
+        Cache reads of obj.
+
+        :param Object obj: the object to cache
+        :param block_shape: The shape of the blocks obj is cached in.  Missing trailing dimensions span the whole object.  Defaults to whole rows, about 1MiB per block.
+        '''
+        checktype(obj, 'object', Object)
+        dims = obj.dims
+        if block_shape is None:
+            block_shape = _default_block_shape(dims, obj.type.as_numpy_type().itemsize)
+        block_shape = tuple(block_shape)
+        if len(block_shape) > len(dims):
+            raise ValueError(f'block shape {block_shape} has more dimensions than the object')
+        for b in block_shape:
+            checktype(b, 'block size', int, np.integer)
+            if b <= 0:
+                raise ValueError('block sizes must be greater than 0')
+        block_shape = tuple(int(b) for b in block_shape) + tuple(dims[len(block_shape):])
+        if self._block_shapes.get(obj) != block_shape:
+            #blocks of another shape, or of a closed object that had the same id
+            self._lru.discard_if(lambda key, value: key[0] == obj._id)
+            self._generations[obj] = self._generations.get(obj, 0) + 1
+        self._block_shapes[obj] = block_shape
+
+    def disable(self, obj:Object) -> None:
+        '''
+        Stop caching reads of obj, and discard its cached blocks.
+        '''
+        self.invalidate(obj)
+        self._block_shapes.pop(obj, None)
+
+    def is_enabled(self, obj:Object) -> bool:
+        return obj in self._block_shapes
+
+    def block_shape(self, obj:Object) -> Optional[Tuple[int, ...]]:
+        '''
+        The shape of the blocks obj is cached in, or None if the cache isn't enabled for obj.
+        '''
+        return self._block_shapes.get(obj)
+
+    def get(self, obj:Object, region:Region=None, *, out=None, copy:str='if_needed', pool:Optional[BufferPool]=None) -> 'CachedRequest':
+        '''
+        Read a region of obj through the cache.  Used by :func:`Object.get_data`, which takes the same arguments.
+
+        :return: a request for the data, which may already be done
+        '''
+        if not self.is_enabled(obj):
+            raise ValueError(f'the block cache is not enabled for {obj.name!r}')
+        return CachedRequest(self, obj, region if region is not None else region_[:], out, copy, pool)
+
+    def invalidate(self, obj:Object, region:Region=None) -> None:
+        '''
+        Discard the cached blocks of obj that overlap region.  If region is None, every block of obj is discarded.
+        '''
+        block_shape = self._block_shapes.get(obj)
+        if block_shape is None:
+            return
+        self._generations[obj] = self._generations.get(obj, 0) + 1
+        if region is None:
+            self._lru.discard_if(lambda key, value: key[0] == obj._id)
+            return
+        offsets, sizes = region._bounds(obj.dims)
+        for index in itertools.product(*_block_range(offsets, sizes, block_shape)):
+            self._lru.pop((obj._id, index))
+
+    def clear(self) -> None:
+        '''
+        Discard every cached block.
+        '''
+        self._lru.clear()
+        for obj in list(self._generations):
+            self._generations[obj] += 1
+
+    @property
+    def max_bytes(self) -> int:
+        '''
+        The maximum total size of the cached blocks, in bytes.  Can be set.
+        '''
+        return self._lru.max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes:int) -> None:
+        checktype(max_bytes, 'max_bytes', int)
+        self._lru.resize(max_bytes)
+
+    @property
+    def nbytes(self) -> int:
+        '''
+        The total size of the cached blocks, in bytes.
+        '''
+        return self._lru.nbytes
+
+    @property
+    def hits(self) -> int:
+        '''
+        The number of blocks read from the cache
+        '''
+        return self._lru.hits
+
+    @property
+    def misses(self) -> int:
+        '''
+        The number of blocks read from the server
+        '''
+        return self._lru.misses
+
+    @property
+    def hit_ratio(self) -> float:
+        '''
+        The fraction of blocks read from the cache, or 0 if nothing has been read.
+        '''
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def evictions(self) -> int:
+        '''
+        The number of blocks evicted to stay under :attr:`max_bytes`
+        '''
+        return self._lru.evictions
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+class CachedRequest(_CompoundRequest):
+    '''
+    | A read through a :class:`BlockCache`.  Returned by :func:`Object.get_data` for objects the cache is enabled for.
+    | The blocks that are not cached are fetched as one batch, and cached when the request is waited on.
+    | It has the same interface as :class:`Object.TransferRequest`.
+    '''
+
+    def __init__(self, cache:BlockCache, obj:Object, region:Region, out, copy:str, pool:Optional[BufferPool]=None):
+        '''
+        __init__(*args)
+        '''
+        _check_copy_mode(copy)
+        self.obj = obj
+        self.type = type(self).RequestType.GET
+        self.cache = cache
+        dtype = obj.type.as_numpy_type()
+        self._dims = obj.dims
+        self._block_shape = cache._block_shapes[obj]
+        self._offsets, self._sizes = region._bounds(self._dims)
+        self._buffer_pool = None
+        self._copy_to = None
+        if out is None and pool is not None:
+            checktype(pool, 'pool', BufferPool)
+            out = pool.acquire(self._sizes, dtype)
+            self._buffer_pool = pool
+        elif out is None:
+            out = np.empty(self._sizes, dtype=dtype)
+        else:
+            out = _as_array(out, dtype, self._sizes)
+            if not out.flags.writeable:
+                raise ValueError('out must be writable')
+            if out.size != np.prod(self._sizes, dtype=np.int64):
+                raise ValueError(f'out has {out.size} elements, but the region has shape {self._sizes}')
+            view = _region_view(out, self._sizes)
+            if view is None and copy == 'never':
+                raise ValueError(f'out must be viewable with the region shape {self._sizes} to get data without copying')
+            if view is None:
+                #filled in C order once the request is done
+                self._copy_to = out
+                out = np.empty(self._sizes, dtype=dtype)
+            else:
+                out = view
+        self._out = out
+        self._generation = cache._generations.get(obj, 0)
+
+        self._missing = []
+        for index in itertools.product(*_block_range(self._offsets, self._sizes, self._block_shape)):
+            block = cache._lru.get((obj._id, index))
+            if block is None:
+                self._missing.append(index)
+            else:
+                cache.bytes_saved += self._copy_block(index, block)
+
+        if self._missing:
+            boxes = [_block_box(index, self._block_shape, self._dims) for index in self._missing]
+            self._request = RegionSetRequest(obj, RegionSet([o for o, _ in boxes], [s for _, s in boxes]), type(self).RequestType.GET, coalesce=True)
+            self._batch = self._request._batch
+        else:
+            self._request = None
+            self._batch = TransferBatch()
+        self._filled = not self._missing
+
+    def _copy_block(self, index:Tuple[int, ...], block:npt.NDArray) -> int:
+        #copy the part of a block inside the region into out, and return its size in bytes
+        block_offsets, block_sizes = _block_box(index, self._block_shape, self._dims)
+        starts = [max(o, bo) for o, bo in zip(self._offsets, block_offsets)]
+        stops = [min(o + s, bo + bs) for o, s, bo, bs in zip(self._offsets, self._sizes, block_offsets, block_sizes)]
+        piece = self._out[tuple(slice(a - o, b - o) for a, b, o in zip(starts, stops, self._offsets))]
+        piece[...] = block[tuple(slice(a - bo, b - bo) for a, b, bo in zip(starts, stops, block_offsets))]
+        return piece.nbytes
+
+    @property
+    def result(self) -> Optional[npt.NDArray]:
+        '''
+        If the request is done, the data of the region.  Otherwise, None.
+        '''
+        if not self.done:
+            return None
+        if not self._filled:
+            cache_blocks = self.cache._generations.get(self.obj, 0) == self._generation and self.cache.block_shape(self.obj) == self._block_shape
+            for index, block in zip(self._missing, self._request.result):
+                self._copy_block(index, block)
+                if cache_blocks:
+                    #blocks of coalesced transfers are views, which would keep the whole transfer alive
+                    if block.base is not None:
+                        block = block.copy()
+                    block.flags.writeable = False
+                    self.cache._lru.put((self.obj._id, index), block, block.nbytes)
+            self._filled = True
+        if self._copy_to is not None:
+            np.copyto(self._copy_to, self._out.reshape(self._copy_to.shape))
+            #the result shares memory with out, like a TransferRequest's
+            view = _region_view(self._copy_to, self._sizes)
+            self._out = self._copy_to if view is None else view
+            self._copy_to = None
+        return self._out
+
+    def release(self) -> None:
+        '''
+        Return the result to the :class:`BufferPool` it was taken from.  See :func:`Object.TransferRequest.release`.
+        '''
+        if self._buffer_pool is None:
+            return
+        self.wait()
+        self._buffer_pool.release(self._out)
+        self._buffer_pool = None
+        self._out = None
+
+    def __enter__(self) -> 'CachedRequest':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+#: The cache used by :func:`Object.get_data` for objects it is enabled for
+Object.block_cache = BlockCache()
+
+def _invalidate_blocks(obj, region):
+    Object.block_cache.invalidate(obj, region)
+
+_write_hooks.append(_invalidate_blocks)
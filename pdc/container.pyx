@@ -1,13 +1,16 @@
 from enum import Enum
-from typing import Iterable, Optional, Sequence, Union
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+from collections import deque
+import os
 from weakref import finalize, WeakValueDictionary
 import numpy as np
 import numpy.typing as npt
 
 from .main import KVTags, checktype, _get_pdcid, PDCError, ctrace, Type
-from pdc.cpdc cimport pdc_lifetime_t, pdc_prop_type_t, pdcid_t, _pdc_cont_info, psize_t, uint64_t, obj_handle, pdc_obj_info, cont_handle, pdc_cont_info, pdc_var_type_t
+from pdc.cpdc cimport perr_t, pdc_lifetime_t, pdc_prop_type_t, pdcid_t, _pdc_cont_info, psize_t, uint64_t, obj_handle, pdc_obj_info, cont_handle, pdc_cont_info, pdc_var_type_t
 from pdc.main cimport malloc_or_memerr
 import pdc
+from .region import region as region_
 cimport pdc.cpdc as cpdc
 from cpython.mem cimport PyMem_Free as free
 from cpython.bytes cimport PyBytes_FromStringAndSize
@@ -31,6 +34,7 @@ cdef void free_info_struct(_pdc_cont_info *info):
 
 class ContainerKVTags(KVTags):
     def __init__(self, cont):
+        super().__init__(cont)
         self.cont = cont
     
     def delete(self, name:bytes):
@@ -45,10 +49,10 @@ class ContainerKVTags(KVTags):
         if cpdc.PDCcont_get_tag(self.cont._id, name, &value_out, &var_type, &size_out) != 0:
             raise PDCError("tag does not exist or could not get tag")
         rtn = PyBytes_FromStringAndSize(<char *> value_out, size_out)
-        return rtn
+        return rtn, <int> var_type
     
-    def set(self, name:bytes, value:bytes):
-        if cpdc.PDCcont_put_tag(self.cont._id, name, <char *> value, pdc_var_type_t.PDC_CHAR, len(value)) != 0:
+    def set(self, name:bytes, value:bytes, var_type:int):
+        if cpdc.PDCcont_put_tag(self.cont._id, name, <char *> value, <pdc_var_type_t> var_type, len(value)) != 0:
             raise PDCError("could not set tag")
 
 def to_c_object_list(objects: Union['pdc.Object', Sequence['pdc.Object']]):
@@ -95,6 +99,7 @@ class Container:
         '''
 
         cdef pdcid_t id, prop_id
+        cdef const char *c_name
         if _id is not None:
             checktype(_id, 'id', int)
             id = _id
@@ -116,7 +121,10 @@ class Container:
                 if rtn != 0:
                     raise PDCError('Failed to set container lifetime')
             
-            id = cpdc.PDCcont_create(name.encode('utf-8'), prop_id)
+            name_bytes = name.encode('utf-8')
+            c_name = name_bytes
+            with nogil:
+                id = cpdc.PDCcont_create(c_name, prop_id)
             ctrace('cont_create', id, name.encode('utf-8'), prop_id)
             if id == 0:
                 raise PDCError('Failed to create container')
@@ -155,7 +163,12 @@ class Container:
         '''
         if name in cls.containers_by_name:
             return cls.containers_by_name[name]
-        cdef pdcid_t id = cpdc.PDCcont_open(name.encode('utf-8'), _get_pdcid())
+        name_bytes = name.encode('utf-8')
+        cdef const char *c_name = name_bytes
+        cdef pdcid_t pdc_id = _get_pdcid()
+        cdef pdcid_t id
+        with nogil:
+            id = cpdc.PDCcont_open(c_name, pdc_id)
         if id == 0:
             raise PDCError('Container not found or failed to open container')
         cont = cls._fromid(id, name=name)
@@ -305,31 +318,187 @@ class Container:
         :param type: If specified, the resulting object will have this type, if all elements of the array fit in this type.
         :param prop: If specified, the app name, time step, and user id will be copied from this properties object to the resulting object's properties.
         '''
-        if type is None:
-            array = np.asanyarray(array)
-        else:
-            array = np.asanyarray(array, dtype=type.as_numpy_type())
-        
-        dtype = array.dtype
-        if not dtype.isnative:
-            array = array.astype(dtype.newbyteorder('='))
-        
+        array = _native_array(array, type)
+        obj = self._object_for(name, array.shape, array.dtype, type, prop)
+        obj.set_data(array).wait()
+        return obj
+    
+    def _properties_for(self, shape:Sequence[int], dtype:np.dtype, type:Optional[Type], prop:Optional['Object.Properties']) -> 'Object.Properties':
+        #the properties of an object to hold an array of the given shape and dtype
         if type is not None:
             obj_type = type
         else:
             obj_type = pdc.Type.from_numpy_type(dtype)
         
         if prop is None:
-            obj_prop = pdc.Object.Properties(type=obj_type, dims=array.shape)
+            return pdc.Object.Properties(type=obj_type, dims=shape)
+        obj_prop = prop.copy()
+        obj_prop.type = obj_type
+        obj_prop.dims = shape
+        return obj_prop
+    
+    def _object_for(self, name:str, shape:Sequence[int], dtype:np.dtype, type:Optional[Type], prop:Optional['Object.Properties']) -> 'Object':
+        #create an object to hold an array of the given shape and dtype
+        return self.create_object(name, self._properties_for(shape, dtype, type, prop))
+    
+    def create_objects(self, names:Iterable[str], properties:Union['Object.Properties', Sequence['Object.Properties']]) -> List['Object']:
+        '''
+        Create several new objects, placed in this container.
+
+        :param names: the names of the objects.  See :func:`create_object`.
+        :param properties: The properties of every object, or a sequence with the properties of each object.  Objects with the same properties can share one Properties.
+        :return: the objects, in order
+        '''
+        names = list(names)
+        if isinstance(properties, pdc.Object.Properties):
+            properties = [properties] * len(names)
+        else:
+            properties = list(properties)
+            if len(properties) != len(names):
+                raise ValueError(f'got {len(properties)} properties for {len(names)} objects')
+        for name, prop in zip(names, properties):
+            checktype(name, 'name', str)
+            checktype(prop, 'properties', pdc.Object.Properties)
+        return [pdc.Object(name, prop, self) for name, prop in zip(names, properties)]
+    
+    def objects_from_arrays(self, arrays:Mapping[str, npt.ArrayLike], type:Optional[Type]=None, prop:Optional['Object.Properties']=None, *, window:int=64) -> 'BulkCreateRequest':
+        '''
+        | Create a new object from each of several arrays, placed in this container.  See :func:`object_from_array`.
+        | Objects of the same shape and type share one Properties.  Each object's data is set as soon as it is created, with at most ``window`` transfers in flight at once.
+        | Call ``wait()`` on the returned request to wait for the remaining transfers and get the objects.
+
+        Usage::
+
+            objects = cont.objects_from_arrays({f'sample{i}': samples[i] for i in range(50000)}).wait()
+
+        :param arrays: a mapping from object names to arrays
+        :param type: See :func:`object_from_array`.
+        :param prop: See :func:`object_from_array`.
+        :param int window: the maximum number of transfers in flight
+        :return: a request, whose result is a dict from each name to its object
+        '''
+        return BulkCreateRequest(self, arrays, type, prop, window)
+    
+    def object_from_file(self, name:str, path:Union[str, os.PathLike], *, dtype:Optional[npt.DTypeLike]=None, shape:Optional[Sequence[int]]=None, offset:int=0, format:Optional[str]=None, type:Optional[Type]=None, prop:Optional['Object.Properties']=None, chunk_shape:Optional[Tuple[int, ...]]=None, prefetch:int=2) -> 'Object':
+        '''
+        | Create a new object, placed in this container, from a .npy or raw binary file, such as one written by :func:`Object.export`.
+        | The file is memory mapped and written chunk by chunk, so it is never loaded into memory at once.
+
+        :param str name: the name of the object.  See :func:`object_from_array`.
+        :param path: the file to read
+        :param dtype: the type of the data in a raw file.  Required for raw files, and ignored for .npy files.
+        :param shape: the shape of the data in a raw file.  Defaults to a 1 dimensional object of the whole file.
+        :param int offset: the number of bytes before the data in a raw file
+        :param str format: ``'npy'`` or ``'raw'``.  See :func:`Object.export`.
+        :param type: If specified, the resulting object will have this type, and the data is converted to it chunk by chunk.
+        :param prop: See :func:`object_from_array`.
+        :param chunk_shape: the maximum shape of each chunk.  See :func:`Object.iter_chunks`.
+        :param int prefetch: the number of chunks to keep in flight.
+        '''
+        #pdc.object imports this module
+        from .object import _default_chunk_shape, _file_format, _in_flight
+        checktype(prefetch, 'prefetch', int)
+        if prefetch < 1:
+            raise ValueError('prefetch must be at least 1')
+        if _file_format(path, format) == 'npy':
+            mapped = np.load(path, mmap_mode='r')
         else:
-            obj_prop = prop.copy()
-            obj_prop.type = obj_type
-            obj_prop.dims = array.shape
+            if dtype is None:
+                raise ValueError('dtype is required for raw files')
+            mapped = np.memmap(path, mode='r', dtype=dtype, offset=offset, shape=None if shape is None else tuple(shape))
         
-        obj = self.create_object(name, obj_prop)
-        obj.set_data(array).wait()
+        dtype = mapped.dtype
+        if not dtype.isnative:
+            dtype = dtype.newbyteorder('=')
+        obj = self._object_for(name, mapped.shape, dtype, type, prop)
+        if chunk_shape is None:
+            chunk_shape = _default_chunk_shape(mapped.shape, dtype.itemsize)
+        
+        def requests():
+            for tile in region_[:].tiles(mapped.shape, chunk_shape):
+                tile_offsets, tile_sizes = tile._bounds(mapped.shape)
+                #set_data copies chunks that aren't C contiguous or of the object's type, one at a time
+                yield tile, obj.set_data(mapped[tuple(slice(o, o + s) for o, s in zip(tile_offsets, tile_sizes))], tile)
+        
+        for _ in _in_flight(requests(), prefetch):
+            pass
         return obj
 
+def _native_array(array:npt.ArrayLike, type:Optional[Type]) -> np.ndarray:
+    if type is None:
+        array = np.asanyarray(array)
+    else:
+        array = np.asanyarray(array, dtype=type.as_numpy_type())
+    
+    dtype = array.dtype
+    if not dtype.isnative:
+        array = array.astype(dtype.newbyteorder('='))
+    return array
+
+class BulkCreateRequest:
+    '''
+    The creation of objects from several arrays, returned by :func:`Container.objects_from_arrays`.
+    Every object has been created, and the transfers that set their data are still running.
+    '''
+
+    def __init__(self, container:Container, arrays:Mapping[str, npt.ArrayLike], type:Optional[Type], prop:Optional['Object.Properties'], window:int):
+        '''
+        __init__(*args)
+        '''
+        checktype(window, 'window', int)
+        if window < 1:
+            raise ValueError('window must be at least 1')
+        if prop is not None:
+            checktype(prop, 'properties', pdc.Object.Properties)
+        #: a dict from each name to its object
+        self.objects = {}
+        self._in_flight = deque()
+        properties = {}
+        try:
+            for name, array in arrays.items():
+                checktype(name, 'name', str)
+                array = _native_array(array, type)
+                key = (array.shape, array.dtype)
+                obj_prop = properties.get(key)
+                if obj_prop is None:
+                    obj_prop = properties[key] = container._properties_for(array.shape, array.dtype, type, prop)
+                obj = pdc.Object(name, obj_prop, container)
+                self.objects[name] = obj
+                if len(self._in_flight) >= window:
+                    self._in_flight.popleft().wait()
+                self._in_flight.append(obj.set_data(array))
+        except BaseException:
+            #closing a transfer request that hasn't finished crashes.  Failures here would hide the original error
+            while self._in_flight:
+                try:
+                    self._in_flight.popleft().wait()
+                except Exception:
+                    pass
+            raise
+    
+    @property
+    def done(self) -> bool:
+        '''
+        Whether every object's data has been set
+        '''
+        while self._in_flight and self._in_flight[0].done:
+            self._in_flight.popleft()
+        return not self._in_flight
+    
+    def wait(self) -> Dict[str, 'Object']:
+        '''
+        Block until every object's data has been set.
+
+        :return: a dict from each name to its object
+        '''
+        while self._in_flight:
+            self._in_flight[0].wait()
+            self._in_flight.popleft()
+        return self.objects
+    
+    def __len__(self) -> int:
+        return len(self.objects)
+
 def all_local_containers() -> Iterable[Container]:
     '''
     Get an iterable of all containers that have been retrieved by the client, and haven't yet been garbage collected.
@@ -60,9 +60,9 @@ cdef extern from "pdc_cont.h":
         pdcid_t  local_id
         uint64_t meta_id
     
-    pdcid_t PDCcont_create(const char *cont_name, pdcid_t cont_create_prop)
+    pdcid_t PDCcont_create(const char *cont_name, pdcid_t cont_create_prop) nogil
     #pdcid_t PDCcont_create_col(const char *cont_name, pdcid_t cont_prop_id)
-    pdcid_t PDCcont_open(const char *cont_name, pdcid_t pdc_id)
+    pdcid_t PDCcont_open(const char *cont_name, pdcid_t pdc_id) nogil
     #pdcid_t PDCcont_open_col(const char *cont_name, pdcid_t pdc_id)
     perr_t PDCcont_close(pdcid_t cont_id)
     perr_t PDCcont_persist(pdcid_t cont_id)
@@ -104,8 +104,8 @@ cdef extern from "pdc_obj.h":
         PDC_READ = 1
         PDC_WRITE = 2
 
-    pdcid_t PDCobj_create(pdcid_t cont_id, const char *obj_name, pdcid_t obj_create_prop)
-    pdcid_t PDCobj_open(const char *obj_name, pdcid_t pdc_id)
+    pdcid_t PDCobj_create(pdcid_t cont_id, const char *obj_name, pdcid_t obj_create_prop) nogil
+    pdcid_t PDCobj_open(const char *obj_name, pdcid_t pdc_id) nogil
     perr_t PDCobj_del(pdcid_t obj_id)
     #pdcid_t PDCobj_open_col(const char *obj_name, pdcid_t pdc_id)
     perr_t PDCobj_close(pdcid_t obj_id)
@@ -197,11 +197,11 @@ cdef extern from "pdc_region.h":
     pdcid_t PDCregion_create(psize_t ndims, uint64_t *offset, uint64_t *size)
     perr_t PDCregion_close(pdcid_t region_id)
     pdcid_t PDCregion_transfer_create(void *buf, pdc_access_t access_type, pdcid_t obj_id, pdcid_t local_reg, pdcid_t remote_reg)
-    perr_t PDCregion_transfer_start(pdcid_t transfer_request_id)
-    #perr_t PDCregion_transfer_start_all(pdcid_t *transfer_request_id, size_t size)
-    perr_t PDCregion_transfer_status(pdcid_t transfer_request_id, pdc_transfer_status_t *completed)
-    perr_t PDCregion_transfer_wait(pdcid_t transfer_request_id)
-    #perr_t PDCregion_transfer_wait_all(pdcid_t *transfer_request_id, size_t size)
+    perr_t PDCregion_transfer_start(pdcid_t transfer_request_id) nogil
+    perr_t PDCregion_transfer_start_all(pdcid_t *transfer_request_id, size_t size) nogil
+    perr_t PDCregion_transfer_status(pdcid_t transfer_request_id, pdc_transfer_status_t *completed) nogil
+    perr_t PDCregion_transfer_wait(pdcid_t transfer_request_id) nogil
+    perr_t PDCregion_transfer_wait_all(pdcid_t *transfer_request_id, size_t size) nogil
     perr_t PDCregion_transfer_close(pdcid_t transfer_request_id)
 
 cdef extern from "pdc_query.h":
@@ -261,11 +261,11 @@ cdef extern from "pdc_query.h":
     pdc_query_t *PDCquery_or(pdc_query_t *query1, pdc_query_t *query2)
     #perr_t PDCobj_prop_query(pdcid_t cont_id, pdc_prop_name_t prop_name, void *prop_value, pdcid_t **out_ids, size_t *n_out)
     perr_t PDCquery_sel_region(pdc_query_t *query, pdc_region_info *obj_region)
-    perr_t PDCquery_get_selection(pdc_query_t *query, pdc_selection_t *sel)
-    perr_t PDCquery_get_nhits(pdc_query_t *query, uint64_t *n)
-    perr_t PDCquery_get_data(pdcid_t obj_id, pdc_selection_t *sel, void *obj_data)
+    perr_t PDCquery_get_selection(pdc_query_t *query, pdc_selection_t *sel) nogil
+    perr_t PDCquery_get_nhits(pdc_query_t *query, uint64_t *n) nogil
+    perr_t PDCquery_get_data(pdcid_t obj_id, pdc_selection_t *sel, void *obj_data) nogil
 
-    perr_t PDCquery_get_sel_data(pdc_query_t *query, pdc_selection_t *sel, void *data)
+    perr_t PDCquery_get_sel_data(pdc_query_t *query, pdc_selection_t *sel, void *data) nogil
     void PDCselection_free(pdc_selection_t *sel)
     void PDCquery_free(pdc_query_t *query)
     void PDCquery_free_all(pdc_query_t *query) #?
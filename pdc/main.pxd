@@ -1 +1,2 @@
-cdef void *malloc_or_memerr(size_t size)
\ No newline at end of file
+cdef void *malloc_or_memerr(size_t size)
+cdef bint _pdc_is_open()
\ No newline at end of file
@@ -1,15 +1,17 @@
 cimport pdc.cpdc as cpdc
 from pdc.cpdc cimport pdc_var_type_t, int64_t, uint64_t, int16_t, int8_t
-from typing import TypeVar, Generic, NewType, Union
+from typing import TypeVar, Generic, NewType, Union, Tuple, Optional, Iterable, Dict, Mapping
 from enum import Enum
 import os
 from cpython.mem cimport PyMem_Malloc as malloc, PyMem_Free as free
 import numpy as np
 from abc import ABC, abstractmethod
-from weakref import finalize
+from weakref import finalize, WeakKeyDictionary
+from collections import OrderedDict
 import shutil
 from subprocess import Popen, PIPE
 import ast
+import struct
 import numpy.typing as npt
 import pickle # this is available in python 3.8+, otherwise you need to pip install pickle
 
@@ -101,6 +103,109 @@ def disable_ctrace():
     global do_ctrace
     do_ctrace = False
 
+class _Backoff:
+    '''
+    Polling delays for transfer requests.
+    The delay starts short, so fast transfers are noticed quickly, and grows geometrically up to a cap so long transfers don't spin.
+    '''
+    def __init__(self, initial:float=1e-5, maximum:float=1e-2, factor:float=2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.delay = initial
+    
+    def next(self) -> float:
+        '''
+        Return the delay to sleep for, and grow the delay for next time.
+        '''
+        delay = self.delay
+        self.delay = min(self.delay * self.factor, self.maximum)
+        return delay
+    
+    def reset(self):
+        self.delay = self.initial
+
+class _LRUCache:
+    '''
+    A mapping that evicts its least recently used entries once the total size of its entries exceeds max_bytes.
+    The size of each entry is given when it is added.
+    '''
+    def __init__(self, max_bytes:int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value, _ = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value, nbytes:int) -> None:
+        self.pop(key)
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        self._evict()
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self.nbytes -= entry[1]
+        return entry[0]
+
+    def discard_if(self, predicate) -> None:
+        '''
+        Remove every entry where predicate(key, value) is true.
+        '''
+        for key in [k for k, (v, _) in self._entries.items() if predicate(k, v)]:
+            self.pop(key)
+
+    def resize(self, max_bytes:int) -> None:
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+#functions called as hook(obj, region) whenever this client issues a SET transfer request.
+#Used to invalidate anything derived from an object's data.
+_write_hooks = []
+
+def _notify_write(obj, region):
+    for hook in _write_hooks:
+        hook(obj, region)
+
+#functions called as hook(obj, name, value, var_type) whenever this client sets a tag of an object, and with value None when it deletes one.
+#Used to keep tag indexes up to date.
+_tag_hooks = []
+
+def _notify_tag(obj, name:bytes, value, var_type):
+    for hook in _tag_hooks:
+        hook(obj, name, value, var_type)
+
 class PDCError(Exception):
     '''
     A general error type that indicates an error from the underlying c pdc api.
@@ -114,6 +219,10 @@ def _get_pdcid() -> pdcid:
     global pdc_id
     return pdc_id
 
+cdef bint _pdc_is_open():
+    #used by __dealloc__ methods, which may run after PDC is closed when the interpreter exits
+    return _is_open
+
 def init(name:str="PDC"):
     '''
     Initialize PDC.
@@ -270,6 +379,11 @@ class Type(Enum):
             raise OverflowError(f'value {value} is not within the acceptable range for {self.name}') from None
     '''
 
+#the cached tags of each object and container the tag cache is enabled for, by encoded name
+_tag_caches = WeakKeyDictionary()
+
+_no_default = object()
+
 class KVTags(ABC):
     '''
     An object used to manipulate object and container tags.
@@ -282,77 +396,217 @@ class KVTags(ABC):
     ``tags[x] = value`` set the value of the tag ``x``
     ``del tags[x]``     delete the tag ``x``
     =================== ==============================
+
+    Use :func:`get_many` and :func:`update` to get or set several tags at once, and :func:`enable_cache` to keep the tags of an object or container in memory.
+
+    Bools, ints, floats, numpy scalars, and strings are stored with their PDC type (``PDC_INT64``, ``PDC_DOUBLE``, ...).
+    Tuples, lists, dicts, bytes, None, and numpy arrays are stored in a compact binary format, with arrays stored as their raw data.
+    Other values are pickled.  Tags set in the older text format can still be read.
     '''
     primitive_types = (bytes, str, int, float, bool, type(None))
-    tag_types = (tuple, list, dict, bytes, str, int, float, bool, type(None))
-    tag_types_union = Union[tuple, list, dict, bytes, str, int, float, bool, type(None)]
+    tag_types = (tuple, list, dict, bytes, str, int, float, bool, type(None), np.ndarray, np.generic)
+    tag_types_union = Union[tuple, list, dict, bytes, str, int, float, bool, type(None), npt.NDArray, np.generic]
+
+    #the numpy type of the values of each numeric PDC type
+    _numeric_tag_types = {
+        pdc_var_type_t.PDC_INT: np.dtype('=i4'),
+        pdc_var_type_t.PDC_INT32: np.dtype('=i4'),
+        pdc_var_type_t.PDC_UINT: np.dtype('=u4'),
+        pdc_var_type_t.PDC_UINT32: np.dtype('=u4'),
+        pdc_var_type_t.PDC_FLOAT: np.dtype('=f4'),
+        pdc_var_type_t.PDC_DOUBLE: np.dtype('=f8'),
+        pdc_var_type_t.PDC_BOOLEAN: np.dtype('?'),
+        pdc_var_type_t.PDC_SHORT: np.dtype('=i2'),
+        pdc_var_type_t.PDC_INT16: np.dtype('=i2'),
+        pdc_var_type_t.PDC_UINT16: np.dtype('=u2'),
+        pdc_var_type_t.PDC_INT64: np.dtype('=i8'),
+        pdc_var_type_t.PDC_LONG: np.dtype('=i8'),
+        pdc_var_type_t.PDC_UINT64: np.dtype('=u8'),
+        pdc_var_type_t.PDC_INT8: np.dtype('=i1'),
+        pdc_var_type_t.PDC_UINT8: np.dtype('=u1'),
+    }
+    #the PDC type numpy scalars of each type are stored as
+    _scalar_tag_types = {
+        np.dtype('=i4'): pdc_var_type_t.PDC_INT32,
+        np.dtype('=u4'): pdc_var_type_t.PDC_UINT32,
+        np.dtype('=f4'): pdc_var_type_t.PDC_FLOAT,
+        np.dtype('=f8'): pdc_var_type_t.PDC_DOUBLE,
+        np.dtype('?'): pdc_var_type_t.PDC_BOOLEAN,
+        np.dtype('=i2'): pdc_var_type_t.PDC_INT16,
+        np.dtype('=u2'): pdc_var_type_t.PDC_UINT16,
+        np.dtype('=i8'): pdc_var_type_t.PDC_INT64,
+        np.dtype('=u8'): pdc_var_type_t.PDC_UINT64,
+        np.dtype('=i1'): pdc_var_type_t.PDC_INT8,
+        np.dtype('=u1'): pdc_var_type_t.PDC_UINT8,
+    }
+    #the start of tags in the binary format, followed by its version.  Tags in the older text format never start with a NUL byte.
+    _binary_tag_magic = b'\x00PT'
+    _binary_tag_version = 1
 
     @classmethod
-    def _encode(cls, obj:tag_types_union) -> bytes:
-        if isinstance(obj, tuple) and not obj:
-            return b'()'
-        try:
-            if isinstance(obj, tuple):
-                if not obj:
-                    return b'()'
-                for i in obj:
-                    if not isinstance(i, cls.primitive_types):
-                        raise ValueError('tuples must contain only strings, ints, floats, bools, bytes, fallback to pickle.dumps() -> bytes')
-                if len(obj) == 1:
-                    return b'(' + cls._encode(obj[0]) + b',)'
-                else:
-                    return b'(' + b','.join([cls._encode(i) for i in obj]) + b')'
-            elif isinstance(obj, list):
-                if not obj:
-                    return b'[]'
-                for i in obj:
-                    if not isinstance(i, cls.primitive_types):
-                        raise ValueError('lists must contain only strings, ints, floats, bools, bytes, fallback to pickle.dumps() -> bytes')
-                if len(obj) == 1:
-                    return b'[' + cls._encode(obj[0]) + b']'
-                else:
-                    return b'[' + b','.join([cls._encode(i) for i in obj]) + b']'
-            elif isinstance(obj, dict):
-                for k, v in obj.items():
-                    if not isinstance(k, str):
-                        raise ValueError('dict keys must be strings')
-                    if not isinstance(v, cls.primitive_types):
-                        raise ValueError('dict values must be strings, ints, floats, bools, bytes, fallback to pickle.dumps() -> bytes')
-                return b'{' + b','.join([cls._encode(k) + b': ' + cls._encode(v) for k, v in obj.items()]) + b'}'
-            elif isinstance(obj, bytes):
-                return obj
-            elif isinstance(obj, str):
-                return repr(obj).encode('utf-8')
-            elif isinstance(obj, int):
-                return str(obj).encode('utf-8')
-            elif isinstance(obj, float):
-                return str(obj).encode('utf-8')
-            elif isinstance(obj, bool):
-                return str(obj).encode('utf-8')
-            elif obj is None:
-                return b'None'
+    def _encode(cls, obj:tag_types_union) -> Tuple[bytes, int]:
+        '''
+        Encode a tag value.
+        Bools, ints, floats, numpy scalars, and strings are stored with their PDC type, so the server can compare them.
+        Everything else is stored as PDC_CHAR in a binary format.
+
+        :return: the encoded value, and its PDC type
+        '''
+        if isinstance(obj, np.generic) and obj.dtype in cls._scalar_tag_types:
+            return obj.tobytes(), cls._scalar_tag_types[obj.dtype]
+        if isinstance(obj, bool):
+            return (b'\x01' if obj else b'\x00'), pdc_var_type_t.PDC_BOOLEAN
+        if isinstance(obj, int) and -2**63 <= obj < 2**63:
+            return struct.pack('=q', obj), pdc_var_type_t.PDC_INT64
+        if isinstance(obj, float):
+            return struct.pack('=d', obj), pdc_var_type_t.PDC_DOUBLE
+        if isinstance(obj, str) and '\x00' not in obj:
+            #NUL terminated, like strings set from C
+            return obj.encode('utf-8') + b'\x00', pdc_var_type_t.PDC_STRING
+        parts = [cls._binary_tag_magic, bytes((cls._binary_tag_version,))]
+        cls._pack(obj, parts)
+        return b''.join(parts), pdc_var_type_t.PDC_CHAR
+
+    @classmethod
+    def _pack(cls, obj, parts:list) -> None:
+        #append the binary encoding of obj to parts: a type code, then the value
+        if isinstance(obj, np.generic) and not isinstance(obj, np.void):
+            obj = obj.item()
+        if obj is None:
+            parts.append(b'N')
+        elif isinstance(obj, bool):
+            parts.append(b'T' if obj else b'F')
+        elif isinstance(obj, int):
+            if -2**63 <= obj < 2**63:
+                parts.append(b'i' + struct.pack('<q', obj))
             else:
-                raise ValueError(f'Unsupported type of tag: {type(obj)}, fallback to pickle.dumps() -> bytes')
-        except ValueError as e:
-            return pickle.dumps(obj)
-    
-    @staticmethod
-    def _decode(data:bytes) -> tag_types_union:
+                data = obj.to_bytes(obj.bit_length() // 8 + 1, 'little', signed=True)
+                parts.append(b'I' + struct.pack('<I', len(data)) + data)
+        elif isinstance(obj, float):
+            parts.append(b'd' + struct.pack('<d', obj))
+        elif isinstance(obj, str):
+            data = obj.encode('utf-8')
+            parts.append(b's' + struct.pack('<I', len(data)) + data)
+        elif isinstance(obj, bytes):
+            parts.append(b'b' + struct.pack('<I', len(obj)) + obj)
+        elif isinstance(obj, (tuple, list)):
+            parts.append((b't' if isinstance(obj, tuple) else b'l') + struct.pack('<I', len(obj)))
+            for item in obj:
+                cls._pack(item, parts)
+        elif isinstance(obj, dict):
+            parts.append(b'm' + struct.pack('<I', len(obj)))
+            for k, v in obj.items():
+                cls._pack(k, parts)
+                cls._pack(v, parts)
+        elif isinstance(obj, np.ndarray) and obj.dtype.kind in 'biufcSU' and obj.dtype.fields is None:
+            #the raw buffer, in C order
+            dtype = obj.dtype.str.encode('ascii')
+            parts.append(b'a' + struct.pack('<B', len(dtype)) + dtype + struct.pack(f'<B{obj.ndim}Q', obj.ndim, *obj.shape))
+            parts.append(np.ascontiguousarray(obj).tobytes())
+        else:
+            data = pickle.dumps(obj)
+            parts.append(b'p' + struct.pack('<I', len(data)) + data)
+
+    @classmethod
+    def _decode(cls, data:bytes, var_type:int=pdc_var_type_t.PDC_CHAR) -> tag_types_union:
+        '''
+        Decode a tag value encoded by :func:`_encode`, or set in the older text format.
+
+        :param bytes data: the encoded value
+        :param int var_type: the PDC type the value was stored with
+        '''
+        if var_type in cls._numeric_tag_types:
+            dtype = cls._numeric_tag_types[var_type]
+            if len(data) % dtype.itemsize != 0:
+                raise ValueError(f'a tag of {len(data)} bytes can not hold values of {dtype.itemsize} bytes')
+            values = np.frombuffer(data, dtype=dtype)
+            return values[0].item() if len(values) == 1 else values.copy()
+        if var_type == pdc_var_type_t.PDC_STRING:
+            return data.rstrip(b'\x00').decode('utf-8')
+        if data.startswith(cls._binary_tag_magic):
+            version = data[len(cls._binary_tag_magic)]
+            if version != cls._binary_tag_version:
+                raise ValueError(f'unknown tag format version: {version}')
+            value, pos = cls._unpack(memoryview(data), len(cls._binary_tag_magic) + 1)
+            if pos != len(data):
+                raise ValueError('tag has trailing data')
+            return value
         # if the data is a pickle, use pickle.loads()
         if data.startswith(b'\x80'):
             return pickle.loads(data)
         # otherwise, try to eval the string
         return ast.literal_eval(data.decode('utf-8'))
-    
+
+    @classmethod
+    def _unpack(cls, data:memoryview, pos:int) -> Tuple[tag_types_union, int]:
+        #decode the value packed by _pack at pos, and return it with the position after it
+        code = bytes(data[pos:pos + 1])
+        pos += 1
+        if code == b'N':
+            return None, pos
+        elif code == b'T':
+            return True, pos
+        elif code == b'F':
+            return False, pos
+        elif code == b'i':
+            return struct.unpack_from('<q', data, pos)[0], pos + 8
+        elif code == b'd':
+            return struct.unpack_from('<d', data, pos)[0], pos + 8
+        elif code in (b'I', b's', b'b', b'p'):
+            size, = struct.unpack_from('<I', data, pos)
+            pos += 4
+            raw = bytes(data[pos:pos + size])
+            if len(raw) != size:
+                raise ValueError('tag is truncated')
+            if code == b'I':
+                value = int.from_bytes(raw, 'little', signed=True)
+            elif code == b's':
+                value = raw.decode('utf-8')
+            elif code == b'b':
+                value = raw
+            else:
+                value = pickle.loads(raw)
+            return value, pos + size
+        elif code in (b't', b'l'):
+            count, = struct.unpack_from('<I', data, pos)
+            pos += 4
+            items = []
+            for _ in range(count):
+                item, pos = cls._unpack(data, pos)
+                items.append(item)
+            return (tuple(items) if code == b't' else items), pos
+        elif code == b'm':
+            count, = struct.unpack_from('<I', data, pos)
+            pos += 4
+            rtn = {}
+            for _ in range(count):
+                k, pos = cls._unpack(data, pos)
+                v, pos = cls._unpack(data, pos)
+                rtn[k] = v
+            return rtn, pos
+        elif code == b'a':
+            size, = struct.unpack_from('<B', data, pos)
+            dtype = np.dtype(bytes(data[pos + 1:pos + 1 + size]).decode('ascii'))
+            pos += 1 + size
+            ndim, = struct.unpack_from('<B', data, pos)
+            shape = struct.unpack_from(f'<{ndim}Q', data, pos + 1)
+            pos += 1 + 8 * ndim
+            nbytes = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+            if pos + nbytes > len(data):
+                raise ValueError('tag is truncated')
+            return np.frombuffer(data[pos:pos + nbytes], dtype=dtype).reshape(shape).copy(), pos + nbytes
+        else:
+            raise ValueError(f'unknown tag value type: {code!r}')
+
     @abstractmethod
-    def set(self, key:bytes, value:bytes):
+    def set(self, key:bytes, value:bytes, var_type:int):
         '''
         :meta private:
         '''
         pass
     
     @abstractmethod
-    def get(self, key:bytes) -> bytes:
+    def get(self, key:bytes) -> Tuple[bytes, int]:
         '''
         :meta private:
         '''
@@ -365,17 +619,96 @@ class KVTags(ABC):
         '''
         pass
 
+    def __init__(self, owner):
+        #the object or container the tags belong to
+        self._owner = owner
+
+    @property
+    def _cache(self) -> Optional[dict]:
+        return _tag_caches.get(self._owner)
+
+    def enable_cache(self) -> None:
+        '''
+        | Cache the tags read and set through this client, so reading a tag again doesn't contact the server.
+        | The cache is write-through: setting a tag updates the server and the cache, and deleting a tag removes it from both.
+        | Changes made by other clients are not seen, so only enable the cache for tags this client is the only writer of.
+        '''
+        _tag_caches.setdefault(self._owner, {})
+
+    def disable_cache(self) -> None:
+        '''
+        Stop caching tags, and discard the cached tags.
+        '''
+        _tag_caches.pop(self._owner, None)
+
+    @property
+    def cache_enabled(self) -> bool:
+        return self._owner in _tag_caches
+
+    def _get_cached(self, key:bytes) -> Tuple[bytes, int]:
+        cache = self._cache
+        if cache is None:
+            return self.get(key)
+        rtn = cache.get(key)
+        if rtn is None:
+            rtn = cache[key] = self.get(key)
+        return rtn
+
+    def _set_cached(self, key:bytes, value:bytes, var_type:int) -> None:
+        self.set(key, value, var_type)
+        cache = self._cache
+        if cache is not None:
+            cache[key] = (value, var_type)
+
+    def get_many(self, names:Iterable[str], default=_no_default) -> Dict[str, tag_types_union]:
+        '''
+        Get the values of several tags.
+
+        :param names: the names of the tags
+        :param default: the value of tags that don't exist.  If not given, a missing tag raises :class:`PDCError`.
+        :return: a dict from each name to the value of its tag
+        '''
+        rtn = {}
+        for name in names:
+            checktype(name, 'tag name', str)
+            try:
+                rtn[name] = type(self)._decode(*self._get_cached(name.encode('utf-8')))
+            except PDCError:
+                if default is _no_default:
+                    raise
+                rtn[name] = default
+        return rtn
+
+    def update(self, tags:Mapping[str, tag_types_union]) -> None:
+        '''
+        Set the values of several tags.  Every value is encoded before any tag is set.
+
+        :param tags: a mapping from tag names to values
+        '''
+        encoded = []
+        for name, value in tags.items():
+            checktype(name, 'tag name', str)
+            encoded.append((name.encode('utf-8'), type(self)._encode(value)))
+        for key, (value, var_type) in encoded:
+            self._set_cached(key, value, var_type)
+
     def __getitem__(self, name:str):
         checktype(name, 'tag name', str)
-        return type(self)._decode(self.get(name.encode('utf-8')))
+        return type(self)._decode(*self._get_cached(name.encode('utf-8')))
     
     def __setitem__(self, name:str, value:tag_types_union):
         checktype(name, 'tag name', str)
-        self.set(name.encode('utf-8'), type(self)._encode(value))
+        self._set_cached(name.encode('utf-8'), *type(self)._encode(value))
     
     def __delitem__(self, name:str):
         checktype(name, 'tag name', str)
-        self.delete(name.encode('utf-8'))
+        key = name.encode('utf-8')
+        try:
+            self.delete(key)
+        finally:
+            cache = self._cache
+            if cache is not None:
+                cache.pop(key, None)
 
 class ServerContext:
     '''
@@ -0,0 +1,276 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+import time
+
+import numpy as np
+import numpy.typing as npt
+
+from .main import checktype, uint64, Type, PDCError, MPI
+from .object import Object
+from .region import Region
+from .transfer import TransferBatch
+
+def _check_comm(comm) -> None:
+    if MPI is None:
+        raise ImportError('pdc.mpi requires mpi4py')
+    checktype(comm, 'comm', MPI.Comm)
+
+class Decomposition(ABC):
+    '''
+    | How a global array is split between the ranks of a communicator, along one axis.
+    | Each rank's local block is the parts of the global array it holds, stacked along the axis in order.  The other dimensions are not split.
+    '''
+
+    def __init__(self, axis:int=0):
+        '''
+        :param int axis: the dimension of the global array that is split
+        '''
+        checktype(axis, 'axis', int)
+        if axis < 0:
+            raise ValueError('axis must not be negative')
+        self.axis = axis
+
+    @abstractmethod
+    def _ranges(self, length:int, rank:int, size:int) -> List[Tuple[int, int]]:
+        '''
+        The (start, stop) of each part of the axis held by rank, in order.
+        '''
+        pass
+
+    def boxes(self, dims:Tuple[uint64, ...], rank:int, size:int) -> List[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+        '''
+        The parts of a global array held by a rank, in the order they are stacked in its local block.
+
+        :param dims: the shape of the global array
+        :param int rank: the rank
+        :param int size: the number of ranks
+        :return: the offsets and sizes of each part
+        '''
+        dims = tuple(int(d) for d in dims)
+        if self.axis >= len(dims):
+            raise ValueError(f'axis {self.axis} is out of range for an array with {len(dims)} dimensions')
+        if not 0 <= rank < size:
+            raise ValueError(f'rank {rank} is out of range for {size} ranks')
+        #adjacent parts are transferred as one box
+        ranges = []
+        for start, stop in self._ranges(dims[self.axis], rank, size):
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], stop)
+            elif start < stop:
+                ranges.append((start, stop))
+        boxes = []
+        for start, stop in ranges:
+            offsets = [0] * len(dims)
+            sizes = list(dims)
+            offsets[self.axis] = start
+            sizes[self.axis] = stop - start
+            boxes.append((tuple(offsets), tuple(sizes)))
+        return boxes
+
+    def local_shape(self, dims:Tuple[uint64, ...], rank:int, size:int) -> Tuple[int, ...]:
+        '''
+        The shape of the local block of a rank.
+        '''
+        shape = [int(d) for d in dims]
+        shape[self.axis] = sum(sizes[self.axis] for _, sizes in self.boxes(dims, rank, size))
+        return tuple(shape)
+
+class Block(Decomposition):
+    '''
+    Splits the axis into one contiguous part per rank, of nearly equal sizes, in rank order.
+    '''
+
+    def _ranges(self, length:int, rank:int, size:int) -> List[Tuple[int, int]]:
+        return [(length * rank // size, length * (rank + 1) // size)]
+
+    def __repr__(self) -> str:
+        return f'Block(axis={self.axis})'
+
+class BlockCyclic(Decomposition):
+    '''
+    Splits the axis into parts of block_size, dealt to the ranks in turn: rank r holds parts r, r + size, r + 2 * size, ...
+    '''
+
+    def __init__(self, block_size:int, axis:int=0):
+        '''
+        :param int block_size: the length of each part along the axis
+        :param int axis: the dimension of the global array that is split
+        '''
+        super().__init__(axis)
+        checktype(block_size, 'block size', int)
+        if block_size <= 0:
+            raise ValueError('block size must be greater than 0')
+        self.block_size = block_size
+
+    def _ranges(self, length:int, rank:int, size:int) -> List[Tuple[int, int]]:
+        b = self.block_size
+        return [(k * b, min((k + 1) * b, length)) for k in range(rank, (length + b - 1) // b, size)]
+
+    def __repr__(self) -> str:
+        return f'BlockCyclic({self.block_size}, axis={self.axis})'
+
+class TransferStats:
+    '''
+    Totals of a collective transfer, the same on every rank.
+    '''
+
+    def __init__(self, nbytes:int, seconds:float, ranks:int):
+        #: the number of bytes moved by all ranks
+        self.nbytes = nbytes
+        #: the time taken by the slowest rank, from the start of the call to the final barrier
+        self.seconds = seconds
+        #: the number of ranks
+        self.ranks = ranks
+
+    @property
+    def bandwidth(self) -> float:
+        '''
+        The aggregate bandwidth of all ranks, in bytes per second
+        '''
+        return self.nbytes / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return f'TransferStats(nbytes={self.nbytes}, seconds={self.seconds:.6f}, ranks={self.ranks}, bandwidth={self.bandwidth / 1e9:.3f} GB/s)'
+
+def _check_ranks(comm, error:Optional[Exception], what:str) -> None:
+    #collective, so that every rank raises if any rank failed, rather than the others waiting for it forever
+    failed = [(rank, message) for rank, message in enumerate(comm.allgather(None if error is None else f'{error.__class__.__name__}: {error}')) if message is not None]
+    if error is not None:
+        raise error
+    if failed:
+        rank, message = failed[0]
+        raise PDCError(f'{what} failed on {len(failed)} of {comm.Get_size()} ranks.  Rank {rank}: {message}')
+
+def _finish(comm, nbytes:int, start:float) -> TransferStats:
+    comm.Barrier()
+    seconds = time.perf_counter() - start
+    return TransferStats(comm.allreduce(nbytes, op=MPI.SUM), comm.allreduce(seconds, op=MPI.MAX), comm.Get_size())
+
+def _local_piece(axis:int, start:int, stop:int) -> tuple:
+    return (slice(None),) * axis + (slice(start, stop),)
+
+def create_global(container, name:str, dims:Tuple[uint64, ...], type:Type, comm) -> Object:
+    '''
+    | Create an object shared by every rank of comm.  Must be called by every rank.
+    | The object is created once, by rank 0.  The other ranks open it by name once rank 0 has created it.
+
+    :param Container container: the container to create the object in, on rank 0
+    :param str name: the name of the object
+    :param dims: the shape of the global array
+    :param Type type: the type of the object's data
+    :param comm: an mpi4py communicator
+    :return: the object, on every rank
+    '''
+    _check_comm(comm)
+    error = None
+    if comm.Get_rank() == 0:
+        try:
+            checktype(name, 'name', str)
+            obj = container.create_object(name, Object.Properties(dims=dims, type=type))
+        except Exception as e:
+            error = f'{e.__class__.__name__}: {e}'
+    error = comm.bcast(error, root=0)
+    if error is not None:
+        raise PDCError(f'rank 0 could not create object {name!r}: {error}')
+    error = None
+    if comm.Get_rank() != 0:
+        try:
+            obj = Object.get(name)
+        except Exception as e:
+            error = e
+    _check_ranks(comm, error, f'opening object {name!r}')
+    return obj
+
+def write_global(obj:Object, local_block:npt.ArrayLike, comm, decomposition:Optional[Decomposition]=None) -> TransferStats:
+    '''
+    | Collectively set the data of an object from the local blocks of every rank.  Must be called by every rank.
+    | Each rank sets the parts of the object given by decomposition, as one batch of transfers, concurrently with the other ranks.
+    | If any rank fails, every rank raises: the rank that failed raises its own error, and the others raise :class:`PDCError`.
+
+    Usage::
+
+        obj = pdc.mpi.create_global(cont, 'temperature', (n, 1024), pdc.Type.DOUBLE, comm)
+        stats = pdc.mpi.write_global(obj, local_rows, comm)
+        if comm.Get_rank() == 0:
+            print(stats.bandwidth)
+
+    :param Object obj: the object, usually from :func:`create_global`
+    :param local_block: this rank's data, of shape ``decomposition.local_shape(obj.dims, rank, size)``
+    :param comm: an mpi4py communicator
+    :param Decomposition decomposition: how the object is split between ranks.  Defaults to :class:`Block` along the first dimension.
+    :return: the totals of all ranks
+    '''
+    _check_comm(comm)
+    start = time.perf_counter()
+    rank, size = comm.Get_rank(), comm.Get_size()
+    error = None
+    try:
+        checktype(obj, 'object', Object)
+        if decomposition is None:
+            decomposition = Block()
+        checktype(decomposition, 'decomposition', Decomposition)
+        dims = obj.dims
+        local_block = np.asarray(local_block)
+        expected = decomposition.local_shape(dims, rank, size)
+        if local_block.shape != expected:
+            raise ValueError(f'the local block of rank {rank} has shape {local_block.shape}, but its part of the object has shape {expected}')
+    except Exception as e:
+        error = e
+    _check_ranks(comm, error, 'write_global')
+
+    batch = TransferBatch()
+    try:
+        axis = decomposition.axis
+        pos = 0
+        for offsets, sizes in decomposition.boxes(dims, rank, size):
+            batch.set(obj, local_block[_local_piece(axis, pos, pos + sizes[axis])], Region(tuple(slice(o, o + s) for o, s in zip(offsets, sizes))))
+            pos += sizes[axis]
+        batch.wait_all()
+    except Exception as e:
+        error = e
+    _check_ranks(comm, error, 'write_global')
+    return _finish(comm, batch.nbytes, start)
+
+def read_global(obj:Object, comm, decomposition:Optional[Decomposition]=None, *, out=None) -> Tuple[npt.NDArray, TransferStats]:
+    '''
+    | Collectively get the local block of every rank from an object.  Must be called by every rank.
+    | Each rank gets the parts of the object given by decomposition, as one batch of transfers, concurrently with the other ranks.
+    | If any rank fails, every rank raises: the rank that failed raises its own error, and the others raise :class:`PDCError`.
+
+    :param Object obj: the object
+    :param comm: an mpi4py communicator
+    :param Decomposition decomposition: how the object is split between ranks.  Defaults to :class:`Block` along the first dimension.
+    :param out: a writable array of this rank's local shape to read into.  Defaults to a new array.
+    :return: this rank's local block, and the totals of all ranks
+    '''
+    _check_comm(comm)
+    start = time.perf_counter()
+    rank, size = comm.Get_rank(), comm.Get_size()
+    error = None
+    try:
+        checktype(obj, 'object', Object)
+        if decomposition is None:
+            decomposition = Block()
+        checktype(decomposition, 'decomposition', Decomposition)
+        dims = obj.dims
+        expected = decomposition.local_shape(dims, rank, size)
+        if out is None:
+            out = np.empty(expected, dtype=obj.type.as_numpy_type())
+        elif not isinstance(out, np.ndarray) or out.shape != expected:
+            raise ValueError(f'out must be an array of shape {expected}')
+    except Exception as e:
+        error = e
+    _check_ranks(comm, error, 'read_global')
+
+    batch = TransferBatch()
+    try:
+        axis = decomposition.axis
+        pos = 0
+        for offsets, sizes in decomposition.boxes(dims, rank, size):
+            batch.get(obj, Region(tuple(slice(o, o + s) for o, s in zip(offsets, sizes))), out=out[_local_piece(axis, pos, pos + sizes[axis])])
+            pos += sizes[axis]
+        batch.wait_all()
+    except Exception as e:
+        error = e
+    _check_ranks(comm, error, 'read_global')
+    return out, _finish(comm, batch.nbytes, start)
@@ -1,21 +1,25 @@
 import builtins
 import os
+import itertools
+import asyncio
 from functools import singledispatchmethod
-from typing import Tuple, Optional, Iterable, Union
+from typing import Tuple, Optional, Iterable, Iterator, Union, Dict
+from collections import deque, OrderedDict
 from enum import Enum
 import numpy.typing as npt
-from weakref import finalize, WeakValueDictionary
+from weakref import finalize, WeakValueDictionary, WeakKeyDictionary
 import ctypes
-from pdc.main import uint32, uint64, Type, KVTags, _free_from_int, _get_pdcid, PDCError, PDCError, pdcid, checktype, ctrace
+from pdc.main import uint32, uint64, Type, KVTags, _free_from_int, _get_pdcid, PDCError, PDCError, pdcid, checktype, ctrace, _Backoff, _notify_write, _notify_tag
 cimport pdc.cpdc as cpdc
 from cpython.mem cimport PyMem_Malloc as malloc, PyMem_Free as free
-from pdc.cpdc cimport uint32_t, uint64_t, pdc_access_t, pdcid_t, pdc_obj_prop, _pdc_obj_prop, pdc_obj_info, pdc_transfer_status_t, psize_t, _pdc_obj_info, pdc_var_type_t
-from pdc.main cimport malloc_or_memerr
+from pdc.cpdc cimport uint32_t, uint64_t, perr_t, pdc_access_t, pdcid_t, pdc_obj_prop, _pdc_obj_prop, pdc_obj_info, pdc_transfer_status_t, psize_t, _pdc_obj_info, pdc_var_type_t
+from pdc.main cimport malloc_or_memerr, _pdc_is_open
+cimport cython
 from . import container
 from . import container as container_
 from . import region
 from . import query
-from .region import region, Region
+from .region import region, Region, RegionSet
 from .region import region as region_
 from libc.string cimport strcpy
 import numpy as np
@@ -43,8 +47,212 @@ cdef _pdc_obj_info get_private_obj_info(pdcid_t obj_id):
         raise PDCError("could not get info for object")
     return private_struct[0]
 
+class _ObjectMetadata:
+    '''
+    Metadata of an object that can't change once the object exists.
+    It is read from PDC once per object id, and shared by every handle to that id.
+    '''
+    __slots__ = ('dims', 'type', 'dtype', 'name')
+
+    def __init__(self, pdcid_t obj_id):
+        cdef _pdc_obj_prop *obj_prop = get_private_obj_info(obj_id).obj_pt
+        if obj_prop == NULL:
+            raise PDCError('info->obj_pt is NULL')
+        cdef pdc_obj_prop *pub_obj_prop = obj_prop[0].obj_prop_pub
+        if pub_obj_prop == NULL:
+            raise PDCError('info->obj_pt->obj_prop_pub is NULL')
+        cdef uint64_t ndims = pub_obj_prop[0].ndim
+        cdef uint64_t *dims = pub_obj_prop[0].dims
+        self.dims = tuple(dims[i] for i in range(ndims))
+
+        typenum = pub_obj_prop[0].type
+        try:
+            self.type = Type(typenum)
+        except ValueError:
+            raise PDCError(f"unimplemented type number: {typenum}")
+        self.dtype = self.type.as_numpy_type()
+        self.name = get_obj_info(obj_id).name.decode('utf-8')
+
+#_ObjectMetadata by object id, removed when the object is closed
+_metadata_by_id = {}
+
+_copy_modes = ('never', 'if_needed')
+
+class BufferPool:
+    '''
+    | A pool of arrays that GET requests read into, so steady-state loops reading same-shaped regions don't allocate (and page fault on) a new array each time.
+    | Pass it to :func:`Object.get_data` or :func:`TransferBatch.get` as ``pool``.
+    | Results are returned to the pool with :func:`Object.TransferRequest.release`, or by using the request as a context manager.
+    | Released arrays are kept by shape and type, up to :attr:`max_bytes` in total.  Arrays of the least recently released shapes are dropped first.
+
+    Usage::
+
+        pool = pdc.BufferPool()
+        for tile in tiles:
+            with obj.get_data(tile, pool=pool) as request:
+                process(request.wait())
+    '''
+
+    def __init__(self, max_bytes:int = 256 * 1024 * 1024):
+        checktype(max_bytes, 'max_bytes', int)
+        self.max_bytes = max_bytes
+        #: the size of the arrays held by the pool, in bytes
+        self.nbytes = 0
+        #: the number of arrays allocated because none of the requested shape were free
+        self.allocations = 0
+        #: the number of requests that reused an array instead of allocating one
+        self.allocations_avoided = 0
+        #free arrays by (shape, dtype), least recently released first
+        self._free = OrderedDict()
+
+    def acquire(self, shape:Tuple[int, ...], dtype:np.dtype) -> np.ndarray:
+        '''
+        Take an array of the given shape and type from the pool, or allocate one if none are free.  Its contents are undefined.
+        '''
+        dtype = np.dtype(dtype)
+        free = self._free.get((tuple(shape), dtype))
+        if free:
+            arr = free.pop()
+            self.nbytes -= arr.nbytes
+            self.allocations_avoided += 1
+            return arr
+        self.allocations += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, arr:np.ndarray) -> None:
+        '''
+        Return an array to the pool.  Arrays that don't own their memory are ignored.
+        '''
+        checktype(arr, 'array', np.ndarray)
+        if arr.base is not None or not arr.flags.c_contiguous or not arr.flags.writeable:
+            return
+        key = (arr.shape, arr.dtype)
+        self._free.setdefault(key, []).append(arr)
+        self._free.move_to_end(key)
+        self.nbytes += arr.nbytes
+        while self.nbytes > self.max_bytes:
+            key, free = next(iter(self._free.items()))
+            self.nbytes -= free.pop(0).nbytes
+            if not free:
+                del self._free[key]
+
+    def clear(self) -> None:
+        '''
+        Drop every array held by the pool.
+        '''
+        self._free.clear()
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        '''
+        The number of free arrays in the pool
+        '''
+        return sum(len(free) for free in self._free.values())
+
+def _check_copy_mode(copy:str):
+    checktype(copy, 'copy', str)
+    if copy not in _copy_modes:
+        raise ValueError(f'invalid copy mode: {copy!r}, expected one of {_copy_modes}')
+
+def _as_array(data, dtype:np.dtype, sizes:Tuple[int, ...]) -> np.ndarray:
+    '''
+    View data as a numpy array without copying it, if possible.
+    Raw byte buffers (bytes, bytearray, mmap, memoryviews of bytes) are reinterpreted as dtype and shaped like the region.
+    '''
+    if isinstance(data, np.ndarray):
+        return data
+    try:
+        view = memoryview(data)
+    except TypeError:
+        #not a buffer, e.g. a list.  This always converts
+        return np.asarray(data)
+    if view.format in ('B', 'b', 'c') and view.c_contiguous and dtype.itemsize * np.prod(sizes, dtype=np.int64) == view.nbytes:
+        return np.frombuffer(view, dtype=dtype).reshape(sizes)
+    return np.asarray(view)
+
+def _region_shaped(arr:np.ndarray, sizes:Tuple[int, ...], name:str) -> np.ndarray:
+    '''
+    Check that arr has the shape of a region, ignoring leading dimensions of size 1
+    '''
+    if arr.ndim > len(sizes):
+        raise ValueError(f'{name} has {arr.ndim} dimensions, but {len(sizes)} are allowed')
+    new_shape = (1,) * (len(sizes) - arr.ndim) + arr.shape
+    if sizes != new_shape:
+        raise ValueError(f'{name} shape {arr.shape} does not match region shape {sizes}')
+    return arr
+
+def _region_view(arr:np.ndarray, sizes:Tuple[int, ...]) -> Optional[np.ndarray]:
+    '''
+    A view of arr with the shape of a region, in C order, or None if arr can't be viewed with that shape without copying
+    '''
+    view = arr.reshape(sizes)
+    return view if np.may_share_memory(view, arr) or view.size == 0 else None
+
+_file_formats = ('npy', 'raw')
+
+def _file_format(path, format:Optional[str]) -> str:
+    #the format of a file for Object.export and Container.object_from_file
+    if format is None:
+        return 'npy' if os.fspath(path).endswith('.npy') else 'raw'
+    checktype(format, 'format', str)
+    if format not in _file_formats:
+        raise ValueError(f'invalid file format: {format!r}, expected one of {_file_formats}')
+    return format
+
+def _is_transferable(arr:np.ndarray, dtype:np.dtype) -> bool:
+    return arr.dtype == dtype and arr.flags.c_contiguous and arr.flags.aligned
+
+#arrays holding the entire data of objects, by object.  See Object.pin
+_pinned = WeakKeyDictionary()
+
+def _write_pinned(obj:'Object', remoteRegion:Region, data:np.ndarray, sizes:Tuple[int, ...]) -> None:
+    #keep a pinned copy of obj in sync with data set through this client
+    pinned = _pinned.get(obj)
+    if pinned is None:
+        return
+    offsets, _ = remoteRegion._bounds(obj.dims)
+    pinned[tuple(slice(o, o + s) for o, s in zip(offsets, sizes))] = data.reshape(sizes)
+
+#the WriteBuffers of each object that hold writes which have not completed.  See WriteBuffer
+_write_buffers = WeakKeyDictionary()
+
+def _sync_write_buffers(obj:'Object', region) -> None:
+    #complete the buffered writes to obj that overlap region, before region is transferred directly
+    buffers = _write_buffers.get(obj)
+    if buffers:
+        for buffer in list(buffers):
+            buffer._sync(region)
+
+_default_chunk_bytes = 16 * 1024 * 1024
+
+def _default_chunk_shape(sizes:Tuple[int, ...], itemsize:int) -> Tuple[int, ...]:
+    '''
+    Chunks of whole rows (along the first dimension) of about _default_chunk_bytes each
+    '''
+    row_bytes = itemsize * int(np.prod(sizes[1:], dtype=np.int64))
+    return (max(1, _default_chunk_bytes // max(1, row_bytes)),)
+
+def _in_flight(requests:Iterator[tuple], prefetch:int) -> Iterator[tuple]:
+    '''
+    Wait for each (key, request) pair of an iterator that creates requests lazily, and yield (key, result), while keeping prefetch requests in flight ahead of the consumer.
+    '''
+    in_flight = deque()
+    try:
+        for pair in itertools.islice(requests, prefetch):
+            in_flight.append(pair)
+        while in_flight:
+            key, request = in_flight.popleft()
+            result = request.wait()
+            in_flight.extend(itertools.islice(requests, 1))
+            yield key, result
+    finally:
+        #closing a transfer request that hasn't finished crashes, so drain the requests if the consumer stops early
+        for _, request in in_flight:
+            request.wait()
+
 class ObjectKVTags(KVTags):
     def __init__(self, obj):
+        super().__init__(obj)
         self.obj = obj
     
     def delete(self, name:bytes):
@@ -52,6 +260,7 @@ class ObjectKVTags(KVTags):
         ctrace("obj_del_tag", rtn, self.obj._id, name)
         if rtn != 0:
             raise PDCError("tag does not exist or could not delete tag")
+        _notify_tag(self.obj, name, None, None)
     
     def get(self, name:bytes):
         cdef void* value_out
@@ -62,15 +271,292 @@ class ObjectKVTags(KVTags):
         if rtn != 0:
             raise PDCError("tag does not exist or could not get tag")
         rtn = PyBytes_FromStringAndSize(<char *> value_out, size_out)
-        return rtn
+        return rtn, <int> var_type
     
-    def set(self, name:bytes, value:bytes):
-        ctrace('here', None)
-        ctrace("obj_put_tag", '?', self.obj._id, name, value, len(value))
-        rtn = cpdc.PDCobj_put_tag(self.obj._id, name, <char *> value, pdc_var_type_t.PDC_CHAR, len(value))
-        ctrace('here', None)
+    def set(self, name:bytes, value:bytes, var_type:int):
+        rtn = cpdc.PDCobj_put_tag(self.obj._id, name, <char *> value, <pdc_var_type_t> var_type, len(value))
+        ctrace("obj_put_tag", rtn, self.obj._id, name, value, var_type, len(value))
         if rtn != 0:
             raise PDCError("could not set tag")
+        _notify_tag(self.obj, name, value, var_type)
+
+class RequestType(Enum):
+    '''
+    The possible types of transfer request.
+    Can be obtained with :attr:`TransferRequest.type`
+    Either GET or SET.
+    '''
+    GET = pdc_access_t.PDC_READ
+    SET = pdc_access_t.PDC_WRITE
+
+#a request can only be part of a reference cycle through a running coroutine, but its fields are needed to release its regions
+@cython.no_gc_clear
+cdef class TransferRequest:
+    '''
+    Represents a transfer request to either set a region's data or get it.
+    '''
+
+    cdef readonly object obj
+    cdef readonly object type
+    cdef readonly pdcid_t _id
+    cdef readonly pdcid_t _local_region_id
+    cdef readonly pdcid_t _global_region_id
+    cdef readonly Py_ssize_t nbytes
+    cdef public bint _done
+    cdef public bint _started
+    cdef object _out
+    cdef object _copy_to
+    #keeps the buffer of a SET request alive until the transfer is closed
+    cdef object _data
+    #the pool the regions came from, and the keys to release them with
+    cdef object _pool
+    #the BufferPool the result was taken from
+    cdef object _buffer_pool
+    cdef tuple _offsets
+    cdef tuple _local_offsets
+    cdef tuple _sizes
+    #the region set by a SET request, so caches can be invalidated again when it completes
+    cdef object _set_region
+    cdef object __weakref__
+
+    RequestType = RequestType
+
+    def wait(self):
+        '''
+        Block until the result of the transfer request is available, then return it. 
+        If this is a GET request, the return value is the data, otherwise it is None.
+        '''
+        if self._done:
+            return self.result
+        if not self._started:
+            self._start()
+        cdef pdcid_t transfer_id = self._id
+        cdef perr_t rtn
+        with nogil:
+            rtn = cpdc.PDCregion_transfer_wait(transfer_id)
+        ctrace('region_transfer_wait', rtn, self._id)
+        if rtn != 0:
+            raise PDCError('Failed to wait for transfer request')
+        self._mark_done()
+        return self.result
+
+    def __await__(self):
+        '''
+        | Transfer requests can be awaited from a coroutine.  ``await request`` has the same result as :func:`wait`, but polls the request on the event loop instead of blocking it.
+        | Because of this, transfer requests also work with ``asyncio.gather``, ``asyncio.wait`` and ``asyncio.as_completed``.
+        '''
+        return self._wait_async().__await__()
+
+    async def _wait_async(self):
+        if not self._started:
+            self._start()
+        backoff = _Backoff()
+        while not self.done:
+            await asyncio.sleep(backoff.next())
+        return self.wait()
+
+    @property
+    def done(self) -> bool:
+        '''
+        True if this transfer request is completed
+        '''
+        if self._done:
+            return True
+        if not self._started:
+            return False
+        cdef pdc_transfer_status_t out_status
+        rtn = cpdc.PDCregion_transfer_status(self._id, &out_status)
+        ctrace('region_transfer_status', rtn, self._id, <uint64_t> &out_status)
+        if rtn != 0:
+            raise PDCError('Failed to get transfer status')
+        elif out_status == pdc_transfer_status_t.PDC_TRANSFER_STATUS_NOT_FOUND:
+            raise PDCError('could not get transfer request status: transfer request not found')
+        elif out_status == pdc_transfer_status_t.PDC_TRANSFER_STATUS_COMPLETE:
+            self._mark_done()
+            return True
+        elif out_status == pdc_transfer_status_t.PDC_TRANSFER_STATUS_PENDING:
+            return False
+        else:
+            raise PDCError(f'unknown transfer status: {out_status}')
+    
+    def _mark_done(self):
+        if self._done:
+            return
+        self._done = True
+        if self._set_region is not None:
+            #anything derived from the object's data between issuing the request and now may have seen the old data
+            _notify_write(self.obj, self._set_region)
+            self._set_region = None
+        if self._copy_to is not None:
+            #the caller's out buffer couldn't be transferred into directly
+            np.copyto(self._copy_to, self._out.reshape(self._copy_to.shape))
+            #the result shares memory with out.  It has the region's shape unless out can't be viewed with that shape
+            view = _region_view(self._copy_to, self._sizes)
+            self._out = self._copy_to if view is None else view
+            self._copy_to = None
+    
+    #@property
+    #def type(self) -> RequestType:
+    #    '''
+    #    Get the type of request
+    #    '''
+    #    pass
+    
+    @property
+    def result(self) -> Optional[npt.NDArray]:
+        '''
+        result(self) -> Optional[npt.NDArray]
+        If the request is done and the request type is RequestType.GET, this is a numpy array containing the requested data.  Otherwise, it is None.
+        If an ``out`` buffer was given, the result is an array that shares memory with it, of the region's shape if out can be viewed with that shape.
+        '''
+        if self.type == type(self).RequestType.SET or not self.done:
+            return None
+        return self._out
+    
+    @property
+    def started(self) -> bool:
+        '''
+        True if this transfer request has been started.
+        Requests created through a :class:`TransferBatch` are not started until the batch is submitted.
+        '''
+        return self._started
+
+    def release(self) -> None:
+        '''
+        | If the result of this request was taken from a :class:`BufferPool`, wait for the request, then return the result to the pool so it can be reused.
+        | The result must not be used after it is released.  Does nothing for other requests.
+        '''
+        if self._buffer_pool is None:
+            return
+        self.wait()
+        self._buffer_pool.release(self._out)
+        self._buffer_pool = None
+        self._out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+    def __init__(self, remoteRegion:Region, object:'Object', request_type:RequestType, data=None, *, out=None, copy:str='if_needed', pool:Optional['BufferPool']=None, _start:bool=True):
+        '''
+        __init__(*args)
+        '''
+        checktype(remoteRegion, 'remote region', Region)
+        checktype(object, 'object', Object)
+        checktype(request_type, 'request type', type(self).RequestType)
+        _check_copy_mode(copy)
+        if pool is not None:
+            checktype(pool, 'pool', BufferPool)
+        metadata = object._metadata
+        offsets, sizes = remoteRegion._bounds(metadata.dims)
+        local_offsets = (0,) * len(sizes)
+        region_pool = Region.pool
+        
+        cdef pdcid_t region_id = region_pool.acquire(offsets, sizes)
+        cdef pdcid_t local_region_id = 0
+        self.obj = object
+        self.type = request_type
+        self._done = False
+        self._started = False
+        self._copy_to = None
+        dtype = metadata.dtype
+
+        try:
+            local_region_id = region_pool.acquire(local_offsets, sizes)
+
+            if request_type == type(self).RequestType.SET:
+                
+                np_data = _as_array(data, dtype, sizes)
+                if not _is_transferable(np_data, dtype):
+                    if copy == 'never':
+                        raise ValueError(f'data must be C contiguous, aligned, and of type {dtype} to be set without copying')
+                    np_data = np.require(np_data, requirements=['C', 'A'], dtype=dtype)
+                _region_shaped(np_data, sizes, 'data')
+                
+                transfer_id = cpdc.PDCregion_transfer_create(<void *> <size_t> np_data.ctypes.data, type(self).RequestType.SET.value, object._id, local_region_id, region_id)
+                ctrace('region_transfer_create', transfer_id, np_data, type(self).RequestType.SET, object._id, local_region_id, region_id)
+                if transfer_id == 0:
+                    raise PDCError('failed to create transfer')
+                self._id = transfer_id
+                self._out = None
+                #np.require may have made a copy
+                self._data = np_data
+                self.nbytes = np_data.nbytes
+            else:
+                # sizes, offsets = remoteRegion._get_sizes_offsets(object.dims)
+                # region_id, sizes = remoteRegion._construct_with(sizes)
+                if out is None and pool is not None:
+                    out = pool.acquire(sizes, dtype)
+                    self._buffer_pool = pool
+                elif out is None:
+                    out = np.empty(sizes, dtype=dtype)
+                else:
+                    out = _as_array(out, dtype, sizes)
+                    if not out.flags.writeable:
+                        raise ValueError('out must be writable')
+                    if out.size != np.prod(sizes, dtype=np.int64):
+                        raise ValueError(f'out has {out.size} elements, but the region has shape {sizes}')
+                    if _is_transferable(out, dtype):
+                        out = out.reshape(sizes)
+                    elif copy == 'never':
+                        raise ValueError(f'out must be C contiguous, aligned, and of type {dtype} to get data without copying')
+                    else:
+                        #filled in C order, like a transferable out
+                        self._copy_to = out
+                        out = np.empty(sizes, dtype=dtype)
+                transfer_id = cpdc.PDCregion_transfer_create(<void *> <size_t> out.ctypes.data, type(self).RequestType.GET.value, object._id, local_region_id, region_id)
+                ctrace('region_transfer_create', transfer_id, out, type(self).RequestType.GET, object._id, local_region_id, region_id)
+                if transfer_id == 0:
+                    raise PDCError('failed to create transfer')
+                self._id = transfer_id
+                #print(f"shape of out: {out.shape}")
+                self._out = out
+                self.nbytes = out.nbytes
+        except:
+            region_pool.release(offsets, sizes)
+            if local_region_id != 0:
+                region_pool.release(local_offsets, sizes)
+            raise
+        
+        self._local_region_id = local_region_id
+        self._global_region_id = region_id
+        self._pool = region_pool
+        self._offsets = offsets
+        self._local_offsets = local_offsets
+        self._sizes = sizes
+        if request_type == type(self).RequestType.SET:
+            #only once the transfer exists, so a failed request doesn't invalidate caches or change the pinned array
+            self._set_region = remoteRegion
+            _notify_write(object, remoteRegion)
+            _write_pinned(object, remoteRegion, self._data, sizes)
+        if _start:
+            self._start()
+    
+    def _start(self):
+        cdef pdcid_t transfer_id = self._id
+        cdef perr_t rtn
+        with nogil:
+            rtn = cpdc.PDCregion_transfer_start(transfer_id)
+        ctrace('region_transfer_start', rtn, self._id)
+        if rtn != 0:
+            raise PDCError('failed to start transfer')
+        self._started = True
+    
+    def __dealloc__(self):
+        if self._id == 0:
+            #__init__ failed, and already released the regions
+            return
+        cdef perr_t rtn = 0
+        if _pdc_is_open():
+            rtn = cpdc.PDCregion_transfer_close(self._id)
+            ctrace('region_transfer_close', rtn, self._id)
+        self._pool.release(self._local_offsets, self._sizes)
+        self._pool.release(self._offsets, self._sizes)
+        if rtn != 0:
+            raise PDCError('Failed to close transfer request')
 
 class Object:
     '''
@@ -272,163 +758,21 @@ class Object:
         def __hash__(self) -> int:
             return hash((self.dims, self.type, self.time_step, self.user_id, self.app_name))
     
-    class TransferRequest:
-        '''
-        Represents a transfer request to either set a region's data or get it.
-        '''
-
-        class RequestType(Enum):
-            '''
-            The possible types of transfer request.
-            Can be obtained with :attr:`TransferRequest.type`
-            Either GET or SET.
-            '''
-            GET = pdc_access_t.PDC_READ
-            SET = pdc_access_t.PDC_WRITE
-
-        def wait(self):
-            '''
-            Block until the result of the transfer request is available, then return it. 
-            If this is a GET request, the return value is the data, otherwise it is None.
-            '''
-            rtn = cpdc.PDCregion_transfer_wait(self._id)
-            ctrace('region_transfer_wait', rtn, self._id)
-            if rtn != 0:
-                raise PDCError('Failed to wait for transfer request')
-            self._done = True
-            return self.result
-
-        @property
-        def done(self) -> bool:
-            '''
-            True if this transfer request is completed
-            '''
-            if self._done:
-                return True
-            cdef pdc_transfer_status_t out_status
-            rtn = cpdc.PDCregion_transfer_status(self._id, &out_status)
-            ctrace('region_transfer_status', rtn, self._id, <uint64_t> &out_status)
-            if rtn != 0:
-                raise PDCError('Failed to get transfer status')
-            elif out_status == pdc_transfer_status_t.PDC_TRANSFER_STATUS_NOT_FOUND:
-                raise PDCError('could not get transfer request status: transfer request not found')
-            elif out_status == pdc_transfer_status_t.PDC_TRANSFER_STATUS_COMPLETE:
-                self._done = True
-                return True
-            elif out_status == pdc_transfer_status_t.PDC_TRANSFER_STATUS_PENDING:
-                return False
-            else:
-                raise PDCError(f'unknown transfer status: {out_status}')
-        
-        #@property
-        #def type(self) -> RequestType:
-        #    '''
-        #    Get the type of request
-        #    '''
-        #    pass
-        
-        @property
-        def result(self) -> Optional[npt.NDArray]:
-            '''
-            result(self) -> Optional[npt.NDArray]
-            If the request is done and the request type is RequestType.GET, this is a numpy array containing the requested data.  Otherwise, it is None.
-            '''
-            if self.type == type(self).RequestType.SET or not self.done:
-                return None
-            return self._out
-        
-        def __init__(self, remoteRegion:Region, object:'Object', request_type:RequestType, data=None):
-            '''
-            __init__(*args)
-            '''
-            checktype(remoteRegion, 'remote region', Region)
-            checktype(object, 'object', Object)
-            checktype(request_type, 'request type', type(self).RequestType)
-            region_id, sizes = remoteRegion._construct_with(object.dims)
-            #print(f"sizes: {sizes}, object.dims: {object.dims}")
-            
-            cdef pdcid_t local_region_id = 0
-            self.obj = object
-            self.type = request_type
-            self._done = False
+    TransferRequest = TransferRequest
 
-            try:
-                _id, _ = region[:]._construct_with(sizes)
-                if _id == 0:
-                    raise PDCError('failed to construct region')
-                local_region_id = _id
-
-                if request_type == type(self).RequestType.SET:
-                    
-                    np_data = np.require(data, requirements=['C', 'A'], dtype=object.type.as_numpy_type())
-
-                    if np_data.ndim > len(sizes):
-                        raise ValueError(f'data has {np_data.ndim} dimensions, but {len(sizes)} are allowed')
-                    else:
-                        diff = len(sizes) - np_data.ndim
-                        new_shape = (1,) * diff + np_data.shape
-                        if sizes != new_shape:
-                            raise ValueError(f'data shape {np_data.shape} does not match region shape {sizes}')
-                        np_data.reshape(sizes)
-                    
-                    transfer_id = cpdc.PDCregion_transfer_create(<void *> <size_t> np_data.ctypes.data, type(self).RequestType.SET.value, object._id, local_region_id, region_id)
-                    ctrace('region_transfer_create', transfer_id, np_data, type(self).RequestType.SET, object._id, local_region_id, region_id)
-                    if transfer_id == 0:
-                        raise PDCError('failed to create transfer')
-                    self._id = transfer_id
-                    self._out = None
-                    self._local_region_id = local_region_id
-                    self._global_region_id = region_id
-                else:
-                    # sizes, offsets = remoteRegion._get_sizes_offsets(object.dims)
-                    # region_id, sizes = remoteRegion._construct_with(sizes)
-                    out = np.empty(sizes, dtype=object.type.as_numpy_type())
-                    transfer_id = cpdc.PDCregion_transfer_create(<void *> <size_t> out.ctypes.data, type(self).RequestType.GET.value, object._id, local_region_id, region_id)
-                    ctrace('region_transfer_create', transfer_id, out, type(self).RequestType.GET, object._id, local_region_id, region_id)
-                    if transfer_id == 0:
-                        raise PDCError('failed to create transfer')
-                    self._id = transfer_id
-                    #print(f"shape of out: {out.shape}")
-                    self._out = out
-                    self._local_region_id = local_region_id
-                    self._global_region_id = region_id
-            except:
-                rtn = cpdc.PDCregion_close(region_id)
-                ctrace('region_close', rtn, region_id)
-                rtn2 = 0
-                if local_region_id != 0:
-                    rtn2 = cpdc.PDCregion_close(local_region_id)
-                    ctrace('region_close', rtn2, local_region_id)
-                if rtn != 0 or rtn2 != 0:
-                    raise PDCError('Failed to create region')
-                raise
-            
-            finalize(self, type(self)._finalize, self._id, self._global_region_id, self._local_region_id)
-            rtn = cpdc.PDCregion_transfer_start(self._id)
-            ctrace('region_transfer_start', rtn, self._id)
-            if rtn != 0:
-                raise PDCError('failed to start transfer')
-        
-        @staticmethod
-        def _finalize(transfer_id, global_id, local_id):
-            rtn = cpdc.PDCregion_close(local_id)
-            ctrace('region_close', rtn, local_id)
-            rtn2 = cpdc.PDCregion_close(global_id)
-            ctrace('region_close', rtn2, global_id)
-            rtn3 = cpdc.PDCregion_transfer_close(transfer_id)
-            ctrace('region_transfer_close', rtn3, transfer_id)
-            if rtn != 0 or rtn2 != 0 or rtn3 != 0:
-                raise PDCError('Failed to close region or transfer request')
-    
     objects_by_id = WeakValueDictionary()
     objects_by_name = WeakValueDictionary()
 
+    #: the :class:`BlockCache` used by :func:`get_data`.  Set when pdc.cache is imported
+    block_cache = None
+
     def __init__(self, name:Optional(str), properties:Optional(Properties), container:Optional(container.Container), *, _id:Optional[pdcid]=None,):
         '''
         __init__(*args)
         '''
 
-        cdef pdcid_t id
+        cdef pdcid_t id, cont_id, prop_id
+        cdef const char *c_name
         if _id is not None:
             checktype(_id, '_id', int)
             id = _id
@@ -437,7 +781,12 @@ class Object:
             checktype(properties, 'properties', type(self).Properties)
             checktype(container, 'container', container_.Container)
 
-            id = cpdc.PDCobj_create(container._id, name.encode('utf-8'), properties._id)
+            name_bytes = name.encode('utf-8')
+            c_name = name_bytes
+            cont_id = container._id
+            prop_id = properties._id
+            with nogil:
+                id = cpdc.PDCobj_create(cont_id, c_name, prop_id)
             ctrace('obj_create', id, container._id, name.encode('utf-8'), properties._id)
             if id == 0:
                 raise PDCError('failed to create object')
@@ -456,6 +805,7 @@ class Object:
 
     @staticmethod
     def _finalize(id, objects_by_id):
+        _metadata_by_id.pop(id, None)
         ctrace('obj_close', '?', id)
         rtn = cpdc.PDCobj_close(id)
         ctrace('obj_close', rtn, id)
@@ -473,40 +823,35 @@ class Object:
         else:
             return cls(None, None, None, _id=id)
     
+    @property
+    def _metadata(self) -> _ObjectMetadata:
+        metadata = _metadata_by_id.get(self._id)
+        if metadata is None:
+            metadata = _ObjectMetadata(self._id)
+            _metadata_by_id[self._id] = metadata
+        return metadata
+
     @property
     def dims(self) -> Tuple[uint64, ...]:
         '''
         The dimensions of this object.  read-only
         Equivalent to ``obj.get_properties().dims``
         '''
-        cdef _pdc_obj_prop *obj_prop = (get_private_obj_info(self._id).obj_pt)
-        if obj_prop == NULL:
-            raise PDCError('info->obj_pt is NULL')
-        cdef pdc_obj_prop *pub_obj_prop = obj_prop[0].obj_prop_pub
-        if pub_obj_prop == NULL:
-            raise PDCError('info->obj_pt->obj_prop_pub is NULL')
-        cdef uint64_t ndims = pub_obj_prop[0].ndim
-        cdef uint64_t *dims = pub_obj_prop[0].dims
-
-        return tuple(dims[i] for i in range(ndims))
+        return self._metadata.dims
     
     @property
     def type(self) -> Type:
         '''
         The type of this object.  read-only
         '''
-        typenum = get_private_obj_info(self._id).obj_pt[0].obj_prop_pub[0].type
-        try:
-            return Type(typenum)
-        except ValueError:
-            raise PDCError(f"unimplemented type number: {typenum}")
+        return self._metadata.type
     
     @property
     def name(self) -> str:
         '''
         The name of this object. read-only
         '''
-        return get_obj_info(self._id).name.decode('utf-8')
+        return self._metadata.name
     
     @property
     def data(self) -> 'QueryComponent':
@@ -516,6 +861,79 @@ class Object:
         '''
         return query.QueryComponent(self)
 
+    @property
+    def array(self) -> 'ArrayView':
+        '''
+        | A lazy, numpy-compatible view of this object's data.  Slicing it doesn't read anything until the result is converted to a numpy array.
+        | ``obj[key]`` is the same as ``obj.array[key]``, and ``np.asarray(obj)`` reads the entire object.
+        | See :class:`ArrayView`.
+        '''
+        from .array import ArrayView
+        return ArrayView(self)
+
+    def __getitem__(self, key) -> 'ArrayView':
+        return self.array[key]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.array.__array__(dtype, copy)
+
+    @property
+    def statistics(self) -> Optional['ObjectStatistics']:
+        '''
+        The statistics of this object's data used to plan queries, or None if they have not been computed.
+        See :func:`compute_statistics`.
+        '''
+        return query.ObjectStatistics.cache.get(self)
+
+    def compute_statistics(self, nbins:int=64, chunk_shape:Optional[Tuple[uint64, ...]]=None) -> 'ObjectStatistics':
+        '''
+        | Read this object's data and compute the statistics used by :func:`Query.plan`.
+        | The statistics are kept until data is set in this object through this client.
+        | If other clients write to the object, call this again to refresh them.
+
+        :param int nbins: the number of histogram bins
+        :param chunk_shape: the shape of the chunks the data is read in.  See :func:`iter_chunks`
+        :return: the computed statistics
+        '''
+        return query.ObjectStatistics.compute(self, nbins, chunk_shape)
+
+    def pin(self, data:Optional[npt.ArrayLike]=None) -> npt.NDArray:
+        '''
+        | Keep this object's entire data in client memory, so queries on it can be evaluated locally with numpy instead of by the server.
+        | See the ``engine`` parameter of :func:`Query.get_result`.
+        | Data set in this object through this client is also written into the pinned array, so the two stay in sync.
+        | Writes by other clients are not seen.
+
+        :param data: A writable array holding the object's current data, such as the array the object was created from.  It is kept without copying.  If this is None, the data is read from the server.
+        :return: the pinned array
+        '''
+        dtype = self.type.as_numpy_type()
+        if data is None:
+            data = self.get_data().wait()
+        else:
+            data = _as_array(data, dtype, self.dims)
+            if data.dtype != dtype:
+                raise TypeError(f'data has type {data.dtype}, but this object has type {dtype}')
+            if not data.flags.writeable:
+                #data set through this client is written into the pinned array
+                raise ValueError('data must be writable to be pinned.  Pin a copy instead')
+            data = _region_shaped(data, self.dims, 'data').reshape(self.dims)
+        _pinned[self] = data
+        return data
+
+    def unpin(self) -> None:
+        '''
+        Release the array kept by :func:`pin`.  Does nothing if this object is not pinned.
+        '''
+        _pinned.pop(self, None)
+
+    @property
+    def pinned(self) -> Optional[npt.NDArray]:
+        '''
+        The array kept by :func:`pin`, or None if this object is not pinned.
+        '''
+        return _pinned.get(self)
+
     @classmethod
     def get(cls, name:str) -> 'Object':
         '''
@@ -529,7 +947,12 @@ class Object:
         checktype(name, 'name', str)
         if name in cls.objects_by_name:
             return cls.objects_by_name[name]
-        cdef pdcid_t id = cpdc.PDCobj_open(name.encode('utf-8'), _get_pdcid())
+        name_bytes = name.encode('utf-8')
+        cdef const char *c_name = name_bytes
+        cdef pdcid_t pdc_id = _get_pdcid()
+        cdef pdcid_t id
+        with nogil:
+            id = cpdc.PDCobj_open(c_name, pdc_id)
         ctrace('obj_open', id, name.encode('utf-8'), _get_pdcid())
         if id == 0:
             raise PDCError('object not found or failed to open object')
@@ -541,37 +964,170 @@ class Object:
     def tags(self) -> KVTags:
         return ObjectKVTags(self)
     
-    def get_data(self, region:'Region'=None) -> TransferRequest:
+    def get_data(self, region:'Region'=None, *, out=None, copy:str='if_needed', coalesce:bool=False, pool:Optional[BufferPool]=None) -> TransferRequest:
         '''
+        get_data(self, region:'Region'=None, *, out=None, copy:str='if_needed', coalesce:bool=False, pool:Optional[BufferPool]=None)
         Request a region of data from an object
 
-        :param Region region: the region of data to get.  If this is None, defaults to the entire object.
-        :return: A transfer request representing this request
+        :param region: the region of data to get.  If this is None, defaults to the entire object.  If this is a :class:`RegionSet`, every box in it is requested in one batch.  Regions with step values or index arrays are read as a :class:`SelectionRequest`.
+        :type region: Region or RegionSet
+        :param out: If specified, the data is written into this buffer instead of a new array.  It can be any writable object that supports the buffer protocol (a numpy array or a view into one, a bytearray, a writable mmap, ...), and must have as many elements as the region, which are filled in C order whatever its shape.  Not supported for region sets.
+        :param str copy: ``'if_needed'`` (the default) transfers into a temporary array and copies it into ``out`` when ``out`` is not C contiguous, aligned, and of the object's type.  ``'never'`` raises a ValueError instead.
+        :param bool coalesce: For region sets, merge adjacent and overlapping boxes into fewer requests.  See :func:`RegionSet.coalesce`.
+        :param BufferPool pool: If specified and out is not, the data is read into an array from this pool.  Return it with :func:`TransferRequest.release` when done with it.  Not supported for region sets, or for regions with step values or index arrays.
+        :return: A transfer request representing this request, a :class:`RegionSetRequest` for region sets, a :class:`SelectionRequest` for regions with step values or index arrays, or a :class:`CachedRequest` if :attr:`block_cache` is enabled for this object
         :rtype: TransferRequest
         '''
+        _sync_write_buffers(self, region)
+        if isinstance(region, RegionSet):
+            if out is not None or pool is not None:
+                raise ValueError('out and pool are not supported for region sets')
+            from .transfer import RegionSetRequest
+            return RegionSetRequest(self, region, type(self).TransferRequest.RequestType.GET, coalesce=coalesce, copy=copy)
+        if isinstance(region, Region) and not region.is_box():
+            if pool is not None:
+                raise ValueError('pool is not supported for regions with step values or index arrays')
+            from .transfer import SelectionRequest
+            return SelectionRequest(self, region, type(self).TransferRequest.RequestType.GET, out=out, copy=copy)
+        block_cache = type(self).block_cache
+        if block_cache is not None and block_cache.is_enabled(self):
+            return block_cache.get(self, region, out=out, copy=copy, pool=pool)
         return type(self).TransferRequest(
             region if region else region_[:],
             self,
-            type(self).TransferRequest.RequestType.GET
+            type(self).TransferRequest.RequestType.GET,
+            out=out,
+            copy=copy,
+            pool=pool
         )
     
-    def set_data(self, data:npt.ArrayLike, region:'Region'=None) -> TransferRequest:
+    def set_data(self, data:npt.ArrayLike, region:'Region'=None, *, copy:str='if_needed', coalesce:bool=False) -> TransferRequest:
         '''
-        set_data(self, data, region:'Region'=None)
+        set_data(self, data, region:'Region'=None, *, copy:str='if_needed', coalesce:bool=False)
         Request a region of data from an object to be set to a new value
 
-        :param Region region: the region of data to set. Defaults to the entire object.
-        :param data: The data to set the region to.  It must be a numpy array or convertible to a numpy array with numpy.array().
-        :return: A TransferRequest representing this request
+        :param region: the region of data to set. Defaults to the entire object.  If this is a :class:`RegionSet`, every box in it is set in one batch.  Regions with step values or index arrays are written as a :class:`SelectionRequest`.
+        :type region: Region or RegionSet
+        :param data: The data to set the region to.  It must be a numpy array, an object supporting the buffer protocol (memoryview, bytearray, mmap, numpy.memmap, ...), or convertible to a numpy array with numpy.array().  Raw byte buffers are reinterpreted as the object's type.  The data must not be modified until the request is done.  For region sets, a sequence with the data of each box.
+        :param str copy: ``'if_needed'`` (the default) copies data that is not C contiguous, aligned, and of the object's type.  ``'never'`` raises a ValueError instead.
+        :param bool coalesce: For region sets, merge adjacent boxes into fewer requests.  The data of merged boxes is copied into one buffer.
+        :return: A TransferRequest representing this request, a :class:`RegionSetRequest` for region sets, or a :class:`SelectionRequest` for regions with step values or index arrays
         :rtype: TransferRequest
         '''
+        _sync_write_buffers(self, region)
+        if isinstance(region, RegionSet):
+            from .transfer import RegionSetRequest
+            return RegionSetRequest(self, region, type(self).TransferRequest.RequestType.SET, data, coalesce=coalesce, copy=copy)
+        if isinstance(region, Region) and not region.is_box():
+            from .transfer import SelectionRequest
+            return SelectionRequest(self, region, type(self).TransferRequest.RequestType.SET, data, copy=copy)
         return type(self).TransferRequest(
             region if region else region_[:],
             self,
             type(self).TransferRequest.RequestType.SET,
-            data
+            data,
+            copy=copy
         )
     
+    def buffered_writer(self, *, max_bytes:int=16 * 1024 * 1024, max_delay:Optional[float]=None) -> 'WriteBuffer':
+        '''
+        | Create a :class:`WriteBuffer`, which merges many small writes to this object into fewer, larger transfers.
+        | Use it as a context manager, or call :func:`WriteBuffer.wait` when done writing.
+
+        :param int max_bytes: flush once the buffered writes hold at least this many bytes
+        :param float max_delay: flush once the oldest buffered write is this many seconds old, or None to only flush on size
+        '''
+        from .transfer import WriteBuffer
+        return WriteBuffer(self, max_bytes=max_bytes, max_delay=max_delay)
+
+    def iter_chunks(self, region:'Region'=None, chunk_shape:Optional[Tuple[uint64, ...]]=None, *, prefetch:int=2, recycle:bool=False) -> Iterator[Tuple['Region', npt.NDArray]]:
+        '''
+        | Iterate over a region of this object in chunks, while keeping ``prefetch`` GET requests in flight ahead of the consumer.
+        | At most ``prefetch + 1`` chunks are held in memory at once, so objects larger than memory can be scanned at network speed.
+
+        Usage::
+
+            for chunk_region, data in obj.iter_chunks(chunk_shape=(1024, 1024), prefetch=4):
+                process(data)
+
+        :param Region region: the region to iterate over.  If this is None, defaults to the entire object.
+        :param chunk_shape: the maximum shape of each chunk.  See :func:`Region.tiles`.  Defaults to whole rows, about 16MiB per chunk.
+        :param int prefetch: the number of chunks to request ahead of the one being consumed.
+        :param bool recycle: If True, chunks are read into a fixed ring of ``prefetch + 1`` buffers instead of new arrays.  Each yielded array is only valid until the next iteration.
+        :return: An iterator of (chunk region, data) pairs, where chunk region is an absolute region.
+        '''
+        checktype(prefetch, 'prefetch', int)
+        if prefetch < 1:
+            raise ValueError('prefetch must be at least 1')
+        dims = self.dims
+        if region is None:
+            region = region_[:]
+        checktype(region, 'region', Region)
+        dtype = self.type.as_numpy_type()
+        if chunk_shape is None:
+            _, sizes = region._bounds(dims)
+            chunk_shape = _default_chunk_shape(sizes, dtype.itemsize)
+        checktype(chunk_shape, 'chunk shape', tuple)
+        tiles = region.tiles(dims, chunk_shape)
+
+        ring = None
+        if recycle:
+            _, sizes = region._bounds(dims)
+            chunk_elements = int(np.prod([min(c, s) for c, s in zip(chunk_shape + sizes[len(chunk_shape):], sizes)], dtype=np.int64))
+            ring = [np.empty(chunk_elements, dtype=dtype) for _ in range(prefetch + 1)]
+        
+        def requests():
+            for issued, tile in enumerate(tiles):
+                out = None
+                if ring is not None:
+                    _, tile_sizes = tile._bounds(dims)
+                    out = ring[issued % len(ring)][:int(np.prod(tile_sizes, dtype=np.int64))].reshape(tile_sizes)
+                yield tile, self.get_data(tile, out=out, copy='never')
+        
+        yield from _in_flight(requests(), prefetch)
+    
+    def export(self, path:Union[str, os.PathLike], region:'Region'=None, *, chunk_shape:Optional[Tuple[uint64, ...]]=None, prefetch:int=2, format:Optional[str]=None) -> Tuple[int, ...]:
+        '''
+        | Write a region of this object to a file chunk by chunk, so objects larger than memory can be saved.
+        | Chunks are transferred directly into a memory mapping of the file when they are contiguous in it, which they are with the default chunk shape.  Otherwise, at most ``prefetch + 1`` chunks are held in memory.
+
+        :param path: the file to write.  It is created, or overwritten if it exists.
+        :param Region region: the region to export.  If this is None, defaults to the entire object.
+        :param chunk_shape: the maximum shape of each chunk.  See :func:`iter_chunks`.
+        :param int prefetch: the number of chunks to keep in flight.
+        :param str format: ``'npy'`` writes a .npy file that ``numpy.load`` can read.  ``'raw'`` writes only the data, in C order.  Defaults to ``'npy'`` if path ends with .npy, and ``'raw'`` otherwise.
+        :return: the shape of the exported data
+        '''
+        checktype(prefetch, 'prefetch', int)
+        if prefetch < 1:
+            raise ValueError('prefetch must be at least 1')
+        format = _file_format(path, format)
+        dims = self.dims
+        if region is None:
+            region = region_[:]
+        checktype(region, 'region', Region)
+        dtype = self.type.as_numpy_type()
+        offsets, sizes = region._bounds(dims)
+        if chunk_shape is None:
+            chunk_shape = _default_chunk_shape(sizes, dtype.itemsize)
+        checktype(chunk_shape, 'chunk shape', tuple)
+        
+        if format == 'npy':
+            mapped = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=sizes)
+        else:
+            mapped = np.memmap(path, mode='w+', dtype=dtype, shape=sizes)
+        
+        def requests():
+            for tile in region.tiles(dims, chunk_shape):
+                tile_offsets, tile_sizes = tile._bounds(dims)
+                out = mapped[tuple(slice(t - o, t - o + s) for t, o, s in zip(tile_offsets, offsets, tile_sizes))]
+                yield tile, self.get_data(tile, out=out)
+        
+        for _ in _in_flight(requests(), prefetch):
+            pass
+        mapped.flush()
+        return sizes
+
     def delete(self):
         '''
         Delete this Object.
@@ -582,3 +1138,43 @@ class Object:
         if rtn != 0:
             raise PDCError('failed to delete object')
         #leave self._id as is, because we still need to finalize
+
+def _tag_column(values:list) -> np.ndarray:
+    #an array of bools, numbers, or strings if every value is one, otherwise an array of objects
+    if values and all(isinstance(v, (bool, np.bool_)) for v in values):
+        return np.array(values, dtype=bool)
+    if values and all(isinstance(v, (int, np.integer)) and not isinstance(v, (bool, np.bool_)) for v in values):
+        if all(-2**63 <= v < 2**63 for v in values):
+            return np.array(values, dtype=np.int64)
+    elif values and all(isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, (bool, np.bool_)) for v in values):
+        return np.array(values, dtype=np.float64)
+    elif values and all(isinstance(v, str) for v in values):
+        return np.array(values, dtype=str)
+    column = np.empty(len(values), dtype=object)
+    for i, v in enumerate(values):
+        column[i] = v
+    return column
+
+def bulk_get_tags(objects:Iterable[Object], names:Iterable[str], *, default=None) -> Dict[str, np.ndarray]:
+    '''
+    | Get the same tags of many objects, as columns.
+    | Tags are read through the tag cache of each object it is enabled for (see :func:`KVTags.enable_cache`).
+
+    Usage::
+
+        columns = pdc.bulk_get_tags(objects, ['run', 'energy'])
+        selected = columns['energy'] > 2.5
+
+    :param objects: the objects to read the tags of
+    :param names: the names of the tags
+    :param default: the value of tags an object doesn't have
+    :return: A dict from each name to an array of the values of that tag, one per object, in order.  Columns of only bools, ints, floats, or strings have the matching numpy type, and other columns are arrays of objects.
+    '''
+    names = list(names)
+    columns = {name: [] for name in names}
+    for obj in objects:
+        checktype(obj, 'object', Object)
+        values = obj.tags.get_many(names, default)
+        for name in columns:
+            columns[name].append(values[name])
+    return {name: _tag_column(values) for name, values in columns.items()}
@@ -1,20 +1,102 @@
 import abc
 import collections.abc
 from abc import ABC, abstractmethod
-from typing import TypeVar, Iterable, Tuple
+from typing import TypeVar, Iterable, List, Optional, Tuple
 from enum import Enum
-from weakref import finalize
+from weakref import finalize, WeakKeyDictionary, WeakSet, WeakValueDictionary
+import bisect
+import hashlib
 import builtins
+import sys
 
+import numpy as np
 import numpy.typing as npt
 
-from pdc.cpdc cimport pdc_query_combine_op_t, pdc_query_op_t, pdc_kvtag_t, uint64_t, pdc_query_t, int16_t, int8_t, uint64_t, int64_t, pdc_selection_t, pdcid_t, pdc_region_info
+from pdc.cpdc cimport perr_t, pdc_query_combine_op_t, pdc_query_op_t, pdc_kvtag_t, uint64_t, pdc_query_t, int16_t, int8_t, uint64_t, int64_t, pdc_selection_t, pdcid_t, pdc_region_info, pdc_var_type_t
 cimport pdc.cpdc as cpdc
-from .main import PDCError, checktype, KVTags, Type, uint64, ctrace, pdcid
+from .main import PDCError, checktype, KVTags, Type, uint64, ctrace, pdcid, _write_hooks, _LRUCache, _tag_hooks
 from pdc.main cimport malloc_or_memerr
 from .region import region, Region
 from .region import region as region_
 from pdc.region cimport construct_region_info, free_region_info
+from cpython.buffer cimport PyBUF_WRITABLE
+from libc.string cimport memcpy
+
+cdef class _SelectionCoords:
+    '''
+    Exposes the coordinates of a pdc_selection_t through the buffer protocol without copying them.
+    Holds a reference to the Result that owns the selection, so the selection outlives every array made from this.
+    '''
+    cdef object result
+    cdef pdc_selection_t *sel
+    cdef Py_ssize_t shape[2]
+    cdef Py_ssize_t strides[2]
+
+    def __cinit__(self, result):
+        self.result = result
+        self.sel = <pdc_selection_t *> <size_t> result._id
+        self.shape[0] = self.sel[0].nhits
+        self.shape[1] = self.sel[0].ndim
+        self.strides[0] = sizeof(uint64_t) * self.sel[0].ndim
+        self.strides[1] = sizeof(uint64_t)
+
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        if flags & PyBUF_WRITABLE:
+            raise BufferError('query result coordinates are read-only')
+        buffer.buf = <void *> self.sel[0].coords
+        buffer.format = 'Q'
+        buffer.internal = NULL
+        buffer.itemsize = sizeof(uint64_t)
+        buffer.len = self.shape[0] * self.shape[1] * sizeof(uint64_t)
+        buffer.ndim = 2
+        buffer.obj = self
+        buffer.readonly = 1
+        buffer.shape = self.shape
+        buffer.strides = self.strides
+        buffer.suboffsets = NULL
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        pass
+
+cdef size_t _pack_value(object obj_type, object other, double *storage) except 0:
+    '''
+    Convert other to obj_type's C type, and store it in the first bytes of storage.
+    Returns the size of the C type.
+    '''
+    if obj_type in (Type.FLOAT, Type.DOUBLE):
+        checktype(other, 'value', float)
+    else:
+        checktype(other, 'value', int)
+    cdef void *ptr = storage
+    try:
+        if obj_type == Type.INT32:
+            (<int *> ptr)[0] = other
+            return sizeof(int)
+        elif obj_type == Type.UINT32:
+            (<unsigned int *> ptr)[0] = other
+            return sizeof(unsigned int)
+        elif obj_type == Type.FLOAT:
+            (<float *> ptr)[0] = other
+            return sizeof(float)
+        elif obj_type == Type.DOUBLE:
+            (<double *> ptr)[0] = other
+            return sizeof(double)
+        elif obj_type == Type.INT64:
+            (<int64_t *> ptr)[0] = other
+            return sizeof(int64_t)
+        elif obj_type == Type.UINT64:
+            (<uint64_t *> ptr)[0] = other
+            return sizeof(uint64_t)
+        elif obj_type == Type.INT16:
+            (<int16_t *> ptr)[0] = other
+            return sizeof(int16_t)
+        elif obj_type == Type.INT8:
+            (<int8_t *> ptr)[0] = other
+            return sizeof(int8_t)
+        else:
+            raise ValueError(f'Unknown PDC type: {obj_type.name}')
+    except OverflowError:
+        raise OverflowError(f'value {other} is not within the acceptable range for {obj_type.name}') from None
 
 class Query(ABC):
     class Result:
@@ -27,12 +109,46 @@ class Query(ABC):
         '''
 
         def __getitem__(self, obj: 'Object') -> npt.NDArray:
-            pass
+            '''
+            Get the values of an object's data at every hit of the query, as a 1 dimensional array.
+            The object must be one of the objects in the query.
+            '''
+            if obj not in self._query.objects:
+                raise KeyError(f'object {obj.name} is not part of this query')
+            if obj._id in self._values:
+                return self._values[obj._id]
+
+            out = np.empty(self.hits, dtype=obj.type.as_numpy_type())
+            cdef pdc_selection_t *selection = <pdc_selection_t *> <size_t> self._id
+            cdef pdcid_t obj_id = obj._id
+            cdef void *buf = <void *> <size_t> out.ctypes.data
+            cdef perr_t rtn = 0
+            if self.hits:
+                with nogil:
+                    rtn = cpdc.PDCquery_get_data(obj_id, selection, buf)
+                ctrace('query_get_data', rtn, obj_id, self._id, out.ctypes.data)
+            if rtn != 0:
+                raise PDCError(f'Failed to get query data for object {obj.name}')
+            out.flags.writeable = False
+            self._values[obj._id] = out
+            return out
+        
+        @property
+        def coords(self) -> npt.NDArray:
+            '''
+            | The coordinates of every hit of the query, as a read-only (hits, ndim) array of uint64.
+            | The array shares memory with the result, and keeps it alive.
+            '''
+            cdef pdc_selection_t *selection = <pdc_selection_t *> <size_t> self._id
+            if selection[0].nhits == 0 or selection[0].coords == NULL:
+                return np.empty((0, len(self._query.mindims)), dtype=np.uint64)
+            return np.asarray(_SelectionCoords(self))
                 
         def __init__(self, id:pdcid, query:'Query'):
             self._id = id
             finalize(self, type(self)._finalize, self._id)
             self._query = query
+            self._values = {}
             self.hits = (<pdc_selection_t *> <size_t> id)[0].nhits
         
         @staticmethod
@@ -41,6 +157,35 @@ class Query(ABC):
             ctrace('selection_free', rtn, id)
         
 
+    class LocalResult:
+        '''
+        | Result of a query evaluated on the client.  See the ``engine`` parameter of :func:`Query.get_result`.
+        | It has the same interface as :class:`Query.Result`.
+        '''
+
+        def __init__(self, query:'Query', coords:npt.NDArray, values:dict):
+            coords.flags.writeable = False
+            self._query = query
+            self._coords = coords
+            self._values = values
+            self.hits = len(coords)
+        
+        def __getitem__(self, obj: 'Object') -> npt.NDArray:
+            '''
+            Get the values of an object's data at every hit of the query, as a 1 dimensional array.
+            The object must be one of the objects in the query.
+            '''
+            if obj not in self._query.objects:
+                raise KeyError(f'object {obj.name} is not part of this query')
+            return self._values[obj._id]
+        
+        @property
+        def coords(self) -> npt.NDArray:
+            '''
+            The coordinates of every hit of the query, as a read-only (hits, ndim) array of uint64.
+            '''
+            return self._coords
+
     class _CombineOp(Enum):
         NONE = pdc_query_combine_op_t.PDC_QUERY_NONE
         AND = pdc_query_combine_op_t.PDC_QUERY_AND
@@ -50,6 +195,9 @@ class Query(ABC):
         self._id = id
         finalize(self, type(self)._finalize, self._id)
         self.op = op
+        self._right = None
+        self._value = None
+        self._range = None
         if left is not None and right is None:
             #leaf
             self._left = left
@@ -72,54 +220,62 @@ class Query(ABC):
     def _from_comparison(cls, obj:'Object', op:'QueryComponent._CompareOp', other:builtins.object) -> 'Query':
         obj_type = obj.type
         #trust op to be the right type
-        cdef int int_
-        cdef unsigned int uint_
-        cdef float float_
-        cdef double double_
-        cdef int64_t int64_
-        cdef uint64_t uint64_ 
-        cdef int16_t int16_
-        cdef int8_t int8_
-        cdef void *ptr
-        if obj_type in (Type.FLOAT, Type.DOUBLE):
-            checktype(other, 'value', float)
-        else:
-            checktype(other, 'value', int)
-        try:
-            if obj_type == Type.INT32:
-                int_ = other
-                ptr = &int_
-            elif obj_type == Type.UINT32:
-                uint_ = other
-                ptr = &uint_
-            elif obj_type == Type.FLOAT:
-                float_ = other
-                ptr = &float_ 
-            elif obj_type == Type.DOUBLE:
-                double_ = other
-                ptr = &double_ 
-            elif obj_type == Type.INT64:
-                int64_ = other
-                ptr = &int64_ 
-            elif obj_type == Type.UINT64:
-                uint64_ = other
-                ptr = &uint64_ 
-            elif obj_type == Type.INT16:
-                int16_ = other
-                ptr = &int16_ 
-            elif obj_type == Type.INT8:
-                int8_ = other
-                ptr = &int8_ 
-            else:
-                raise ValueError(f'Unknown PDC type: {obj_type.name}')
-        except OverflowError:
-            raise OverflowError(f'value {other} is not within the acceptable range for {obj_type.name}') from None
-        cdef pdc_query_t *query_struct = cpdc.PDCquery_create(obj._id, op.value, obj_type.value, ptr)
+        cdef double storage
+        _pack_value(obj_type, other, &storage)
+        cdef pdc_query_t *query_struct = cpdc.PDCquery_create(obj._id, op.value, obj_type.value, &storage)
         ctrace('query_create', <uint64_t> query_struct, obj._id, op.name, obj_type.name, other)
         if query_struct == NULL:
             raise PDCError('Failed to create query')
         
-        return cls(<uint64_t> query_struct, op, obj)
+        query = cls(<uint64_t> query_struct, op, obj)
+        query._value = other
+        return query
+    
+    @classmethod
+    def _from_range(cls, obj:'Object', low_op:'QueryComponent._CompareOp', low:builtins.object, high_op:'QueryComponent._CompareOp', high:builtins.object) -> 'Query':
+        '''
+        Create a single range constraint: ``low low_op obj.data high_op high``, evaluated by the server as one constraint.
+        '''
+        obj_type = obj.type
+        cdef double low_storage, high_storage
+        _pack_value(obj_type, low, &low_storage)
+        cdef size_t size = _pack_value(obj_type, high, &high_storage)
+        cdef pdc_query_t *query_struct = cpdc.PDCquery_create(obj._id, low_op.value, obj_type.value, &low_storage)
+        ctrace('query_create', <uint64_t> query_struct, obj._id, low_op.name, obj_type.name, low)
+        if query_struct == NULL:
+            raise PDCError('Failed to create query')
+        
+        #PDCquery_create stores the value's bytes in the double field, so value2 is stored the same way
+        query_struct[0].constraint[0].is_range = 1
+        query_struct[0].constraint[0].op2 = high_op.value
+        memcpy(&query_struct[0].constraint[0].value2, &high_storage, size)
+        ctrace('query_set_range', 0, <uint64_t> query_struct, high_op.name, high)
+        
+        query = cls(<uint64_t> query_struct, low_op, obj)
+        query._range = (low_op, low, high_op, high)
+        return query
+    
+    def _bound(self):
+        '''
+        If this is a comparison leaf that bounds its object from one side, returns ('low'|'high', op, value), otherwise None
+        '''
+        if self._right is not None or self._value is None:
+            return None
+        if self.op in (QueryComponent._CompareOp.GT, QueryComponent._CompareOp.GTE):
+            return 'low', self.op, self._value
+        if self.op in (QueryComponent._CompareOp.LT, QueryComponent._CompareOp.LTE):
+            return 'high', self.op, self._value
+        return None
+    
+    def _fuse_range(self, other:'Query') -> 'Query':
+        '''
+        If self and other are a lower and upper bound on the same object, returns a single range query equivalent to ``self & other``, otherwise None
+        '''
+        bound, other_bound = self._bound(), other._bound()
+        if bound is None or other_bound is None or self._left is not other._left or bound[0] == other_bound[0]:
+            return None
+        low, high = (bound, other_bound) if bound[0] == 'low' else (other_bound, bound)
+        return Query._from_range(self._left, low[1], low[2], high[1], high[2])
 
     @staticmethod
     def _finalize(id):
@@ -136,6 +292,9 @@ class Query(ABC):
             query_struct = cpdc.PDCquery_or(<pdc_query_t *> <size_t> self._id, <pdc_query_t *> <size_t> other._id)
             ctrace('query_or', <uint64_t> query_struct, self._id, other._id)
         elif op == Query._CombineOp.AND:
+            fused = self._fuse_range(other)
+            if fused is not None:
+                return fused
             query_struct = cpdc.PDCquery_and(<pdc_query_t *> <size_t> self._id, <pdc_query_t *> <size_t> other._id)
             ctrace('query_and', <uint64_t> query_struct, self._id, other._id)
         else:
@@ -152,48 +311,397 @@ class Query(ABC):
     def __or__(self, other: 'Query') -> 'Query':
         return self._combine(other, Query._CombineOp.OR)
     
-    def get_num_hits(self, region:'Region' = None) -> int:
+    def _clone(self) -> 'Query':
+        '''
+        Copy this query's tree, so a region can be selected on the copy without changing this query or queries that share its subqueries.
+        '''
+        cdef pdc_query_t *source = <pdc_query_t *> <size_t> self._id
+        cdef pdc_query_t *query_struct
+        if self._right is not None:
+            left = self._left._clone()
+            right = self._right._clone()
+            if self.op == Query._CombineOp.AND:
+                query_struct = cpdc.PDCquery_and(<pdc_query_t *> <size_t> left._id, <pdc_query_t *> <size_t> right._id)
+                ctrace('query_and', <uint64_t> query_struct, left._id, right._id)
+            else:
+                query_struct = cpdc.PDCquery_or(<pdc_query_t *> <size_t> left._id, <pdc_query_t *> <size_t> right._id)
+                ctrace('query_or', <uint64_t> query_struct, left._id, right._id)
+            if query_struct == NULL:
+                raise PDCError('Failed to copy query')
+            return Query(<uint64_t> query_struct, self.op, left, right)
+        
+        query_struct = cpdc.PDCquery_create(source[0].constraint[0].obj_id, source[0].constraint[0].op, source[0].constraint[0].type, &source[0].constraint[0].value)
+        ctrace('query_create', <uint64_t> query_struct, self._left._id, self.op.name, self._left.type.name, self._value)
+        if query_struct == NULL:
+            raise PDCError('Failed to copy query')
+        query_struct[0].constraint[0].is_range = source[0].constraint[0].is_range
+        query_struct[0].constraint[0].op2 = source[0].constraint[0].op2
+        query_struct[0].constraint[0].value2 = source[0].constraint[0].value2
+        query = Query(<uint64_t> query_struct, self.op, self._left)
+        query._value = self._value
+        query._range = self._range
+        return query
+    
+    def _select_region(self, region:'Region') -> 'Query':
+        '''
+        Returns the query to evaluate over region: this query if region is None, otherwise a copy of this query with the region selected.
+        '''
+        cdef pdc_region_info *region_info
+        if region is None:
+            return self
+        if not self.all_same and not region.is_absolute():
+            raise ValueError('Cannot query over a non-absolute region with objects of different dimensions')
+        
+        try:
+            region_info = construct_region_info(region, self.mindims)
+        except ValueError as e:
+            raise ValueError(f'Region {region} is out of bounds for one or more objects in this query') from e
+        
+        try:
+            #PDCquery_sel_region changes the query in place, so select on a copy
+            query = self._clone()
+            rtn = cpdc.PDCquery_sel_region(<pdc_query_t *> <size_t> query._id, region_info)
+            ctrace('query_sel_region', rtn, query._id, <size_t> region_info)
+            if rtn != 0:
+                raise PDCError(f'Failed to select region {region} for query')
+        finally:
+            free_region_info(region_info)
+        return query
+    
+    def _canonical(self) -> tuple:
+        #a hashable form of this query that is the same for equivalent trees, regardless of the order of AND and OR operands
+        if self._right is None:
+            if self._range is not None:
+                low_op, low, high_op, high = self._range
+                return ('range', self._left._id, low_op.name, low, high_op.name, high)
+            return (self.op.name, self._left._id, self._value)
+        children = sorted((q._canonical() for q in _flatten(self, self.op)), key=repr)
+        return (self.op.name,) + tuple(children)
+    
+    def _bounds(self, region:'Region') -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        #the absolute offsets and sizes of the part of the objects that a query over region covers
+        if region is None:
+            return (0,) * len(self.mindims), tuple(self.mindims)
+        if not self.all_same and not region.is_absolute():
+            raise ValueError('Cannot query over a non-absolute region with objects of different dimensions')
+        offsets, sizes = region._bounds(self.mindims)
+        return tuple(offsets), tuple(sizes)
+    
+    def _cache_key(self, region:'Region', kind:str) -> tuple:
+        offsets, sizes = self._bounds(region)
+        return (kind, self._canonical(), offsets, sizes)
+    
+    def _local_arrays(self, region:'Region', engine:str) -> Optional[dict]:
+        '''
+        The data of every object in this query over region, by object, if the query should be evaluated locally, otherwise None.
+        '''
+        checktype(engine, 'engine', str)
+        if engine not in _engines:
+            raise ValueError(f'invalid engine: {engine!r}, expected one of {_engines}')
+        if engine == 'server':
+            return None
+        offsets, sizes = self._bounds(region)
+        arrays = {}
+        for obj in self.objects:
+            data = _local_data(obj, offsets, sizes)
+            if data is None:
+                if engine == 'local':
+                    raise ValueError(f'the data of object {obj.name} is not available on the client.  See Object.pin')
+                return None
+            arrays[obj] = data
+        return arrays
+    
+    def _mask(self, arrays:dict) -> npt.NDArray:
+        #evaluate this query with numpy, as a boolean array
+        if self._right is None:
+            data = arrays[self._left]
+            if self._range is not None:
+                low_op, low, high_op, high = self._range
+                return _compare(data, low_op, low) & _compare(data, high_op, high)
+            return _compare(data, self.op, self._value)
+        if self.op == Query._CombineOp.AND:
+            return self._left._mask(arrays) & self._right._mask(arrays)
+        return self._left._mask(arrays) | self._right._mask(arrays)
+    
+    def _local_result(self, region:'Region', arrays:dict, planned:Optional['Query']=None) -> 'Query.LocalResult':
+        #planned, if given, is an equivalent query used for the mask.  Values are still taken for every object of this query
+        offsets, _ = self._bounds(region)
+        mask = (self if planned is None else planned)._mask(arrays)
+        coords = np.argwhere(mask).astype(np.uint64)
+        coords += np.asarray(offsets, dtype=np.uint64)
+        values = {}
+        for obj, data in arrays.items():
+            value = data[mask]
+            value.flags.writeable = False
+            values[obj._id] = value
+        return Query.LocalResult(self, coords, values)
+    
+    def get_num_hits(self, region:'Region' = None, plan:bool = False, cache:bool = False, engine:str = 'auto') -> int:
         '''
         Get number of hits for this query (i.e. number of elements that match this query)
+        This is cheaper than :func:`get_result`, because the coordinates of the hits are not transferred.
 
         :param Region region: The region to query over.  If this is None, the entire object is queried.
+        :param bool plan: If True, the query is optimized with :func:`plan` first.
+        :param bool cache: If True, a previous result of an equivalent query over the same region is reused if there is one.  See :attr:`cache`.
+        :param str engine: Where the query is evaluated.  See :func:`get_result`.
         :return: number of hits
         '''
-        pass
+        if cache:
+            #a cached result also has the number of hits.  Checked without get, so its absence isn't counted as a miss
+            key = self._cache_key(region, 'result')
+            if key in Query.cache:
+                return Query.cache.get(key).hits
+            key = self._cache_key(region, 'hits')
+            cached = Query.cache.get(key)
+            if cached is None:
+                cached = self.get_num_hits(region, plan, engine=engine)
+                Query.cache.add(key, self, cached, 8)
+            return cached
+        if plan:
+            planned = self.plan()
+            if planned is None:
+                return 0
+            if planned is not self:
+                return planned.get_num_hits(region, engine=engine)
+        arrays = self._local_arrays(region, engine)
+        if arrays is not None:
+            return int(np.count_nonzero(self._mask(arrays)))
+        selected = self._select_region(region)
+        cdef pdc_query_t *query_struct = <pdc_query_t *> <size_t> selected._id
+        cdef uint64_t nhits = 0
+        cdef perr_t rtn
+        with nogil:
+            rtn = cpdc.PDCquery_get_nhits(query_struct, &nhits)
+        ctrace('query_get_nhits', rtn, selected._id, nhits)
+        if rtn != 0:
+            raise PDCError('Failed to get number of hits for query')
+        return nhits
     
-    def get_result(self, region:'Region' = None) -> Result:
+    def get_result(self, region:'Region' = None, plan:bool = False, cache:bool = False, engine:str = 'auto') -> Result:
         '''
         Get the result of this query
 
         :param Region region: The region to query over.  If this is None, the entire object is queried.
-        :return: the Result object
+        :param bool plan: If True, the query is optimized with :func:`plan` first.
+        :param bool cache: If True, a previous result of an equivalent query over the same region is reused if there is one, and the result is stored for reuse.  See :attr:`cache`.
+        :param str engine: Where the query is evaluated.
+            ``'server'`` always sends the query to the server.
+            ``'local'`` evaluates it with numpy on data held by the client (see :func:`Object.pin`), and raises ValueError if some of the data is not available.
+            ``'auto'`` evaluates it locally if all of the data is available, and on the server otherwise.
+        :return: the Result object, or a :class:`LocalResult` if the query was evaluated locally
         '''
-        cdef pdcid_t region_id
-        cdef pdc_region_info *region_info
-        if region is not None:
-            if not self.all_same and not region.is_absolute():
-                raise ValueError('Cannot query over a non-absolute region with objects of different dimensions')
-            
-            try:
-                region_info = construct_region_info(region, self.mindims)
-            except ValueError as e:
-                raise ValueError(f'Region {region} is out of bounds for one or more objects in this query') from e
-            
-            try:
-                rtn = cpdc.PDCquery_sel_region(<pdc_query_t *> <size_t> self._id, region_info)
-                ctrace('query_sel_region', rtn, self._id, <size_t> region_info)
-                if rtn != 0:
-                    raise PDCError(f'Failed to select region {region} for query')
-            finally:
-                free_region_info(region_info)
-        
-        cdef pdc_selection_t *selection = <pdc_selection_t *> malloc_or_memerr(sizeof(pdc_selection_t))
-        rtn = cpdc.PDCquery_get_selection(<pdc_query_t *> <size_t> self._id, selection)
-        ctrace('query_get_selection', rtn, self._id, <size_t> selection)
+        cdef pdc_selection_t *selection
+        if cache:
+            key = self._cache_key(region, 'result')
+            result = Query.cache.get(key)
+            if result is None:
+                result = self.get_result(region, plan, engine=engine)
+                #the coordinates, and at most one array of values per object
+                nbytes = result.hits * 8 * (len(self.mindims) + len(self.objects))
+                Query.cache.add(key, self, result, nbytes)
+            return result
+        if plan:
+            planned = self.plan()
+            if planned is None:
+                #nothing can match, so don't ask the server
+                values = {obj._id: np.empty(0, dtype=obj.type.as_numpy_type()) for obj in self.objects}
+                return Query.LocalResult(self, np.empty((0, len(self.mindims)), dtype=np.uint64), values)
+            if planned is not self:
+                #the plan may drop objects of this query, which must still have values in the result
+                arrays = self._local_arrays(region, engine)
+                if arrays is not None:
+                    return self._local_result(region, arrays, planned)
+                result = planned.get_result(region, engine='server')
+                result._query = self
+                return result
+        arrays = self._local_arrays(region, engine)
+        if arrays is not None:
+            return self._local_result(region, arrays)
+        selected = self._select_region(region)
+        selection = <pdc_selection_t *> malloc_or_memerr(sizeof(pdc_selection_t))
+        cdef pdc_query_t *query_struct = <pdc_query_t *> <size_t> selected._id
+        cdef perr_t sel_rtn
+        with nogil:
+            sel_rtn = cpdc.PDCquery_get_selection(query_struct, selection)
+        rtn = sel_rtn
+        ctrace('query_get_selection', rtn, selected._id, <size_t> selection)
         if rtn != 0:
             raise PDCError(f'Failed to get selection for query')
         
         return type(self).Result(<uint64_t> selection, self)
+    
+    def _plan_tree(self) -> '_PlanNode':
+        if self._right is None:
+            return _PlanNode.leaf(self)
+        children = [q._plan_tree() for q in _flatten(self, self.op)]
+        if self.op == Query._CombineOp.AND:
+            return _PlanNode.conjunction(children)
+        else:
+            return _PlanNode.disjunction(children)
+    
+    def plan(self) -> Optional['Query']:
+        '''
+        | Optimize this query using the statistics of its objects.  See :class:`ObjectStatistics`.
+        | Subqueries that are always true or always false according to the objects' minimum and maximum are removed,
+        | bounds on the same object are merged into range constraints, and the clauses of each AND are reordered so the most selective runs first.
+        | Objects without statistics are assumed to match half of their elements.
+
+        :return: An equivalent query, this query if there is nothing to optimize, or None if the query can't match any element.
+        '''
+        node = self._plan_tree()
+        if node.kind == 'false':
+            return None
+        if node.kind == 'true':
+            #a query has to have at least one constraint
+            return self
+        planned = node.build()
+        return self if planned is None else planned
+    
+    def explain(self, region:'Region' = None, file=None) -> None:
+        '''
+        Print the plan that :func:`plan` would choose, with the estimated number of hits of every clause.
+
+        :param Region region: The region the query would be run over.  Used to scale the estimates.
+        :param file: where to print the plan.  Defaults to sys.stdout.
+        '''
+        if region is None:
+            n = int(np.prod(self.mindims, dtype=np.int64))
+        else:
+            _, sizes = region._bounds(self.mindims)
+            n = int(np.prod(sizes, dtype=np.int64))
+        node = self._plan_tree()
+        print('\n'.join(node.describe(n)), file=sys.stdout if file is None else file)
+
+class QueryCache:
+    '''
+    | Results of queries run with ``cache=True``, keyed by the query's tree and the region it was run over.
+    | Equivalent trees share an entry: ``(a & b) & c`` and ``c & (b & a)`` hit the same result.
+    | The least recently used results are evicted once the results hold more than :attr:`max_bytes`.
+    | Setting data in an object through this client discards cached results that involve that object and overlap the region that was set.
+    | Writes by other clients are not seen, so call :func:`clear` if another process may have changed the data.
+    '''
+    
+    def __init__(self, max_bytes:int = 64 * 1024 * 1024):
+        self._lru = _LRUCache(max_bytes)
+        #for each key: (objects, offsets, sizes)
+        self._extents = {}
+    
+    def get(self, key):
+        return self._lru.get(key)
+    
+    def __contains__(self, key) -> bool:
+        return key in self._lru
+    
+    def add(self, key, query:Query, value, nbytes:int) -> None:
+        self._lru.put(key, value, nbytes)
+        self._extents[key] = (frozenset(obj._id for obj in query.objects), key[2], key[3])
+        if len(self._extents) > 2 * len(self._lru) + 16:
+            self._extents = {k: v for k, v in self._extents.items() if k in self._lru}
+    
+    def invalidate(self, obj:'Object', region:'Region' = None) -> None:
+        '''
+        Discard cached results that involve obj and overlap region.  If region is None, every cached result involving obj is discarded.
+        '''
+        if region is None:
+            offsets, sizes = (0,) * len(obj.dims), tuple(obj.dims)
+        else:
+            offsets, sizes = region._bounds(obj.dims)
+        
+        def overlaps(key, value):
+            extent = self._extents.get(key)
+            if extent is None or obj._id not in extent[0]:
+                return False
+            _, query_offsets, query_sizes = extent
+            return all(
+                o < qo + qs and qo < o + s
+                for o, s, qo, qs in zip(offsets, sizes, query_offsets, query_sizes)
+            )
+        
+        self._lru.discard_if(overlaps)
+    
+    def clear(self) -> None:
+        '''
+        Discard every cached result.
+        '''
+        self._lru.clear()
+        self._extents.clear()
+    
+    @property
+    def max_bytes(self) -> int:
+        '''
+        The maximum total size of the cached results, in bytes.  Can be set.
+        '''
+        return self._lru.max_bytes
+    
+    @max_bytes.setter
+    def max_bytes(self, max_bytes:int) -> None:
+        checktype(max_bytes, 'max_bytes', int)
+        self._lru.resize(max_bytes)
+    
+    @property
+    def nbytes(self) -> int:
+        '''
+        The total size of the cached results, in bytes.
+        '''
+        return self._lru.nbytes
+    
+    @property
+    def hits(self) -> int:
+        return self._lru.hits
+    
+    @property
+    def misses(self) -> int:
+        return self._lru.misses
+    
+    def __len__(self) -> int:
+        return len(self._lru)
+
+#: Results of queries run with ``cache=True``
+Query.cache = QueryCache()
+
+def _invalidate_results(obj, region):
+    Query.cache.invalidate(obj, region)
+
+_write_hooks.append(_invalidate_results)
+
+_engines = ('auto', 'server', 'local')
+
+def _pinned_data(obj:'Object', offsets:Tuple[int, ...], sizes:Tuple[int, ...]) -> Optional[npt.NDArray]:
+    pinned = obj.pinned
+    if pinned is None:
+        return None
+    return pinned[tuple(slice(o, o + s) for o, s in zip(offsets, sizes))]
+
+#functions called as source(obj, offsets, sizes) that return the data of a box of an object if the client holds it, otherwise None.
+#The query engine uses the first one that has the data.
+_local_sources = [_pinned_data]
+
+def _local_data(obj:'Object', offsets:Tuple[int, ...], sizes:Tuple[int, ...]) -> Optional[npt.NDArray]:
+    for source in _local_sources:
+        data = source(obj, offsets, sizes)
+        if data is not None:
+            return data
+    return None
+
+def _compare(data:npt.NDArray, op:'QueryComponent._CompareOp', value) -> npt.NDArray:
+    name = op.name
+    if name == 'GT':
+        return data > value
+    if name == 'GTE':
+        return data >= value
+    if name == 'LT':
+        return data < value
+    if name == 'LTE':
+        return data <= value
+    if name == 'EQ':
+        return data == value
+    raise ValueError(f'Unknown comparison operator: {name}')
+
+def _flatten(query:Query, op) -> List[Query]:
+    if query._right is None or query.op != op:
+        return [query]
+    return _flatten(query._left, op) + _flatten(query._right, op)
 
 class QueryComponent:
     '''
@@ -229,35 +737,608 @@ class QueryComponent:
     
     def __eq__(self, other:builtins.object) -> Query:
         return self._compare(other, type(self)._CompareOp.EQ)
+    
+    def between(self, low:builtins.object, high:builtins.object, inclusive:str='both') -> Query:
+        '''
+        | Build a query for elements between low and high, as a single range constraint.
+        | ``obj.data.between(10.0, 20.0, 'neither')`` matches the same elements as ``(obj.data > 10.0) & (obj.data < 20.0)``,
+        | which is also turned into a single range constraint automatically.
+
+        :param low: the lower bound
+        :param high: the upper bound
+        :param str inclusive: which bounds are included: ``'both'``, ``'neither'``, ``'left'`` (only low) or ``'right'`` (only high)
+        '''
+        ops = type(self)._CompareOp
+        checktype(inclusive, 'inclusive', str)
+        if inclusive == 'both':
+            low_op, high_op = ops.GTE, ops.LTE
+        elif inclusive == 'neither':
+            low_op, high_op = ops.GT, ops.LT
+        elif inclusive == 'left':
+            low_op, high_op = ops.GTE, ops.LT
+        elif inclusive == 'right':
+            low_op, high_op = ops.GT, ops.LTE
+        else:
+            raise ValueError(f"invalid value for inclusive: {inclusive!r}, expected one of 'both', 'neither', 'left', 'right'")
+        return Query._from_range(self._obj, low_op, low, high_op, high)
+
+
+_op_symbols = {
+    'GT': '>',
+    'LT': '<',
+    'GTE': '>=',
+    'LTE': '<=',
+    'EQ': '==',
+}
+
+#op that means the same thing with the operands swapped, for printing the low side of ranges
+_op_mirror = {
+    'GT': '<',
+    'GTE': '<=',
+}
+
+class ObjectStatistics:
+    '''
+    | Summary statistics of an object's data, used to estimate how many elements a query will match.  See :func:`Query.plan`.
+    | The histogram has the same layout as PDC's ``pdc_histogram_t``: ``nbin`` bins of width ``incr``, with ``nbin + 1`` bin edges in ``range``, and counts in ``bin``.
+    | Statistics are computed with :func:`Object.compute_statistics`, and are discarded when this client sets data in the object.
+    '''
+
+    #statistics of objects, by object
+    cache = WeakKeyDictionary()
+
+    def __init__(self, dtype:Type, count:int, min, max, bin:npt.NDArray, range:npt.NDArray):
+        self.dtype = dtype
+        self.count = count
+        self.min = min
+        self.max = max
+        self.bin = bin
+        self.range = range
+        self.nbin = len(bin)
+        self.incr = float(range[1] - range[0]) if self.nbin else 0.0
+    
+    @classmethod
+    def from_array(cls, data:npt.ArrayLike, dtype:Type, nbins:int = 64) -> 'ObjectStatistics':
+        '''
+        Compute statistics of an array.
+
+        :param data: the data
+        :param Type dtype: the PDC type of the data
+        :param int nbins: the number of histogram bins
+        '''
+        data = np.asarray(data)
+        if data.size == 0:
+            return cls(dtype, 0, None, None, np.zeros(0, dtype=np.uint64), np.zeros(1))
+        low, high = data.min().item(), data.max().item()
+        bin, range = np.histogram(data, bins=nbins, range=(low, high))
+        return cls(dtype, data.size, low, high, bin.astype(np.uint64), range)
+    
+    @classmethod
+    def compute(cls, obj:'Object', nbins:int = 64, chunk_shape:Optional[Tuple[int, ...]] = None) -> 'ObjectStatistics':
+        '''
+        Compute statistics of an object's data, reading it in chunks, and store them in :attr:`cache`.
+        This reads the object twice: once to find the minimum and maximum, and once to fill the histogram.
+        '''
+        checktype(nbins, 'nbins', int)
+        if nbins <= 0:
+            raise ValueError('nbins must be greater than 0')
+        low = high = None
+        count = 0
+        for _, data in obj.iter_chunks(chunk_shape=chunk_shape, recycle=True):
+            if data.size == 0:
+                continue
+            count += data.size
+            low = data.min().item() if low is None else min(low, data.min().item())
+            high = data.max().item() if high is None else max(high, data.max().item())
+        
+        if count == 0:
+            stats = cls(obj.type, 0, None, None, np.zeros(0, dtype=np.uint64), np.zeros(1))
+        else:
+            bin = np.zeros(nbins, dtype=np.uint64)
+            range = None
+            for _, data in obj.iter_chunks(chunk_shape=chunk_shape, recycle=True):
+                counts, range = np.histogram(data, bins=nbins, range=(low, high))
+                bin += counts.astype(np.uint64)
+            stats = cls(obj.type, count, low, high, bin, range)
+        cls.cache[obj] = stats
+        return stats
+    
+    def _fraction_below(self, value) -> float:
+        #estimated fraction of elements < value, interpolating linearly within a bin
+        if value <= self.min:
+            return 0.0
+        if value > self.max:
+            return 1.0
+        i = min(max(int(np.searchsorted(self.range, value, side='right')) - 1, 0), self.nbin - 1)
+        below = float(self.bin[:i].sum())
+        within = float(self.bin[i]) * ((value - self.range[i]) / self.incr if self.incr else 0.0)
+        return min((below + within) / self.count, 1.0)
+    
+    def _fraction_equal(self, value) -> float:
+        if value < self.min or value > self.max:
+            return 0.0
+        if self.min == self.max:
+            return 1.0
+        i = min(max(int(np.searchsorted(self.range, value, side='right')) - 1, 0), self.nbin - 1)
+        if self.dtype in (Type.FLOAT, Type.DOUBLE):
+            distinct = float(self.bin[i])
+        else:
+            distinct = max(self.incr, 1.0)
+        return min(float(self.bin[i]) / max(distinct, 1.0) / self.count, 1.0)
+    
+    def truth(self, op:'QueryComponent._CompareOp', value) -> Optional[bool]:
+        '''
+        True if ``data op value`` holds for every element, False if it holds for no element, and None otherwise.
+        '''
+        if self.count == 0:
+            return False
+        name = op.name
+        if name == 'GT':
+            return False if value >= self.max else (True if value < self.min else None)
+        if name == 'GTE':
+            return False if value > self.max else (True if value <= self.min else None)
+        if name == 'LT':
+            return False if value <= self.min else (True if value > self.max else None)
+        if name == 'LTE':
+            return False if value < self.min else (True if value >= self.max else None)
+        if name == 'EQ':
+            if value < self.min or value > self.max:
+                return False
+            return True if self.min == self.max == value else None
+        return None
+    
+    def selectivity(self, op:'QueryComponent._CompareOp', value) -> float:
+        '''
+        Estimated fraction of elements where ``data op value`` holds.
+        '''
+        truth = self.truth(op, value)
+        if truth is not None:
+            return 1.0 if truth else 0.0
+        name = op.name
+        if name == 'LT':
+            fraction = self._fraction_below(value)
+        elif name == 'LTE':
+            fraction = self._fraction_below(value) + self._fraction_equal(value)
+        elif name == 'GT':
+            fraction = 1.0 - self._fraction_below(value) - self._fraction_equal(value)
+        elif name == 'GTE':
+            fraction = 1.0 - self._fraction_below(value)
+        else:
+            fraction = self._fraction_equal(value)
+        return min(max(fraction, 0.0), 1.0)
+
+def _invalidate_statistics(obj, region):
+    ObjectStatistics.cache.pop(obj, None)
+
+_write_hooks.append(_invalidate_statistics)
+
+class _PlanNode:
+    '''
+    A node of a query plan.  kind is one of 'leaf', 'and', 'or', 'true', 'false'.
+    selectivity is None if it couldn't be estimated.
+    '''
+    def __init__(self, kind:str, query:Optional[Query] = None, children:List['_PlanNode'] = (), selectivity:Optional[float] = None):
+        self.kind = kind
+        self.query = query
+        self.children = list(children)
+        self.selectivity = selectivity
+    
+    @classmethod
+    def leaf(cls, query:Query) -> '_PlanNode':
+        stats = ObjectStatistics.cache.get(query._left)
+        if stats is None:
+            return cls('leaf', query)
+        if query._range is not None:
+            low_op, low, high_op, high = query._range
+            truths = (stats.truth(low_op, low), stats.truth(high_op, high))
+            if False in truths:
+                return cls('false', query, selectivity=0.0)
+            if truths == (True, True):
+                return cls('true', query, selectivity=1.0)
+            #P(low op x and x op high) = P(x op high) - P(not low op x)
+            selectivity = stats.selectivity(high_op, high) - (1.0 - stats.selectivity(low_op, low))
+            return cls('leaf', query, selectivity=min(max(selectivity, 0.0), 1.0))
+        truth = stats.truth(query.op, query._value)
+        if truth is not None:
+            return cls('true' if truth else 'false', query, selectivity=1.0 if truth else 0.0)
+        return cls('leaf', query, selectivity=stats.selectivity(query.op, query._value))
+    
+    @classmethod
+    def conjunction(cls, children:List['_PlanNode']) -> '_PlanNode':
+        flat = []
+        for c in children:
+            flat.extend(c.children if c.kind == 'and' else [c])
+        if any(c.kind == 'false' for c in flat):
+            return cls('false', selectivity=0.0)
+        flat = _fuse_bounds([c for c in flat if c.kind != 'true'])
+        if not flat:
+            return cls('true', selectivity=1.0)
+        if len(flat) == 1:
+            return flat[0]
+        #most selective first, unknown selectivities last
+        flat.sort(key=lambda c: 0.5 if c.selectivity is None else c.selectivity)
+        selectivity = 1.0
+        for c in flat:
+            selectivity *= 0.5 if c.selectivity is None else c.selectivity
+        return cls('and', children=flat, selectivity=selectivity)
+    
+    @classmethod
+    def disjunction(cls, children:List['_PlanNode']) -> '_PlanNode':
+        flat = []
+        for c in children:
+            flat.extend(c.children if c.kind == 'or' else [c])
+        if any(c.kind == 'true' for c in flat):
+            return cls('true', selectivity=1.0)
+        flat = [c for c in flat if c.kind != 'false']
+        if not flat:
+            return cls('false', selectivity=0.0)
+        if len(flat) == 1:
+            return flat[0]
+        miss = 1.0
+        for c in flat:
+            miss *= 1.0 - (0.5 if c.selectivity is None else c.selectivity)
+        return cls('or', children=flat, selectivity=1.0 - miss)
+    
+    def build(self) -> Optional[Query]:
+        if self.kind in ('leaf', 'true', 'false'):
+            return self.query
+        op = Query._CombineOp.AND if self.kind == 'and' else Query._CombineOp.OR
+        query = self.children[0].build()
+        for c in self.children[1:]:
+            query = query._combine(c.build(), op)
+        return query
+    
+    def _label(self) -> str:
+        if self.kind in ('and', 'or'):
+            return self.kind.upper()
+        query = self.query
+        if query is None:
+            return self.kind.upper()
+        name = query._left.name
+        if query._range is not None:
+            low_op, low, high_op, high = query._range
+            label = f'{low} {_op_mirror[low_op.name]} {name} {_op_symbols[high_op.name]} {high}'
+        else:
+            label = f'{name} {_op_symbols[query.op.name]} {query._value}'
+        if self.kind != 'leaf':
+            label += f' (always {self.kind})'
+        return label
+    
+    def describe(self, n:int, depth:int = 0) -> List[str]:
+        if self.selectivity is None:
+            estimate = 'est. hits ?'
+        else:
+            estimate = f'est. hits {round(self.selectivity * n)} ({self.selectivity:.2%})'
+        lines = [f'{"  " * depth}{self._label()}  {estimate}']
+        for c in self.children:
+            lines.extend(c.describe(n, depth + 1))
+        return lines
+
+def _fuse_bounds(nodes:List[_PlanNode]) -> List[_PlanNode]:
+    #merge a lower and an upper bound on the same object, within one AND, into a range leaf
+    out = []
+    for node in nodes:
+        if node.kind == 'leaf':
+            for i, other in enumerate(out):
+                if other.kind == 'leaf':
+                    fused = other.query._fuse_range(node.query)
+                    if fused is not None:
+                        out[i] = _PlanNode.leaf(fused)
+                        break
+            else:
+                out.append(node)
+        else:
+            out.append(node)
+    return out
 
+#strings longer than this are indexed by a digest instead of their value
+_max_tag_key_length = 256
 
-def _tag_query(tag_name:str, tag_value:str) -> Tuple['Object']:
+def _tag_key(data:bytes, var_type:int) -> Tuple[tuple, Optional[object]]:
     '''
-    Get objects with a tag of the given name and value
-    CURRENTLY NOT IMPLEMENTED
+    The posting key of an encoded tag value, and the value if it is a number that can be ordered, otherwise None.
+    Equal numbers share a key whatever their PDC type, so ``3`` and ``3.0`` match.  Values other than numbers, bools, and short strings are keyed by a digest of their encoding, so the index never holds large values.
+    '''
+    if var_type == pdc_var_type_t.PDC_BOOLEAN and len(data) == 1:
+        return ('b', data != b'\x00'), None
+    dtype = KVTags._numeric_tag_types.get(var_type)
+    if dtype is not None and len(data) == dtype.itemsize:
+        number = np.frombuffer(data, dtype=dtype)[0].item()
+        if number == number:
+            return ('n', number), number
+    elif var_type == pdc_var_type_t.PDC_STRING:
+        data = data.rstrip(b'\x00')
+        if len(data) <= _max_tag_key_length:
+            return ('s', data.decode('utf-8')), None
+        return ('h', pdc_var_type_t.PDC_STRING, hashlib.blake2b(data, digest_size=16).digest()), None
+    elif var_type == pdc_var_type_t.PDC_CHAR and not data.startswith(KVTags._binary_tag_magic) and not data.startswith(b'\x80'):
+        #the older text format, parsed with ast.literal_eval, which is safe.  Keyed like the value set in the current format.
+        return _tag_key(*KVTags._encode(KVTags._decode(data, var_type)))
+    return ('h', var_type, hashlib.blake2b(data, digest_size=16).digest()), None
 
-    :param str tag_name: name of the tag
-    :param str tag_value: value of the tag
-    :return: objects with the given tag
-    :rtype: Iterable[Object]
+class TagIndex:
     '''
-    raise NotImplementedError()
+    | An index from object tags to the objects that have them.  Used by :func:`tag_query`.
+    | For each tag name and value, the index holds the objects with that tag.  Tags with numeric values are also kept in order of their values, for range lookups.
+    | Tags of objects set or deleted through this client update every index.  Tags set by other clients are only seen after :func:`add_objects` or :func:`load`.
+    | Only a small key is kept for each tag: numbers, bools, and short strings themselves, and a digest of anything else.
+    | An index can be saved as a tag of a container with :func:`save`, so other processes can load it in one read.
+    | :func:`tag_query` uses ``pdc.TagIndex.default`` if no index is given.  It is None until it is set, so nothing is indexed unless an index is created.
+
+    Usage::
+
+        pdc.TagIndex.default = pdc.TagIndex(['run', 'energy'])
+        obj.tags['run'] = 12
+        objects = pdc.tag_query('run', 12)
+        pdc.TagIndex.default.save(cont)
+
+        #in another process
+        index = pdc.TagIndex.load(cont)
+        objects = pdc.tag_query('energy', low=2.5, high=3.0, index=index)
+    '''
+
+    _format_version = 1
+
+    #: The index used by :func:`tag_query` when no index is given.  None by default.
+    default = None
+
+    def __init__(self, names:Optional[Iterable[str]]=None):
+        '''
+        :param names: The tag names to index.  Defaults to every tag.
+        '''
+        if names is not None:
+            names = frozenset(names)
+            for name in names:
+                checktype(name, 'tag name', str)
+        self.names = names
+        #Objects are identified by their id while this client has them open, and by their name otherwise.
+        #for each tag name: for each posting key, the objects with that value
+        self._postings = {}
+        #for each object: for each tag name, its (posting key, number)
+        self._tags = {}
+        #for each tag name: the numeric values in order, and their objects
+        self._numbers = {}
+        self._number_objects = {}
+        _tag_indexes.add(self)
+
+    def _set(self, obj_key, name:str, key:tuple, number) -> None:
+        if self.names is not None and name not in self.names:
+            return
+        self._remove(obj_key, name)
+        self._tags.setdefault(obj_key, {})[name] = (key, number)
+        self._postings.setdefault(name, {}).setdefault(key, set()).add(obj_key)
+        if number is not None:
+            numbers = self._numbers.setdefault(name, [])
+            objects = self._number_objects.setdefault(name, [])
+            i = bisect.bisect_right(numbers, number)
+            numbers.insert(i, number)
+            objects.insert(i, obj_key)
+
+    def _remove(self, obj_key, name:str) -> None:
+        tags = self._tags.get(obj_key)
+        if tags is None or name not in tags:
+            return
+        key, number = tags.pop(name)
+        if not tags:
+            del self._tags[obj_key]
+        postings = self._postings[name]
+        postings[key].discard(obj_key)
+        if not postings[key]:
+            del postings[key]
+        if number is not None:
+            numbers = self._numbers[name]
+            objects = self._number_objects[name]
+            i = bisect.bisect_left(numbers, number)
+            while objects[i] != obj_key:
+                i += 1
+            del numbers[i]
+            del objects[i]
+
+    def _rekey(self, old, new) -> None:
+        #move the tags of an object to another key
+        for name, (key, number) in list(self._tags.get(old, {}).items()):
+            self._remove(old, name)
+            self._set(new, name, key, number)
+
+    def _objects(self, obj_keys) -> List['Object']:
+        from .object import Object
+        objects = []
+        seen = set()
+        for obj_key in obj_keys:
+            if isinstance(obj_key, int):
+                obj = Object.objects_by_id.get(obj_key)
+            elif obj_key in _watched_names:
+                obj = _watched_names[obj_key]
+            else:
+                try:
+                    obj = Object.get(obj_key)
+                except PDCError:
+                    #deleted since it was indexed
+                    obj = None
+            if obj is not None and obj._id not in seen:
+                seen.add(obj._id)
+                objects.append(obj)
+        return objects
+
+    def add_objects(self, objects:Iterable['Object'], names:Iterable[str]) -> None:
+        '''
+        Read tags of objects and add them to the index.  Use this for objects tagged by other clients.
+        Tags an object doesn't have are removed from the index.
+
+        :param objects: the objects to read the tags of
+        :param names: the names of the tags to read
+        '''
+        names = list(names)
+        for name in names:
+            checktype(name, 'tag name', str)
+        for obj in objects:
+            _watch(obj)
+            tags = obj.tags
+            for name in names:
+                self._remove(obj.name, name)
+                try:
+                    data, var_type = tags._get_cached(name.encode('utf-8'))
+                    key, number = _tag_key(data, var_type)
+                except (PDCError, ValueError, SyntaxError):
+                    self._remove(obj._id, name)
+                else:
+                    self._set(obj._id, name, key, number)
+
+    def remove_object(self, obj:'Object') -> None:
+        '''
+        Remove every tag of obj from the index, for example after deleting it.
+        '''
+        for obj_key in (obj._id, obj.name):
+            for name in list(self._tags.get(obj_key, ())):
+                self._remove(obj_key, name)
+
+    def lookup(self, name:str, value:KVTags.tag_types_union) -> Tuple['Object', ...]:
+        '''
+        The objects with a tag equal to value, in order of their names.  Ints and floats that are equal match each other.
+        '''
+        checktype(name, 'tag name', str)
+        key, _ = _tag_key(*KVTags._encode(value))
+        return tuple(sorted(self._objects(self._postings.get(name, {}).get(key, ())), key=lambda obj: obj.name))
+
+    def lookup_range(self, name:str, low=None, high=None, *, include_high:bool=False) -> Tuple['Object', ...]:
+        '''
+        The objects with a numeric tag in [low, high), in order of the tag's value.
+
+        :param str name: the name of the tag
+        :param low: the lowest value, or None for no lower bound
+        :param high: the highest value, or None for no upper bound
+        :param bool include_high: whether high itself is in the range
+        '''
+        checktype(name, 'tag name', str)
+        if low is not None:
+            checktype(low, 'low', int, float, np.integer, np.floating)
+        if high is not None:
+            checktype(high, 'high', int, float, np.integer, np.floating)
+        numbers = self._numbers.get(name, [])
+        start = 0 if low is None else bisect.bisect_left(numbers, low)
+        if high is None:
+            stop = len(numbers)
+        elif include_high:
+            stop = bisect.bisect_right(numbers, high)
+        else:
+            stop = bisect.bisect_left(numbers, high)
+        return tuple(self._objects(self._number_objects.get(name, [])[start:stop]))
+
+    def save(self, container:'Container', tag:str='pdc_tag_index') -> None:
+        '''
+        | Save this index as a tag of container.
+        | Objects are saved by name, so objects with the same name are merged.
+
+        :param Container container: the container to save the index in
+        :param str tag: the name of the tag
+        '''
+        from .object import Object
+        saved = {}
+        for obj_key, tags in self._tags.items():
+            if isinstance(obj_key, int):
+                obj = Object.objects_by_id.get(obj_key)
+                if obj is None:
+                    continue
+                obj_key = obj.name
+            saved.setdefault(obj_key, {}).update(tags)
+        container.tags[tag] = {
+            'version': type(self)._format_version,
+            'names': None if self.names is None else sorted(self.names),
+            'tags': saved,
+        }
+
+    @classmethod
+    def load(cls, container:'Container', tag:str='pdc_tag_index') -> 'TagIndex':
+        '''
+        Load an index saved with :func:`save`.  The loaded index is kept up to date like any other index.
+
+        :param Container container: the container the index was saved in
+        :param str tag: the name of the tag
+        '''
+        saved = container.tags[tag]
+        if not isinstance(saved, dict) or saved.get('version') != cls._format_version:
+            raise ValueError(f'tag {tag!r} is not a saved tag index')
+        index = cls(saved['names'])
+        for obj_name, tags in saved['tags'].items():
+            for name, (key, number) in tags.items():
+                index._set(obj_name, name, key, number)
+        return index
+
+    def clear(self) -> None:
+        '''
+        Remove everything from the index.
+        '''
+        self._postings.clear()
+        self._tags.clear()
+        self._numbers.clear()
+        self._number_objects.clear()
+
+    def __len__(self) -> int:
+        '''
+        The number of indexed tags
+        '''
+        return sum(len(tags) for tags in self._tags.values())
+
+_tag_indexes = WeakSet()
+#the ids of the objects that are keyed by id in indexes, which are keyed by name once the object is closed
+_watched_ids = set()
+#the objects with those ids, by name, for entries loaded by name
+_watched_names = WeakValueDictionary()
+
+def _object_closed(id:int, name:str) -> None:
+    _watched_ids.discard(id)
+    for index in list(_tag_indexes):
+        index._rekey(id, name)
+
+def _watch(obj) -> None:
+    if obj._id not in _watched_ids:
+        _watched_ids.add(obj._id)
+        _watched_names[obj.name] = obj
+        finalize(obj, _object_closed, obj._id, obj.name)
+
+def _update_tag_indexes(obj, key:bytes, value, var_type):
+    if not _tag_indexes:
+        return
+    name = key.decode('utf-8')
+    _watch(obj)
+    if value is not None:
+        try:
+            posting_key, number = _tag_key(value, var_type)
+        except Exception:
+            #the tag has already been set on the server, so drop it from the indexes rather than fail
+            value = None
+    for index in list(_tag_indexes):
+        #a tag set through this client replaces one loaded under the object's name
+        index._remove(obj.name, name)
+        if value is None:
+            index._remove(obj._id, name)
+        else:
+            index._set(obj._id, name, posting_key, number)
+
+_tag_hooks.append(_update_tag_indexes)
+
+def tag_query(name:str, value:KVTags.tag_types_union=None, *, low=None, high=None, include_high:bool=False, index:Optional[TagIndex]=None) -> Tuple['Object', ...]:
+    '''
+    | Get the objects with a tag of the given name and value, or with a numeric tag in the range [low, high).
+    | Objects are found with a :class:`TagIndex`, so only tags the index has seen are searched.
+
+    :param str name: the name of the tag
+    :param value: the value of the tag.  Can't be given with low or high.
+    :param low: the lowest value of a range, or None for no lower bound
+    :param high: the highest value of a range, or None for no upper bound
+    :param bool include_high: whether high itself is in the range
+    :param TagIndex index: the index to search.  Defaults to ``TagIndex.default``.
+    :return: the objects with the tag
+    :raises ValueError: if no index is given and ``TagIndex.default`` is not set
     '''
-    checktype(tag_name, 'tag name', str)
-    checktype(tag_value, 'tag value', str)
-
-    cdef pdc_kvtag_t kvtag
-    tag_name_bytes = tag_name.encode('utf-8')
-    tag_value_bytes = KVTags._encode(tag_value)
-    kvtag.name = tag_name_bytes
-    kvtag.value = <char *> tag_value_bytes
-    kvtag.size = len(tag_value_bytes)
-
-    cdef int num_results
-    cdef uint64_t *results
-    if (cpdc.PDC_Client_query_kvtag(&kvtag, &num_results, &results) != 0):
-        raise PDCError('Error querying for objects with tag {}={}'.format(tag_name, tag_value))
-    
-    rtn = tuple(object.Object._fromid(results[i]) for i in range(num_results))
-    return rtn
-    '''
\ No newline at end of file
+    checktype(name, 'tag name', str)
+    if index is None:
+        index = TagIndex.default
+        if index is None:
+            raise ValueError('no index was given, and pdc.TagIndex.default is not set')
+    checktype(index, 'index', TagIndex)
+    if low is not None or high is not None:
+        if value is not None:
+            raise ValueError('give either a value or a range, not both')
+        return index.lookup_range(name, low, high, include_high=include_high)
+    return index.lookup(name, value)
@@ -1,4 +1,21 @@
-from pdc.cpdc cimport pdc_region_info
+from pdc.cpdc cimport pdc_region_info, uint64_t
 
 cdef void free_region_info(pdc_region_info *region_info)
-cdef pdc_region_info *construct_region_info(region, dims)
\ No newline at end of file
+cdef pdc_region_info *construct_region_info(region, dims)
+
+cdef class Region:
+    cdef readonly tuple slices
+    cdef size_t _ndim
+    #_start, _stop and _step share one allocation
+    cdef uint64_t *_start
+    cdef uint64_t *_stop
+    cdef uint64_t *_step
+    cdef unsigned char *_flags
+    #False if any dimension has a step value or an index array
+    cdef bint _box
+    cdef object __weakref__
+
+    cdef int _set_slices(self, tuple slices) except -1
+    @staticmethod
+    cdef Region _from_bounds(tuple starts, tuple stops)
+    cdef int _fill_bounds(self, dims, uint64_t *offsets, uint64_t *sizes, bint check_ndim) except -1
\ No newline at end of file
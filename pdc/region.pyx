@@ -1,14 +1,16 @@
-from functools import singledispatchmethod
 import builtins
-from pdc.main cimport malloc_or_memerr
-from .main import checktype, uint64, checkrange, PDCError, pdcid, ctrace, _free_from_int
+from pdc.main cimport malloc_or_memerr, _pdc_is_open
+from .main import checktype, uint64, checkrange, PDCError, pdcid, ctrace
 from pdc.cpdc cimport uint64_t, pdcid_t
 cimport pdc.cpdc as cpdc
 from cpython.mem cimport PyMem_Free as free
-from typing import Tuple
+from typing import Iterable, Iterator, List, Optional, Tuple
+from collections import OrderedDict
 import copy
+import itertools
 
 import numpy as np
+import numpy.typing as npt
 
 #free region info created by _construct_region_info
 cdef void free_region_info(pdc_region_info *region_info):
@@ -27,7 +29,140 @@ cdef pdc_region_info *construct_region_info(region, dims):
     region_info[0].size = size_arr        
     return region_info
 
-class Region:
+def _create_region(offsets:Tuple[uint64, ...], sizes:Tuple[uint64, ...]) -> pdcid:
+    cdef size_t ndim = len(sizes)
+    cdef uint64_t *offset_arr = <uint64_t *> malloc_or_memerr(sizeof(uint64_t) * ndim)
+    cdef uint64_t *size_arr
+    cdef pdcid_t id
+    try:
+        size_arr = <uint64_t *> malloc_or_memerr(sizeof(uint64_t) * ndim)
+        try:
+            for i in range(ndim):
+                offset_arr[i] = offsets[i]
+                size_arr[i] = sizes[i]
+            id = cpdc.PDCregion_create(ndim, offset_arr, size_arr)
+            ctrace('region_create', id, ndim, offsets, sizes)
+        finally:
+            free(size_arr)
+    finally:
+        free(offset_arr)
+    if id == 0:
+        raise PDCError('failed to create region')
+    return id
+
+def _close_region(id:pdcid) -> None:
+    if not _pdc_is_open():
+        #the interpreter is exiting, and PDC already closed every region
+        return
+    rtn = cpdc.PDCregion_close(id)
+    ctrace('region_close', rtn, id)
+    if rtn != 0:
+        raise PDCError('Failed to close region')
+
+class RegionPool:
+    '''
+    | A pool of PDC region handles, keyed by number of dimensions, offsets, and sizes.
+    | Transfer requests take their regions from :attr:`Region.pool`, so transferring the same tiles repeatedly doesn't create and close a PDC region each time.
+    | A handle is in use while any transfer request holds it.  Once more than max_size handles are pooled, the least recently used handles that are not in use are closed.
+    '''
+
+    def __init__(self, max_size:int=1024):
+        '''
+        :param int max_size: the number of handles kept open.  0 disables pooling: handles are closed as soon as they are not in use.
+        '''
+        checktype(max_size, 'max_size', int)
+        if max_size < 0:
+            raise ValueError('max_size must not be negative')
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        #(ndim, offsets, sizes) -> [region id, number of users], least recently used first
+        self._entries = OrderedDict()
+    
+    def acquire(self, offsets:Tuple[uint64, ...], sizes:Tuple[uint64, ...]) -> pdcid:
+        '''
+        Get a handle to a region, creating it if it is not pooled.  Call :func:`release` with the same offsets and sizes when done with it.
+        '''
+        key = (len(sizes), tuple(offsets), tuple(sizes))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            entry[1] += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+        self.misses += 1
+        id = _create_region(key[1], key[2])
+        self._entries[key] = [id, 1]
+        self._evict()
+        return id
+    
+    def release(self, offsets:Tuple[uint64, ...], sizes:Tuple[uint64, ...]) -> None:
+        '''
+        Stop using a handle returned by :func:`acquire`.
+        '''
+        key = (len(sizes), tuple(offsets), tuple(sizes))
+        entry = self._entries.get(key)
+        if entry is None or entry[1] == 0:
+            raise ValueError(f'region with offsets {offsets} and sizes {sizes} is not in use')
+        entry[1] -= 1
+        if entry[1] == 0:
+            self._evict()
+    
+    def _evict(self) -> None:
+        excess = len(self._entries) - self.max_size
+        if excess <= 0:
+            return
+        unused = [key for key, (_, users) in self._entries.items() if users == 0][:excess]
+        for key in unused:
+            id, _ = self._entries.pop(key)
+            _close_region(id)
+    
+    def resize(self, max_size:int) -> None:
+        '''
+        Change max_size, closing handles that are not in use if there are now too many.
+        '''
+        checktype(max_size, 'max_size', int)
+        if max_size < 0:
+            raise ValueError('max_size must not be negative')
+        self.max_size = max_size
+        self._evict()
+    
+    def clear(self) -> None:
+        '''
+        Close every handle that is not in use.
+        '''
+        for key in [key for key, (_, users) in self._entries.items() if users == 0]:
+            id, _ = self._entries.pop(key)
+            _close_region(id)
+    
+    @property
+    def in_use(self) -> int:
+        '''
+        The number of handles held by at least one transfer request.
+        '''
+        return sum(1 for _, users in self._entries.values() if users)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+cdef enum:
+    #bits of Region._flags
+    _HAS_START = 1
+    _HAS_STOP = 2
+    _HAS_STEP = 4
+    _IS_INDEX = 8
+
+#the cost of a transfer request in bytes, used to decide whether a strided or indexed region is read as many small boxes or fewer large ones
+_request_overhead_bytes = 64 * 1024
+
+def _runs(coords:npt.NDArray) -> List[Tuple[int, int]]:
+    #(start, stop) of each run of consecutive values in sorted, unique coords
+    breaks = np.nonzero(np.diff(coords) != 1)[0] + 1
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [len(coords)]))
+    return [(int(coords[a]), int(coords[b - 1]) + 1) for a, b in zip(starts, stops)]
+
+cdef class Region:
     '''
     | A region, which specifies the location of a 'block' of data.  
     | Regions are created by slicing the :class:`region` object.
@@ -38,12 +173,171 @@ class Region:
     | the next 3 elements of a 1 dimensional object: ``region[3:6]``
     | the last 6 columns of the first 2 rows of an object: ``region[:2, 6:]``
     |
-    | The slices used to create a region object may not have step values. (``region[1:100:4]`` is invalid)
+    |
+    | Regions can also select every n-th element with a step value, or specific elements with an array of indices:
+    | every 4th row: ``region[::4, :]``
+    | rows 1, 5 and 9, and columns 2 to 4: ``region[[1, 5, 9], 2:4]``
+    | Index arrays apply to each dimension independently, like ``numpy.ix_``, so ``region[[1, 5], [0, 3]]`` selects a 2x2 block.
+    | Transfers of these regions are split into as few boxes as possible.  See :func:`Object.get_data`.
     '''
+
+    #: Region handles shared by transfer requests
+    pool = RegionPool()
+    
+    def __init__(self, *args):
+        if len(args) == 0:
+            raise IndexError('a region needs a slice')
+        if len(args) > 1:
+            raise TypeError(f'expected 1 slice, got {len(args)}')
+        slice = args[0]
+        cdef uint64_t cslice
+        if isinstance(slice, tuple):
+            if len(slice) == 0:
+                raise ValueError('region must have at least one dimension')
+            newslices = []
+            for s in slice:
+                if isinstance(s, builtins.slice):
+                    newslices.append(Region._normalize_slice(s))
+                elif isinstance(s, (list, np.ndarray)):
+                    newslices.append(Region._validate_index(s))
+                else:
+                    checktype(s, 'slice', int)
+                    checkrange(s, 'slice', 'uint64')
+                    newslices.append(builtins.slice(s, s+1))
+            self._set_slices(tuple(newslices))
+        elif isinstance(slice, builtins.slice):
+            self._set_slices((Region._normalize_slice(slice),))
+        elif isinstance(slice, (list, np.ndarray)):
+            self._set_slices((Region._validate_index(slice),))
+        elif isinstance(slice, int):
+            cslice = slice
+            self._set_slices((builtins.slice(cslice, cslice+1),))
+        else:
+            raise TypeError(f'invalid type of slice: {type(slice)}')
+    
+    def __dealloc__(self):
+        free(self._start)
+        free(self._flags)
+    
+    cdef int _set_slices(self, tuple slices) except -1:
+        #slices must already be validated
+        cdef size_t ndim = len(slices)
+        self._start = <uint64_t *> malloc_or_memerr(sizeof(uint64_t) * 3 * ndim)
+        self._stop = self._start + ndim
+        self._step = self._start + 2 * ndim
+        self._flags = <unsigned char *> malloc_or_memerr(ndim)
+        self._ndim = ndim
+        self._box = True
+        self.slices = slices
+        for i, s in enumerate(slices):
+            self._flags[i] = 0
+            self._start[i] = 0
+            self._stop[i] = 0
+            self._step[i] = 1
+            if isinstance(s, np.ndarray):
+                self._flags[i] = _IS_INDEX
+                self._box = False
+                continue
+            if s.start is not None:
+                self._flags[i] |= _HAS_START
+                self._start[i] = s.start
+            if s.stop is not None:
+                self._flags[i] |= _HAS_STOP
+                self._stop[i] = s.stop
+            if s.step is not None:
+                self._flags[i] |= _HAS_STEP
+                self._step[i] = s.step
+                self._box = False
+        return 0
+    
+    @staticmethod
+    def _normalize_slice(s:slice) -> slice:
+        Region.validate_slice(s)
+        if s.step == 1:
+            return builtins.slice(s.start, s.stop)
+        return s
+    
+    @staticmethod
+    def _validate_index(index) -> npt.NDArray:
+        #a read-only uint64 copy of an array of indices
+        arr = np.asarray(index)
+        if arr.ndim != 1 or len(arr) == 0:
+            raise ValueError('index arrays must be 1 dimensional and not empty')
+        if arr.dtype.kind not in 'ui':
+            raise TypeError(f'index arrays must contain integers, not {arr.dtype}')
+        if (arr < 0).any():
+            raise OverflowError('indices must not be negative')
+        arr = arr.astype(np.uint64)
+        arr.flags.writeable = False
+        return arr
+    
+    def is_box(self) -> bool:
+        '''
+        True if this region is a single box, i.e. it has no step values or index arrays.
+        '''
+        return self._box
+    
+    def _selection(self, dims:Tuple[uint64, ...]) -> List[npt.NDArray]:
+        '''
+        The coordinates this region selects in each dimension of an object with the given dimensions, in the order they are selected.
+        '''
+        if self._ndim > len(dims):
+            raise ValueError('region has more dimensions than object')
+        coords = []
+        for i, d in enumerate(dims):
+            if i >= self._ndim:
+                coords.append(np.arange(d, dtype=np.int64))
+                continue
+            s = self.slices[i]
+            if self._flags[i] & _IS_INDEX:
+                if s.max() >= d:
+                    raise ValueError(f'index {s.max()} is out of bounds for dimension {d}')
+                coords.append(s.astype(np.int64))
+                continue
+            start = s.start if s.start is not None else 0
+            stop = s.stop if s.stop is not None else d
+            if stop > d:
+                raise ValueError(f'slice stop value {stop} is greater than the dimension {d}')
+            if start >= stop:
+                raise ValueError(f'slice start value {start} is out of bounds for dimension {d}')
+            coords.append(np.arange(start, stop, s.step or 1, dtype=np.int64))
+        return coords
     
-    @singledispatchmethod
-    def __init__(self, slice):
-        raise TypeError(f'invalid type of slice: {type(slice)}')
+    def _decompose(self, dims:Tuple[uint64, ...], itemsize:int, exact:bool) -> Tuple[List[npt.NDArray], List[List[Tuple[int, int]]], 'RegionSet']:
+        '''
+        | Plan the boxes to transfer for this region in an object with the given dimensions.
+        | Each dimension is read either as its runs of consecutive coordinates, or as one span from the first to the last selected coordinate, whichever combination has the lowest cost in bytes moved plus _request_overhead_bytes per box.
+        | If exact is True, only the selected elements are covered, which is needed for writes.
+        
+        :return: the selected coordinates in each dimension, the (start, stop) segments chosen for each dimension, and the boxes: the product of the segments, in row-major order
+        '''
+        coords = self._selection(dims)
+        choices = []
+        for c in coords:
+            unique = np.unique(c)
+            runs = _runs(unique)
+            span = [(runs[0][0], runs[-1][1])]
+            choices.append([(runs, len(unique))] if exact or len(runs) == 1 else [(runs, len(unique)), (span, span[0][1] - span[0][0])])
+        
+        best = None
+        for combination in itertools.product(*choices):
+            boxes = int(np.prod([len(segments) for segments, _ in combination], dtype=np.float64))
+            elements = np.prod([n for _, n in combination], dtype=np.float64)
+            cost = elements * itemsize + boxes * _request_overhead_bytes
+            if best is None or cost < best[0]:
+                best = (cost, [segments for segments, _ in combination])
+        
+        segments = best[1]
+        offsets = np.array(list(itertools.product(*[[a for a, _ in seg] for seg in segments])), dtype=np.uint64)
+        sizes = np.array(list(itertools.product(*[[b - a for a, b in seg] for seg in segments])), dtype=np.uint64)
+        return coords, segments, RegionSet(offsets.reshape(-1, len(dims)), sizes.reshape(-1, len(dims)))
+    
+    @staticmethod
+    cdef Region _from_bounds(tuple starts, tuple stops):
+        #an absolute region, without validation
+        cdef Region r = Region.__new__(Region)
+        r._set_slices(tuple(builtins.slice(start, stop) for start, stop in zip(starts, stops)))
+        return r
     
     @staticmethod
     def validate_slice(slice:slice):
@@ -59,38 +353,12 @@ class Region:
         if slice.stop is not None:
             checktype(slice.stop, 'stop value', int, np.integer)
             checkrange(slice.stop, 'stop value', 'uint64')
-        if slice.step is not None and slice.step != 1:
-            raise ValueError('slice step values are not supported')
+        if slice.step is not None:
+            checktype(slice.step, 'step value', int, np.integer)
+            if slice.step <= 0:
+                raise ValueError('slice step values must be greater than 0')
         if slice.start is not None and slice.stop is not None and slice.start >= slice.stop:
             raise ValueError('start value cannot be greater or equal to than stop value')
-
-    @__init__.register
-    def _(self, slice:int):
-        cdef uint64_t cslice = slice
-        self.slices = (builtins.slice(cslice, cslice+1),)
-    
-    @__init__.register
-    def _(self, slice:builtins.slice):
-        Region.validate_slice(slice)
-        self.slices = (slice,)
-    
-    @__init__.register
-    def _(self, slice:tuple):
-        checktype(slice, 'slice', tuple)
-        if len(slice) == 0:
-            raise ValueError('region must have at least one dimension')
-        
-        newslices = []
-        for s in slice:
-            if isinstance(s, builtins.slice):
-                Region.validate_slice(s)
-                newslices.append(s)
-            else:
-                checktype(s, 'slice', int)
-                checkrange(s, 'slice', 'uint64')
-                newslices.append(builtins.slice(s, s+1))
-        
-        self.slices = tuple(newslices)
     
     def is_absolute(self):
         '''
@@ -100,11 +368,48 @@ class Region:
         | ``region[2:3, :9]`` is not absolute
         | ``region[2:3, 8]`` is absolute
         '''
-        for s in self.slices:
-            if s.start is None or s.stop is None:
+        for i in range(self._ndim):
+            if self._flags[i] & _IS_INDEX:
+                continue
+            if not (self._flags[i] & _HAS_START and self._flags[i] & _HAS_STOP):
                 return False
         return True
     
+    cdef int _fill_bounds(self, dims, uint64_t *offsets, uint64_t *sizes, bint check_ndim) except -1:
+        '''
+        Write the offsets and sizes of this region in an object with the given dimensions
+        '''
+        cdef size_t ndim = len(dims)
+        cdef uint64_t d, start, stop
+        if not self._box:
+            raise ValueError(f'{self!r} has step values or index arrays, so it is not a single box')
+        if check_ndim and self._ndim > ndim:
+            raise ValueError('region has more dimensions than object')
+        for i in range(ndim):
+            d = dims[i]
+            if i >= self._ndim:
+                offsets[i] = 0
+                sizes[i] = d
+                continue
+            start = self._start[i] if self._flags[i] & _HAS_START else 0
+            stop = self._stop[i] if self._flags[i] & _HAS_STOP else d
+            if self._flags[i] & _HAS_STOP and stop > d:
+                raise ValueError(f'slice stop value {stop} is greater than the dimension {d}')
+            if start >= stop:
+                raise ValueError(f'slice start value {start} is not less than the stop value {stop} in a dimension of {d}')
+            offsets[i] = start
+            sizes[i] = stop - start
+        return 0
+    
+    def _bounds_tuples(self, dims, bint check_ndim):
+        cdef size_t ndim = len(dims)
+        cdef uint64_t *arr = <uint64_t *> malloc_or_memerr(sizeof(uint64_t) * 2 * (ndim if ndim else 1))
+        try:
+            self._fill_bounds(dims, arr, arr + ndim, check_ndim)
+            return tuple(arr[i] for i in range(ndim)), tuple(arr[ndim + i] for i in range(ndim))
+        finally:
+            free(arr)
+    
     def get_absolute(self, dims):
         '''
         | Return a new absolute region, using the given dimensions to determine ommitted start and stop values.
@@ -112,42 +417,48 @@ class Region:
         | ``region[:].get_absolute((3, 4)) -> region[0:3, 0:4]``
         | ``region[:2, 6:].get_absolute((10, 10)) -> region[0:2, 6:10]``
         '''
-        newslices = []
-        
-        for s, d in zip(self.slices, dims):
-            start = s.start if s.start is not None else 0
+        offsets, sizes = self._bounds_tuples(dims, False)
+        return Region._from_bounds(offsets, tuple(o + s for o, s in zip(offsets, sizes)))
+    
+    def _bounds(self, dims:Tuple[uint64, ...]) -> Tuple[Tuple[uint64, ...], Tuple[uint64, ...]]:
+        '''
+        Returns the offsets and sizes of this region in an object with the given dimensions
+        '''
+        return self._bounds_tuples(dims, True)
+    
+    def tiles(self, dims:Tuple[uint64, ...], chunk_shape:Tuple[uint64, ...]) -> Iterator['Region']:
+        '''
+        | Split this region into absolute regions of at most chunk_shape, in row-major order.
+        | Chunks at the far edges of the region are smaller if chunk_shape doesn't divide the region evenly.
+        | If chunk_shape has fewer dimensions than dims, the remaining dimensions are not split.
+        | Example:
+        | ``region[:, 2:].tiles((4, 6), (3, 4)) -> region[0:3, 2:6], region[3:4, 2:6]``
 
-            if s.stop is not None and s.stop > d:
-                raise ValueError(f'slice stop value {s.stop} is greater than the dimension {d}')
-            stop = s.stop if s.stop is not None else d
-            newslices.append(builtins.slice(start, stop))
-        
-        while len(newslices) < len(dims):
-            newslices.append(builtins.slice(0, dims[len(newslices)]))
-        
-        return Region(tuple(newslices))
+        :param dims: the dimensions of the object this region is in
+        :param chunk_shape: the maximum size of each chunk
+        '''
+        checktype(chunk_shape, 'chunk shape', tuple)
+        if len(chunk_shape) > len(dims):
+            raise ValueError('chunk shape has more dimensions than object')
+        for c in chunk_shape:
+            checktype(c, 'chunk shape', int, np.integer)
+            if c <= 0:
+                raise ValueError('chunk shape values must be greater than 0')
+        offsets, sizes = self._bounds(dims)
+        chunk_shape = tuple(chunk_shape) + sizes[len(chunk_shape):]
+        starts = [range(o, o + s, c) for o, s, c in zip(offsets, sizes, chunk_shape)]
+        for start in itertools.product(*starts):
+            yield Region._from_bounds(start, tuple(
+                min(st + c, o + s)
+                for st, c, o, s in zip(start, chunk_shape, offsets, sizes)
+            ))
     
     def _get_sizes_offsets(self, dims:Tuple[uint64]) -> Tuple[pdcid, Tuple[uint64, ...]]:
         #returns sizes pointer, offsets pointer
-        if len(self.slices) > len(dims):
-            raise ValueError('region has more dimensions than object')
-        newslices = list(self.slices)
-        while len(newslices) < len(dims):
-            newslices.append(builtins.slice(None))
-        
-        cdef uint64_t start, stop
         cdef uint64_t *size_arr = <uint64_t *> malloc_or_memerr(sizeof(uint64_t) * len(dims))
         cdef uint64_t *offset_arr = <uint64_t *> malloc_or_memerr(sizeof(uint64_t) * len(dims))
         try:
-            for s, d in zip(newslices, dims):
-                if s.stop is not None and s.stop > d:
-                    raise ValueError(f'slice stop value {s.stop} is greater than the dimension {d}')
-            
-            for s, d, i in zip(newslices, dims, range(len(dims))):
-                start = s.start if s.start is not None else 0
-                stop = s.stop if s.stop is not None else d
-                size_arr[i] = stop - start
-                offset_arr[i] = start
+            self._fill_bounds(dims, offset_arr, size_arr, True)
         except:
             free(size_arr)
             free(offset_arr)
@@ -159,34 +470,164 @@ class Region:
         '''
         Constructs a pdc region based on the provided dimensions of the object.
         '''
-        size_ptr, offset_ptr = self._get_sizes_offsets(dims)
-        cdef uint64_t *size_arr = <uint64_t *> <size_t> size_ptr
-        cdef uint64_t *offset_arr = <uint64_t *> <size_t> offset_ptr
-        cdef pdcid_t id
-        try:
-            id = cpdc.PDCregion_create(len(dims), offset_arr, size_arr)
-            ctrace('region_create', id, len(dims), tuple(offset_arr[i] for i in range(len(dims))), tuple(size_arr[i] for i in range(len(dims))))
-            if id == 0:
-                raise PDCError('failed to create region')
-            return id, tuple(size_arr[i] for i in range(len(dims)))
-        finally:
-            _free_from_int(size_ptr)
-            _free_from_int(offset_ptr)
+        offsets, sizes = self._bounds(dims)
+        return _create_region(offsets, sizes), sizes
         
+    def _key(self) -> tuple:
+        return tuple(
+            ('index',) + tuple(s.tolist()) if isinstance(s, np.ndarray) else (s.start, s.stop, s.step)
+            for s in self.slices
+        )
+    
     def __eq__(self, other:object) -> bool:
         if not isinstance(other, Region):
             return False
-        return self.slices == other.slices
+        return self._key() == other._key()
     
     def __hash__(self) -> int:
-        return hash(tuple(
-            (s.start, s.stop) for s in self.slices
-        ))
+        return hash(self._key())
+    
+    def __reduce__(self):
+        return (Region, (self.slices,))
+    
+    def __repr__(self) -> str:
+        parts = []
+        for s in self.slices:
+            if isinstance(s, np.ndarray):
+                parts.append(str(s.tolist()))
+            else:
+                part = f'{"" if s.start is None else s.start}:{"" if s.stop is None else s.stop}'
+                parts.append(part if s.step is None else f'{part}:{s.step}')
+        return 'region[' + ', '.join(parts) + ']'
+
+class RegionSet:
+    '''
+    | Many boxes in an object, described by arrays of offsets and sizes instead of one :class:`Region` per box.
+    | Pass a region set to :func:`Object.get_data` or :func:`Object.set_data` to transfer every box in one batch.
+    | Example, the 16x16 tiles along the diagonal of a 1024x1024 object::
+    |
+    |     starts = np.arange(0, 1024, 16)
+    |     regions = pdc.RegionSet(np.stack([starts, starts], axis=1), (16, 16))
+    |     tiles = obj.get_data(regions).wait()
+    '''
+
+    def __init__(self, offsets:npt.ArrayLike, sizes:npt.ArrayLike):
+        '''
+        :param offsets: an (n, ndim) array of the offsets of each box.  For 1 dimensional objects, an (n,) array.
+        :param sizes: an (n, ndim) array of the sizes of each box, or an (ndim,) array if every box has the same size.
+        '''
+        offsets = np.asarray(offsets)
+        sizes = np.asarray(sizes)
+        if offsets.ndim == 1:
+            offsets = offsets[:, np.newaxis]
+            if sizes.ndim == 1 and len(sizes) != 1:
+                sizes = sizes[:, np.newaxis]
+        if offsets.ndim != 2 or offsets.shape[1] == 0:
+            raise ValueError(f'offsets must have shape (n, ndim), got {offsets.shape}')
+        if offsets.size and offsets.dtype.kind not in 'ui' or sizes.size and sizes.dtype.kind not in 'ui':
+            raise TypeError('offsets and sizes must be integer arrays')
+        try:
+            sizes = np.broadcast_to(sizes, offsets.shape)
+        except ValueError:
+            raise ValueError(f'sizes with shape {sizes.shape} does not match offsets with shape {offsets.shape}') from None
+        if (offsets < 0).any():
+            raise OverflowError('offsets must not be negative')
+        if (sizes <= 0).any():
+            raise ValueError('sizes must be greater than 0')
+        self.offsets = offsets.astype(np.uint64)
+        self.sizes = sizes.astype(np.uint64)
+        self.offsets.flags.writeable = False
+        self.sizes.flags.writeable = False
+    
+    @classmethod
+    def from_regions(cls, regions:Iterable[Region], dims:Tuple[uint64, ...]) -> 'RegionSet':
+        '''
+        Make a region set from regions in an object with the given dimensions.
+        '''
+        bounds = [r._bounds(dims) for r in regions]
+        if not bounds:
+            return cls(np.empty((0, len(dims)), dtype=np.uint64), np.empty((0, len(dims)), dtype=np.uint64))
+        offsets, sizes = zip(*bounds)
+        return cls(np.array(offsets, dtype=np.uint64), np.array(sizes, dtype=np.uint64))
+    
+    @property
+    def ndim(self) -> int:
+        return self.offsets.shape[1]
+    
+    def _validate(self, dims:Tuple[uint64, ...]) -> None:
+        #check every box against the dimensions of an object at once
+        if self.ndim != len(dims):
+            raise ValueError(f'regions have {self.ndim} dimensions, but the object has {len(dims)}')
+        limits = np.asarray(dims, dtype=np.uint64)
+        bad = (self.sizes > limits).any(axis=1) | (self.offsets > limits - np.minimum(self.sizes, limits)).any(axis=1)
+        if bad.any():
+            i = int(np.argmax(bad))
+            raise ValueError(f'region {self[i]} is out of bounds for dimensions {dims}')
+    
+    def _coalesce(self, overlap:bool) -> Tuple['RegionSet', npt.NDArray]:
+        '''
+        Returns the coalesced region set, and the index of the box containing each box of this set.
+        '''
+        n, ndim = self.offsets.shape
+        lo = self.offsets.astype(np.int64)
+        hi = lo + self.sizes.astype(np.int64)
+        owner = np.arange(n)
+        changed = n > 1
+        while changed:
+            changed = False
+            for d in reversed(range(ndim)):
+                others = [k for k in range(ndim) if k != d]
+                #group boxes that match in every other dimension, ordered along d
+                order = np.lexsort([lo[:, d]] + [hi[:, k] for k in others] + [lo[:, k] for k in others])
+                lo, hi = lo[order], hi[order]
+                m = len(lo)
+                #boxes start a new group where they differ from the previous box in any other dimension
+                starts_group = np.ones(m, dtype=bool)
+                if others:
+                    starts_group[1:] = (lo[1:, others] != lo[:-1, others]).any(axis=1) | (hi[1:, others] != hi[:-1, others]).any(axis=1)
+                else:
+                    starts_group[1:] = False
+                if overlap:
+                    #the highest stop so far in each group, found by ranking the stops so the running maximum can't cross groups
+                    stops, ranks = np.unique(hi[:, d], return_inverse=True)
+                    group_base = (np.cumsum(starts_group) - 1) * len(stops)
+                    reach = stops[np.maximum.accumulate(group_base + ranks.reshape(-1)) - group_base]
+                    starts_run = starts_group.copy()
+                    starts_run[1:] |= lo[1:, d] > reach[:-1]
+                else:
+                    #a run only grows by boxes starting where the previous one stops
+                    starts_run = starts_group.copy()
+                    starts_run[1:] |= lo[1:, d] != hi[:-1, d]
+                run_starts = np.flatnonzero(starts_run)
+                remap = np.empty(m, dtype=np.int64)
+                remap[order] = np.cumsum(starts_run) - 1
+                new_hi = hi[run_starts]
+                new_hi[:, d] = np.maximum.reduceat(hi[:, d], run_starts)
+                lo, hi = lo[run_starts], new_hi
+                owner = remap[owner]
+                changed = changed or len(run_starts) < m
+        return RegionSet(lo.astype(np.uint64), (hi - lo).astype(np.uint64)), owner
+    
+    def coalesce(self, overlap:bool=True) -> 'RegionSet':
+        '''
+        | Merge boxes that are adjacent, and boxes that overlap if overlap is True, into fewer, larger boxes that cover exactly the same elements.
+        | Boxes are only merged when they line up in every other dimension, so the result is exact.
+        '''
+        return self._coalesce(overlap)[0]
+    
+    def __len__(self) -> int:
+        return len(self.offsets)
+    
+    def __getitem__(self, i:int) -> Region:
+        offsets = tuple(self.offsets[i].tolist())
+        return Region._from_bounds(offsets, tuple(o + s for o, s in zip(offsets, self.sizes[i].tolist())))
+    
+    def __iter__(self) -> Iterator[Region]:
+        for offsets, sizes in zip(self.offsets.tolist(), self.sizes.tolist()):
+            yield Region._from_bounds(tuple(offsets), tuple(o + s for o, s in zip(offsets, sizes)))
     
     def __repr__(self) -> str:
-        return 'region[' + ', '.join(
-            f'{"" if s.start is None else s.start}:{"" if s.stop is None else s.stop}' for s in self.slices
-        ) + ']'
+        return f'RegionSet({len(self)} regions, ndim={self.ndim})'
 
 class _RegionFactory:
     def __getitem__(self, *slices) -> Region:
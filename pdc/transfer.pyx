@@ -0,0 +1,738 @@
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import itertools
+import time
+
+import numpy as np
+import numpy.typing as npt
+
+from .main import PDCError, checktype, ctrace, _Backoff
+from .object import Object, BufferPool, _as_array, _check_copy_mode, _region_shaped, _region_view, _write_buffers
+from .region import Region, RegionSet
+from .region import region as region_
+cimport pdc.cpdc as cpdc
+from pdc.cpdc cimport pdcid_t, perr_t, uint64_t
+from pdc.main cimport malloc_or_memerr
+from cpython.mem cimport PyMem_Free as free
+
+cdef pdcid_t *_id_array(requests) except NULL:
+    cdef size_t n = len(requests)
+    cdef pdcid_t *ids = <pdcid_t *> malloc_or_memerr(sizeof(pdcid_t) * (n if n else 1))
+    for i in range(n):
+        ids[i] = requests[i]._id
+    return ids
+
+class TransferBatch:
+    '''
+    | Collects many GET and SET transfer requests, possibly across several objects, and starts and waits for them together.
+    | Starting and waiting on a whole batch takes one round trip instead of one per request.
+    |
+    | Usage as a context manager, where the batch is submitted and waited on when the block exits::
+    |
+    |     with pdc.TransferBatch() as batch:
+    |         for i in range(10):
+    |             batch.set(obj, tiles[i], region[i])
+    |         first = batch.get(obj2, region[:4])
+    |     print(batch.nbytes, batch.elapsed)
+    |
+    | Or explicitly::
+    |
+    |     batch = pdc.TransferBatch()
+    |     batch.get(obj, region[:4])
+    |     batch.get(obj2)
+    |     batch.submit()
+    |     a, b = batch.wait_all()
+    '''
+
+    def __init__(self):
+        self._requests = []
+        self._submitted = 0
+        self._start_time = None
+        self.elapsed = 0.0
+
+    def get(self, obj:Object, region:Region=None, *, out=None, copy:str='if_needed', pool:Optional[BufferPool]=None) -> Object.TransferRequest:
+        '''
+        Add a request for a region of data from an object to this batch.
+
+        :param Object obj: the object to get data from
+        :param Region region: the region of data to get.  If this is None, defaults to the entire object.
+        :param out: the buffer to write the data into.  See :func:`Object.get_data`
+        :param str copy: See :func:`Object.get_data`
+        :param BufferPool pool: See :func:`Object.get_data`
+        :return: the (not yet started) transfer request
+        '''
+        checktype(obj, 'object', Object)
+        request = Object.TransferRequest(
+            region if region else region_[:],
+            obj,
+            Object.TransferRequest.RequestType.GET,
+            out=out,
+            copy=copy,
+            pool=pool,
+            _start=False
+        )
+        self._requests.append(request)
+        return request
+
+    def set(self, obj:Object, data:npt.ArrayLike, region:Region=None, *, copy:str='if_needed') -> Object.TransferRequest:
+        '''
+        Add a request to set a region of an object's data to this batch.
+
+        :param Object obj: the object to set data in
+        :param data: The data to set the region to.  See :func:`Object.set_data`
+        :param Region region: the region of data to set. Defaults to the entire object.
+        :param str copy: See :func:`Object.set_data`
+        :return: the (not yet started) transfer request
+        '''
+        checktype(obj, 'object', Object)
+        request = Object.TransferRequest(
+            region if region else region_[:],
+            obj,
+            Object.TransferRequest.RequestType.SET,
+            data,
+            copy=copy,
+            _start=False
+        )
+        self._requests.append(request)
+        return request
+
+    def submit(self) -> None:
+        '''
+        Start every request added since the last call to submit.
+        '''
+        pending = [r for r in self._requests[self._submitted:] if not r.started]
+        self._submitted = len(self._requests)
+        if not pending:
+            return
+        if self._start_time is None:
+            self._start_time = time.perf_counter()
+
+        cdef pdcid_t *ids = _id_array(pending)
+        cdef size_t n = len(pending)
+        cdef perr_t rtn
+        try:
+            with nogil:
+                rtn = cpdc.PDCregion_transfer_start_all(ids, n)
+            ctrace('region_transfer_start_all', rtn, tuple(r._id for r in pending), len(pending))
+            if rtn != 0:
+                raise PDCError('failed to start transfers')
+        finally:
+            free(ids)
+        for r in pending:
+            r._started = True
+
+    def wait_all(self) -> List[npt.NDArray]:
+        '''
+        Submit any requests that have not been started, then block until every request in this batch is complete.
+
+        :return: The results of the GET requests in this batch, in the order they were added.
+        '''
+        self.submit()
+        pending = [r for r in self._requests if not r._done]
+        cdef pdcid_t *ids
+        cdef size_t n = len(pending)
+        cdef perr_t rtn
+        if pending:
+            ids = _id_array(pending)
+            try:
+                with nogil:
+                    rtn = cpdc.PDCregion_transfer_wait_all(ids, n)
+                ctrace('region_transfer_wait_all', rtn, tuple(r._id for r in pending), len(pending))
+                if rtn != 0:
+                    raise PDCError('Failed to wait for transfer requests')
+            finally:
+                free(ids)
+            for r in pending:
+                r._mark_done()
+        if self._start_time is not None:
+            self.elapsed = time.perf_counter() - self._start_time
+        return self.results
+
+    @property
+    def requests(self) -> List[Object.TransferRequest]:
+        '''
+        All requests in this batch, in the order they were added.
+        '''
+        return list(self._requests)
+
+    @property
+    def results(self) -> List[Optional[npt.NDArray]]:
+        '''
+        The results of the GET requests in this batch, in the order they were added.
+        Requests that are not done yet have a result of None.
+        '''
+        return [r.result for r in self._requests if r.type == Object.TransferRequest.RequestType.GET]
+
+    @property
+    def done(self) -> bool:
+        '''
+        True if every request in this batch is complete
+        '''
+        return all(r.done for r in self._requests)
+
+    @property
+    def nbytes(self) -> int:
+        '''
+        The total number of bytes moved by the requests in this batch
+        '''
+        return sum(r.nbytes for r in self._requests)
+
+    @property
+    def bandwidth(self) -> float:
+        '''
+        The aggregate bandwidth of this batch in bytes per second, measured from the first submit to the end of the last :func:`wait_all`.
+        '''
+        if not self.elapsed:
+            return 0.0
+        return self.nbytes / self.elapsed
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def __enter__(self) -> 'TransferBatch':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.wait_all()
+        return False
+
+class _CompoundRequest:
+    #a request made of the transfers in self._batch.  Subclasses implement result
+    RequestType = Object.TransferRequest.RequestType
+    
+    def _start(self) -> None:
+        self._batch.submit()
+    
+    @property
+    def started(self) -> bool:
+        '''
+        True if the transfers have been started
+        '''
+        return all(r.started for r in self._batch.requests)
+    
+    @property
+    def done(self) -> bool:
+        '''
+        True if every transfer is completed
+        '''
+        return self._batch.done
+    
+    def wait(self):
+        '''
+        Block until every transfer is complete, and return :attr:`result`.
+        '''
+        self._batch.wait_all()
+        return self.result
+    
+    def __await__(self):
+        return self._wait_async().__await__()
+    
+    async def _wait_async(self):
+        backoff = _Backoff()
+        while not self.done:
+            await asyncio.sleep(backoff.next())
+        return self.wait()
+    
+    @property
+    def requests(self) -> List[Object.TransferRequest]:
+        '''
+        The transfer requests, one per box.
+        '''
+        return self._batch.requests
+    
+    @property
+    def nbytes(self) -> int:
+        '''
+        The total number of bytes moved by the transfers
+        '''
+        return self._batch.nbytes
+    
+    def __len__(self) -> int:
+        return len(self._batch)
+
+class RegionSetRequest(_CompoundRequest):
+    '''
+    | The transfers of every box in a :class:`RegionSet`, started together as one batch.
+    | Returned by :func:`Object.get_data` and :func:`Object.set_data` when they are given a region set.
+    | It has the same interface as :class:`Object.TransferRequest`: it can be waited on, polled with :attr:`done`, and awaited.
+    '''
+
+    def __init__(self, obj:Object, regions:RegionSet, request_type, data:Optional[Sequence[npt.ArrayLike]]=None, *, coalesce:bool=False, copy:str='if_needed'):
+        '''
+        __init__(*args)
+        '''
+        checktype(obj, 'object', Object)
+        checktype(regions, 'regions', RegionSet)
+        checktype(request_type, 'request type', type(self).RequestType)
+        dims = obj.dims
+        regions._validate(dims)
+        self.obj = obj
+        self.type = request_type
+        self.regions = regions
+        self._result = None
+        
+        #overlapping boxes can only be merged for reads, since the order overlapping writes are applied in is undefined
+        transfer_regions, self._owner = regions, None
+        if coalesce:
+            coalesced, owner = regions._coalesce(overlap=request_type == type(self).RequestType.GET)
+            if len(coalesced) < len(regions):
+                transfer_regions, self._owner = coalesced, owner
+        self._transfer_regions = transfer_regions
+        
+        self._batch = TransferBatch()
+        if request_type == type(self).RequestType.GET:
+            for r in transfer_regions:
+                self._batch.get(obj, r, copy=copy)
+        else:
+            data = list(data)
+            if len(data) != len(regions):
+                raise ValueError(f'got {len(data)} arrays of data for {len(regions)} regions')
+            if self._owner is not None:
+                data = self._gather(data, obj.type.as_numpy_type())
+            for r, d in zip(transfer_regions, data):
+                self._batch.set(obj, d, r, copy=copy)
+        self._batch.submit()
+    
+    def _piece(self, i:int):
+        #the position of box i of self.regions in the transfer region that contains it
+        m = self._owner[i]
+        start = self.regions.offsets[i] - self._transfer_regions.offsets[m]
+        return m, tuple(slice(o, o + s) for o, s in zip(start.tolist(), self.regions.sizes[i].tolist()))
+    
+    def _gather(self, data:List[npt.ArrayLike], dtype:np.dtype) -> List[npt.NDArray]:
+        buffers = [np.empty(tuple(s), dtype=dtype) for s in self._transfer_regions.sizes.tolist()]
+        for i, d in enumerate(data):
+            m, piece = self._piece(i)
+            buffers[m][piece] = np.asarray(d).reshape(tuple(self.regions.sizes[i].tolist()))
+        return buffers
+    
+    def wait(self) -> Optional[List[npt.NDArray]]:
+        '''
+        Block until every transfer is complete.
+        If this is a GET request, returns the data of each box of the region set, in order.  Otherwise, returns None.
+        '''
+        return super().wait()
+    
+    @property
+    def result(self) -> Optional[List[npt.NDArray]]:
+        '''
+        | If the request is done and the request type is GET, a list with an array for each box of the region set, in order.  Otherwise, None.
+        | When boxes were coalesced, the arrays are views into the arrays of the merged boxes.
+        '''
+        if self.type == type(self).RequestType.SET or not self.done:
+            return None
+        if self._result is None:
+            results = self._batch.results
+            if self._owner is None:
+                self._result = results
+            else:
+                self._result = []
+                for i in range(len(self.regions)):
+                    m, piece = self._piece(i)
+                    self._result.append(results[m][piece])
+        return self._result
+
+class SelectionRequest(_CompoundRequest):
+    '''
+    | The transfer of a region with step values or index arrays, e.g. ``region[::4, [1, 5, 9]]``.
+    | Returned by :func:`Object.get_data` and :func:`Object.set_data` when they are given such a region.
+    | The selection is split into boxes which are transferred as one batch, and the data is scattered into (or gathered from) the selected elements on the client.
+    | Reads choose, per dimension, between one box per run of consecutive coordinates and one box spanning all of them, whichever moves fewer bytes counting a fixed overhead per box.  Writes only cover the selected elements.
+    | It has the same interface as :class:`Object.TransferRequest`.
+    '''
+
+    def __init__(self, obj:Object, region:Region, request_type, data:Optional[npt.ArrayLike]=None, *, out=None, copy:str='if_needed'):
+        '''
+        __init__(*args)
+        '''
+        checktype(obj, 'object', Object)
+        checktype(region, 'region', Region)
+        checktype(request_type, 'request type', type(self).RequestType)
+        _check_copy_mode(copy)
+        if copy == 'never':
+            raise ValueError('data of regions with step values or index arrays is always copied, so copy must not be \'never\'')
+        dtype = obj.type.as_numpy_type()
+        is_get = request_type == type(self).RequestType.GET
+        coords, segments, boxes = region._decompose(obj.dims, dtype.itemsize, not is_get)
+        self.obj = obj
+        self.type = request_type
+        self.region = region
+        self.boxes = boxes
+        shape = tuple(len(c) for c in coords)
+        
+        #for each dimension and segment, the positions in the selection that fall in the segment, and their offsets in it
+        self._pieces = []
+        for c, dim_segments in zip(coords, segments):
+            dim_pieces = []
+            for start, stop in dim_segments:
+                pos = np.nonzero((c >= start) & (c < stop))[0]
+                dim_pieces.append((pos, c[pos] - start))
+            self._pieces.append(dim_pieces)
+        
+        self._batch = TransferBatch()
+        self._copy_to = None
+        if is_get:
+            if out is None:
+                out = np.empty(shape, dtype=dtype)
+            else:
+                out = _as_array(out, dtype, shape)
+                if not out.flags.writeable:
+                    raise ValueError('out must be writable')
+                if out.size != np.prod(shape, dtype=np.int64):
+                    raise ValueError(f'out has {out.size} elements, but the selection has shape {shape}')
+                view = _region_view(out, shape)
+                if view is None:
+                    #filled in C order once the data is scattered
+                    self._copy_to = out
+                    out = np.empty(shape, dtype=dtype)
+                else:
+                    out = view
+            self._out = out
+            self._scattered = False
+            for r in boxes:
+                self._batch.get(obj, r)
+        else:
+            data = np.broadcast_to(_as_array(data, dtype, shape), shape)
+            self._out = None
+            for r, piece in zip(boxes, itertools.product(*self._pieces)):
+                buffer = np.empty(tuple(len(local) for _, local in piece), dtype=dtype)
+                buffer[np.ix_(*[local for _, local in piece])] = data[np.ix_(*[pos for pos, _ in piece])]
+                self._batch.set(obj, buffer, r)
+        self._batch.submit()
+    
+    def wait(self) -> Optional[npt.NDArray]:
+        '''
+        Block until every transfer is complete.
+        If this is a GET request, returns the selected data.  Otherwise, returns None.
+        '''
+        return super().wait()
+    
+    @property
+    def result(self) -> Optional[npt.NDArray]:
+        '''
+        If the request is done and the request type is GET, the selected data, with one dimension per dimension of the object.  Otherwise, None.
+        '''
+        if self.type == type(self).RequestType.SET or not self.done:
+            return None
+        if not self._scattered:
+            for data, piece in zip(self._batch.results, itertools.product(*self._pieces)):
+                self._out[np.ix_(*[pos for pos, _ in piece])] = data[np.ix_(*[local for _, local in piece])]
+            if self._copy_to is not None:
+                np.copyto(self._copy_to, self._out.reshape(self._copy_to.shape))
+                self._out = self._copy_to
+                self._copy_to = None
+            self._scattered = True
+        return self._out
+
+class WriteBuffer:
+    '''
+    | Collects many small writes to one object, and sets them in fewer, larger transfers.  Created with :func:`Object.buffered_writer`.
+    | Data is copied into the buffer, so it can be modified as soon as :func:`set` returns.
+    | When the buffer is flushed, adjacent and overlapping writes are merged into as few boxes as possible, and the boxes are set in one batch.  Where writes overlap, the later write wins.
+    | The buffer is flushed once the buffered writes hold ``max_bytes``, once the oldest buffered write is ``max_delay`` seconds old (checked on each :func:`set`), and when the ``with`` block it is used in exits.
+    | At most one flush is in flight: a flush first waits for the previous one.
+    | Reading or setting the object's data with :func:`Object.get_data` or :func:`Object.set_data` first flushes and waits for the buffered writes that overlap it, so reads from this client see every write made through the buffer.
+
+    Usage::
+
+        with obj.buffered_writer() as writer:
+            for i in range(1000):
+                writer.set(slab[i], region[i])
+    '''
+
+    def __init__(self, obj:Object, *, max_bytes:int=16 * 1024 * 1024, max_delay:Optional[float]=None):
+        '''
+        :param Object obj: the object to write to
+        :param int max_bytes: flush once the buffered writes hold at least this many bytes
+        :param float max_delay: flush once the oldest buffered write is this many seconds old, or None to only flush on size
+        '''
+        checktype(obj, 'object', Object)
+        checktype(max_bytes, 'max_bytes', int)
+        if max_delay is not None:
+            checktype(max_delay, 'max_delay', int, float)
+        self.obj = obj
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._dims = obj.dims
+        self._dtype = obj.type.as_numpy_type()
+        #(offsets, sizes, data) of each buffered write, in order
+        self._pending = []
+        self._pending_bytes = 0
+        self._oldest = None
+        self._in_flight = None
+        #bounds of the writes in the flush in flight
+        self._in_flight_bounds = None
+        #: the number of writes made through this buffer
+        self.writes = 0
+        #: the number of transfers the writes were merged into
+        self.transfers = 0
+
+    def set(self, data:npt.ArrayLike, region:Region=None) -> None:
+        '''
+        Buffer a write of data to a region of the object.
+
+        :param data: the data to set the region to.  See :func:`Object.set_data`
+        :param Region region: the region of data to set.  Defaults to the entire object.  It must not have step values or index arrays.
+        '''
+        if region is None:
+            region = region_[:]
+        checktype(region, 'region', Region)
+        offsets, sizes = region._bounds(self._dims)
+        arr = _as_array(data, self._dtype, sizes)
+        if arr.size != np.prod(sizes, dtype=np.int64):
+            raise ValueError(f'data has {arr.size} elements, but the region has shape {sizes}')
+        arr = np.array(_region_shaped(arr, sizes, 'data'), dtype=self._dtype).reshape(sizes)
+        
+        if not self._pending:
+            self._oldest = time.monotonic()
+        self._pending.append((offsets, sizes, arr))
+        self._pending_bytes += arr.nbytes
+        self.writes += 1
+        _write_buffers.setdefault(self.obj, set()).add(self)
+        if self._pending_bytes >= self.max_bytes or (self.max_delay is not None and time.monotonic() - self._oldest >= self.max_delay):
+            self.flush()
+
+    def flush(self) -> None:
+        '''
+        Start setting the buffered writes, after waiting for the previous flush.  Does not wait for the new transfers.
+        '''
+        if not self._pending:
+            return
+        self._wait_in_flight()
+        lo = np.array([o for o, _, _ in self._pending], dtype=np.int64)
+        hi = lo + np.array([s for _, s, _ in self._pending], dtype=np.int64)
+        merged, _ = RegionSet(lo.astype(np.uint64), (hi - lo).astype(np.uint64))._coalesce(overlap=True)
+        
+        batch = TransferBatch()
+        for box, box_lo, box_size in zip(merged, merged.offsets.astype(np.int64), merged.sizes.tolist()):
+            box_hi = box_lo + np.array(box_size, dtype=np.int64)
+            buffer = np.empty(box_size, dtype=self._dtype)
+            #merged boxes can overlap each other, so fill each with every write it overlaps, in order, so they agree where they overlap
+            for i in np.nonzero(np.all((lo < box_hi) & (hi > box_lo), axis=1))[0]:
+                start = np.maximum(lo[i], box_lo)
+                stop = np.minimum(hi[i], box_hi)
+                buffer[tuple(slice(a, b) for a, b in zip((start - box_lo).tolist(), (stop - box_lo).tolist()))] = \
+                    self._pending[i][2][tuple(slice(a, b) for a, b in zip((start - lo[i]).tolist(), (stop - lo[i]).tolist()))]
+            batch.set(self.obj, buffer, box)
+        batch.submit()
+        
+        self._in_flight = batch
+        self._in_flight_bounds = (lo, hi)
+        self.transfers += len(batch)
+        self._pending = []
+        self._pending_bytes = 0
+        self._oldest = None
+
+    def _wait_in_flight(self) -> None:
+        if self._in_flight is not None:
+            self._in_flight.wait_all()
+            self._in_flight = None
+            self._in_flight_bounds = None
+
+    def wait(self) -> None:
+        '''
+        Flush the buffered writes, and block until every write is complete.
+        '''
+        self.flush()
+        self._wait_in_flight()
+        buffers = _write_buffers.get(self.obj)
+        if buffers is not None:
+            buffers.discard(self)
+
+    def _overlaps(self, offsets:Tuple[int, ...], sizes:Tuple[int, ...]) -> bool:
+        lo = np.array(offsets, dtype=np.int64)
+        hi = lo + np.array(sizes, dtype=np.int64)
+        bounds = []
+        if self._pending:
+            pending_lo = np.array([o for o, _, _ in self._pending], dtype=np.int64)
+            bounds.append((pending_lo, pending_lo + np.array([s for _, s, _ in self._pending], dtype=np.int64)))
+        if self._in_flight_bounds is not None:
+            bounds.append(self._in_flight_bounds)
+        return any(np.any(np.all((write_lo < hi) & (write_hi > lo), axis=1)) for write_lo, write_hi in bounds)
+
+    def _sync(self, region) -> None:
+        #make the writes that overlap region visible to transfers of region.  region is None for the entire object, or anything else that isn't a box
+        if isinstance(region, Region) and region.is_box():
+            offsets, sizes = region._bounds(self._dims)
+            if not self._overlaps(offsets, sizes):
+                return
+        self.wait()
+
+    @property
+    def pending_bytes(self) -> int:
+        '''
+        The size of the writes that have not been flushed, in bytes
+        '''
+        return self._pending_bytes
+
+    def __len__(self) -> int:
+        '''
+        The number of writes that have not been flushed
+        '''
+        return len(self._pending)
+
+    def __enter__(self) -> 'WriteBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            #drop the writes that were never started, but transfers in flight must complete
+            self._pending = []
+            self._pending_bytes = 0
+        self.wait()
+        return False
+
+def as_completed(requests:Iterable[Object.TransferRequest], timeout:Optional[float]=None) -> Iterator[Object.TransferRequest]:
+    '''
+    | Iterate over transfer requests in the order they complete, rather than the order they were given.
+    | Requests that have not been started yet (e.g. ones added to a :class:`TransferBatch` that hasn't been submitted) are started.
+    | In a coroutine, use ``asyncio.as_completed`` instead, since transfer requests are awaitable.
+    
+    Usage::
+
+        for req in pdc.as_completed(requests):
+            process(req.result)
+
+    :param requests: the transfer requests to wait on
+    :param timeout: the maximum number of seconds to wait for all requests, or None to wait indefinitely
+    :return: An iterator that yields each request as soon as it is done
+    :raises TimeoutError: if the timeout expires before all requests are done
+    '''
+    pending = list(requests)
+    for r in pending:
+        checktype(r, 'request', Object.TransferRequest, _CompoundRequest)
+        if not r.started:
+            r._start()
+    
+    deadline = None if timeout is None else time.monotonic() + timeout
+    backoff = _Backoff()
+    while pending:
+        still_pending = []
+        for r in pending:
+            if r.done:
+                r.wait()
+                yield r
+            else:
+                still_pending.append(r)
+        
+        if len(still_pending) != len(pending):
+            backoff.reset()
+        pending = still_pending
+        if not pending:
+            break
+        
+        delay = backoff.next()
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f'{len(pending)} transfer requests did not complete in time')
+            delay = min(delay, remaining)
+        time.sleep(delay)
+
+def wait_any(requests:Iterable[Object.TransferRequest], timeout:Optional[float]=None) -> Object.TransferRequest:
+    '''
+    Block until any one of the given transfer requests is done, and return it.
+
+    :param requests: the transfer requests to wait on
+    :param timeout: the maximum number of seconds to wait, or None to wait indefinitely
+    :return: the first request found to be done
+    :raises TimeoutError: if the timeout expires before any request is done
+    :raises ValueError: if requests is empty
+    '''
+    requests = list(requests)
+    if not requests:
+        raise ValueError('requests must not be empty')
+    for r in as_completed(requests, timeout):
+        return r
+
+class TransferExecutor:
+    '''
+    | Runs transfers and queries on a pool of worker threads and returns :class:`concurrent.futures.Future` objects.
+    | PDC calls that block (waiting on transfers, getting query selections, creating and opening objects) release the GIL,
+    | so other Python threads, such as numpy post-processing, keep running while a worker waits on PDC.
+    |
+    | There is no lock around PDC calls, so running PDC calls from more than one thread at once requires a PDC client that was built with thread safety enabled.
+    | Otherwise, use ``max_workers=1``, and make no PDC calls from any other thread, including the calling thread, until every submitted future is done.
+    | That includes getting or setting data, checking :attr:`Object.TransferRequest.done`, and dropping the last reference to a transfer request, which closes it.
+    | The worker then only overlaps I/O with work in the calling thread that doesn't use pdc, such as numpy post-processing.
+    
+    Usage::
+
+        with pdc.TransferExecutor(max_workers=4) as executor:
+            futures = [executor.get_data(obj, region[i]) for i in range(16)]
+            for future in concurrent.futures.as_completed(futures):
+                process(future.result())
+    '''
+
+    def __init__(self, max_workers:Optional[int]=None):
+        '''
+        :param max_workers: the maximum number of worker threads.  Defaults to the default of :class:`concurrent.futures.ThreadPoolExecutor`.
+        '''
+        if max_workers is not None:
+            checktype(max_workers, 'max_workers', int)
+            if max_workers <= 0:
+                raise ValueError('max_workers must be greater than 0')
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pdc_transfer')
+
+    def submit(self, fn:Callable, *args, **kwargs) -> Future:
+        '''
+        Run an arbitrary callable on a worker thread.
+
+        :return: A future for the callable's return value
+        '''
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def get_data(self, obj:Object, region:Region=None) -> Future:
+        '''
+        Get a region of an object's data on a worker thread.
+
+        :param Object obj: the object to get data from
+        :param Region region: the region of data to get.  If this is None, defaults to the entire object.
+        :return: A future for the data
+        '''
+        checktype(obj, 'object', Object)
+        return self._pool.submit(_get_and_wait, obj, region)
+
+    def set_data(self, obj:Object, data:npt.ArrayLike, region:Region=None) -> Future:
+        '''
+        Set a region of an object's data on a worker thread.
+        The data must not be modified until the future is done.
+
+        :param Object obj: the object to set data in
+        :param data: the data to set the region to.
+        :param Region region: the region of data to set. Defaults to the entire object.
+        :return: A future that completes (with the value None) when the data has been set
+        '''
+        checktype(obj, 'object', Object)
+        return self._pool.submit(_set_and_wait, obj, data, region)
+
+    def get_result(self, query:'Query', region:Region=None) -> Future:
+        '''
+        Run a query on a worker thread.
+
+        :param Query query: the query to run
+        :param Region region: The region to query over.  If this is None, the entire object is queried.
+        :return: A future for the query's :class:`Query.Result`
+        '''
+        return self._pool.submit(query.get_result, region)
+
+    def shutdown(self, wait:bool=True) -> None:
+        '''
+        Stop accepting work, and optionally wait for queued work to finish.
+        '''
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self) -> 'TransferExecutor':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(wait=True)
+        return False
+
+def _get_and_wait(obj, region):
+    return obj.get_data(region).wait()
+
+def _set_and_wait(obj, data, region):
+    return obj.set_data(data, region).wait()
@@ -0,0 +1,39 @@
+import pdc
+import pytest
+import numpy as np
+
+def test_array_view():
+    cont = pdc.Container('arrayviewcont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    data = np.arange(20 * 30, dtype=np.double).reshape(20, 30)
+    obj = cont.object_from_array('arrayviewobj', data)
+
+    view = obj.array[2:18][:, ::-3][1:, [0, 4]]
+    assert isinstance(view, pdc.ArrayView)
+    assert view.shape == data[2:18][:, ::-3][1:, [0, 4]].shape
+    assert view.dtype == np.double
+    assert np.array_equal(np.asarray(view), data[2:18][:, ::-3][1:, [0, 4]])
+
+    assert np.array_equal(obj[5].compute(), data[5])
+    assert np.array_equal(obj[..., -1].compute(), data[..., -1])
+    assert obj[3, 4].compute() == data[3, 4]
+    assert obj[5:5].compute().shape == (0, 30)
+    assert np.array_equal(np.asarray(obj), data)
+    #reads always make new arrays
+    with pytest.raises(ValueError):
+        np.asarray(obj, copy=False)
+    with pytest.raises(ValueError):
+        np.array(view, copy=False)
+
+    assert np.array_equal(np.add(obj.array[0], obj.array[1]), data[0] + data[1])
+
+    a, b, c = pdc.compute(obj[1], obj[1], obj[:2])
+    assert np.array_equal(a, data[1]) and np.array_equal(b, data[1])
+    assert a is not b
+    assert np.array_equal(c, data[:2])
+
+    with pytest.raises(IndexError):
+        obj.array[0, 0, 0]
+    with pytest.raises(IndexError):
+        obj.array[20]
+    with pytest.raises(IndexError):
+        obj.array[[1], [2]]
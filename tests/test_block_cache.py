@@ -0,0 +1,62 @@
+import pdc
+import pytest
+import numpy as np
+from pdc import region
+
+def test_block_cache():
+    cont = pdc.Container('blockcachecont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    data = np.arange(100 * 10, dtype=np.int64).reshape(100, 10)
+    obj = cont.object_from_array('blockcacheobj', data)
+    cache = pdc.Object.block_cache
+    cache.enable(obj, block_shape=(10,))
+    assert cache.block_shape(obj) == (10, 10)
+    hits, misses, saved = cache.hits, cache.misses, cache.bytes_saved
+
+    request = obj.get_data(region[5:25])
+    assert isinstance(request, pdc.CachedRequest)
+    assert np.array_equal(request.wait(), data[5:25])
+    assert cache.misses - misses == 3
+
+    #fully covered read, served from memory
+    request = obj.get_data(region[12:18, 2:4])
+    assert request.done and len(request) == 0
+    assert np.array_equal(request.wait(), data[12:18, 2:4])
+    assert cache.hits - hits == 1
+    assert cache.bytes_saved - saved == 6 * 2 * 8
+
+    #partial hit only fetches blocks 3 and 4
+    request = obj.get_data(region[20:50])
+    assert len(request) == 1
+    assert np.array_equal(request.wait(), data[20:50])
+    assert cache.misses - misses == 5
+
+    #writes through this client discard the blocks they overlap
+    obj.set_data(np.zeros((2, 10), dtype=np.int64), region[21:23]).wait()
+    data[21:23] = 0
+    request = obj.get_data(region[10:30])
+    assert len(request) == 1
+    assert np.array_equal(request.wait(), data[10:30])
+
+    out = np.empty((10, 10), dtype=np.int64)
+    obj.get_data(region[:10], out=out).wait()
+    assert np.array_equal(out, data[:10])
+    assert 0 < cache.hit_ratio < 1
+
+    #an out that can't be viewed with the region's shape is filled by copying, unless copy is 'never'
+    cols = np.zeros((20, 10), dtype=np.int64)
+    with pytest.raises(ValueError):
+        obj.get_data(region[:10], out=cols[:, :5], copy='never')
+    result = obj.get_data(region[:10], out=cols[:, :5]).wait()
+    assert np.shares_memory(result, cols)
+    assert np.array_equal(cols[:, :5], data[:10].reshape(20, 5))
+
+    old_max = cache.max_bytes
+    cache.max_bytes = 800
+    assert len(cache) == 1
+    assert cache.evictions > 0
+    cache.max_bytes = old_max
+
+    cache.disable(obj)
+    assert not isinstance(obj.get_data(region[:10]), pdc.CachedRequest)
+    with pytest.raises(ValueError):
+        cache.enable(obj, (0,))
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 import pdc
 from pdc import Container, PDCError
 
@@ -80,3 +81,35 @@ def test_get_container_multiple_times():
     cont2 = pdc.Container.get('multiget_cont')
     assert cont1 is cont2
     assert cont1._id == cont2._id
+
+def test_create_objects():
+    cont = pdc.Container('contcreateobjects', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    prop = pdc.Object.Properties(dims=(4,), type=pdc.Type.INT32)
+    objects = cont.create_objects([f'createobjects{i}' for i in range(10)], prop)
+    assert [obj.name for obj in objects] == [f'createobjects{i}' for i in range(10)]
+    assert all(obj.dims == (4,) for obj in objects)
+
+    prop2 = pdc.Object.Properties(dims=(2, 3), type=pdc.Type.DOUBLE)
+    objects = cont.create_objects(['createobjectsa', 'createobjectsb'], [prop, prop2])
+    assert objects[1].dims == (2, 3)
+
+    with pytest.raises(ValueError):
+        cont.create_objects(['createobjectsc'], [prop, prop2])
+    with pytest.raises(TypeError):
+        cont.create_objects(['createobjectsd'], 1)
+
+def test_objects_from_arrays():
+    cont = pdc.Container('contobjectsfromarrays', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    arrays = {f'objectsfromarrays{i}': np.arange(i + 1, dtype=np.float32) * i for i in range(20)}
+    arrays['objectsfromarrays_2d'] = np.ones((3, 4), dtype=np.int16)
+    request = cont.objects_from_arrays(arrays, window=4)
+    objects = request.wait()
+    assert request.done
+    assert len(request) == 21
+    assert list(objects) == list(arrays)
+    for name, obj in objects.items():
+        assert obj.name == name
+        assert np.array_equal(obj.get_data().wait(), arrays[name])
+
+    with pytest.raises(ValueError):
+        cont.objects_from_arrays({}, window=0)
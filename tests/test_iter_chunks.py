@@ -0,0 +1,35 @@
+import pdc
+import pytest
+import numpy as np
+from pdc import region
+
+def test_iter_chunks():
+    cont = pdc.Container('test_iter_chunks', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    data = np.arange(100 * 30, dtype=np.double).reshape(100, 30)
+    obj = cont.object_from_array('test_iter_chunks_obj', data)
+
+    out = np.zeros_like(data)
+    count = 0
+    for chunk_region, chunk in obj.iter_chunks(chunk_shape=(16, 10), prefetch=3):
+        rows, cols = chunk_region.slices
+        out[rows, cols] = chunk
+        count += 1
+    assert count == 7 * 3
+    assert np.array_equal(out, data)
+
+    #region with recycled buffers
+    total = 0.0
+    for chunk_region, chunk in obj.iter_chunks(region[10:50, 5:], (7,), prefetch=2, recycle=True):
+        rows, cols = chunk_region.slices
+        assert np.array_equal(chunk, data[rows, cols])
+        total += chunk.sum()
+    assert total == data[10:50, 5:].sum()
+
+def test_iter_chunks_stop_early():
+    cont = pdc.Container('test_iter_chunks_early', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    obj = cont.object_from_array('test_iter_chunks_early_obj', np.arange(1000, dtype=np.int32))
+    
+    for i, (_, chunk) in enumerate(obj.iter_chunks(chunk_shape=(10,), prefetch=4)):
+        if i == 2:
+            break
+    assert chunk[0] == 20
@@ -1,27 +1,68 @@
 import pdc
 import pytest
+import struct
+import pickle
+import numpy as np
 from pdc import KVTags
 
+#pdc_var_type_t values
+PDC_DOUBLE = 2
+PDC_CHAR = 3
+PDC_STRING = 4
+PDC_BOOLEAN = 5
+PDC_INT64 = 8
+PDC_FLOAT = 1
+
 def test_encode():
-    assert KVTags._encode('test') == b"'test'"
-    assert KVTags._encode('∁∂∃∄∅∆∇') == '\'∁∂∃∄∅∆∇\''.encode('utf-8')
-    assert KVTags._encode(3) == b'3'
-    assert KVTags._encode(3.2) == b'3.2'
-    # assert KVTags._encode(()) == b'()'
-    assert KVTags._encode((1, 2, 3)) == b'(1,2,3)'
-    # assert KVTags._encode(((), (2.2, 'merp'), (-55, True))) == b"((),(2.2,'merp'),(-55,True))"
-    assert KVTags._encode((False, True, False)) == b'(False,True,False)'
-
-    # with pytest.raises(TypeError):
-    #     KVTags._encode({})
-    # 
-    # with pytest.raises(TypeError):
-    #     KVTags._encode([])
-    # 
-    # with pytest.raises(TypeError):
-    #     KVTags._encode(b'hi')
+    assert KVTags._encode('test') == (b'test\x00', PDC_STRING)
+    assert KVTags._encode('∁∂∃∄∅∆∇') == ('∁∂∃∄∅∆∇\x00'.encode('utf-8'), PDC_STRING)
+    assert KVTags._encode(3) == (struct.pack('=q', 3), PDC_INT64)
+    assert KVTags._encode(3.2) == (struct.pack('=d', 3.2), PDC_DOUBLE)
+    assert KVTags._encode(True) == (b'\x01', PDC_BOOLEAN)
+    assert KVTags._encode(np.float32(1.5)) == (np.float32(1.5).tobytes(), PDC_FLOAT)
+
+    data, var_type = KVTags._encode((1, 2, 3))
+    assert var_type == PDC_CHAR
+    assert data.startswith(b'\x00PT')
+
+    #raw data, not text
+    data, _ = KVTags._encode(np.arange(1000, dtype=np.float64))
+    assert len(data) < 8000 + 32
+
+def test_round_trip():
+    values = [
+        'test', '∁∂∃∄∅∆∇', '', 'a\x00b', 3, -2**63, 2**64, -2**200, 3.2, True, False, None, b'hi', b'',
+        (), [], {}, (1, 2, 3), (False, True, False), ((), (2.2, 'merp'), (-55, True)),
+        {'a': [1, {2: 3}], 'b': None}, [b'\x80', 'x'], {1, 2},
+    ]
+    for value in values:
+        decoded = KVTags._decode(*KVTags._encode(value))
+        assert decoded == value
+        assert type(decoded) == type(value)
+
+    assert KVTags._decode(*KVTags._encode(np.int8(-3))) == -3
+    assert KVTags._decode(*KVTags._encode(np.float16(2.5))) == 2.5
+
+    for arr in [np.arange(12, dtype='>i4').reshape(3, 4), np.zeros((0, 3)), np.array(['ab', 'c']), np.arange(10)[::3], np.array(5)]:
+        decoded = KVTags._decode(*KVTags._encode(arr))
+        assert decoded.dtype == arr.dtype
+        assert np.array_equal(decoded, arr)
+        decoded = KVTags._decode(*KVTags._encode({'arr': [arr]}))
+        assert np.array_equal(decoded['arr'][0], arr)
+
+def test_decode_typed():
+    assert KVTags._decode(struct.pack('=q', -7), PDC_INT64) == -7
+    assert KVTags._decode(b'abc\x00', PDC_STRING) == 'abc'
+    assert KVTags._decode(b'abc', PDC_STRING) == 'abc'
+    assert np.array_equal(KVTags._decode(struct.pack('=3d', 1, 2, 3), PDC_DOUBLE), [1, 2, 3])
+
+    with pytest.raises(ValueError):
+        KVTags._decode(b'abc', PDC_INT64)
+    with pytest.raises(ValueError):
+        KVTags._decode(b'\x00PT\x63N')
 
 def test_decode():
+    #tags set in the older text format
     assert KVTags._decode(b"'test'") == 'test'
     assert KVTags._decode('\'∁∂∃∄∅∆∇\''.encode('utf-8')) == '∁∂∃∄∅∆∇'
     assert KVTags._decode(b'3') == 3
@@ -30,6 +71,7 @@ def test_decode():
     assert KVTags._decode(b'(1,2,3)') == (1, 2, 3)
     # assert KVTags._decode(b"((),(2.2,'merp'),(-55,True))") == ((), (2.2, 'merp'), (-55, True))
     assert KVTags._decode(b'(False,True,False)') == (False, True, False)
+    assert KVTags._decode(pickle.dumps({1, 2})) == {1, 2}
 
 def test_object_tags():
     cont = pdc.Container('testobjkvtags', lifetime=pdc.Container.Lifetime.TRANSIENT)
@@ -38,8 +80,14 @@ def test_object_tags():
 
     obj.tags['merp'] = 'derp'
     obj.tags['derp'] = (1, 2, 3, None, True, False, 3.6332)
+    obj.tags['count'] = 42
+    obj.tags['scale'] = 0.5
+    obj.tags['arr'] = np.arange(6, dtype=np.uint16).reshape(2, 3)
     assert obj.tags['merp'] == 'derp'
     assert obj.tags['derp'] == (1, 2, 3, None, True, False, 3.6332)
+    assert obj.tags['count'] == 42
+    assert obj.tags['scale'] == 0.5
+    assert np.array_equal(obj.tags['arr'], np.arange(6, dtype=np.uint16).reshape(2, 3))
 
     del obj.tags['merp']
     del obj.tags['derp']
@@ -56,3 +104,88 @@ def test_container_tags():
     #https://github.com/hpc-io/pdc/issues/66
     with pytest.raises(NotImplementedError):
         del cont.tags['a']
+
+class DictTags(KVTags):
+    def __init__(self, owner):
+        super().__init__(owner)
+        self.tags = {}
+        self.gets = 0
+
+    def get(self, name):
+        self.gets += 1
+        if name not in self.tags:
+            raise pdc.PDCError('tag does not exist or could not get tag')
+        return self.tags[name]
+
+    def set(self, name, value, var_type):
+        self.tags[name] = (value, var_type)
+
+    def delete(self, name):
+        del self.tags[name]
+
+def test_tag_cache():
+    class Owner:
+        pass
+    owner = Owner()
+    tags = DictTags(owner)
+    tags.update({'a': 1, 'b': 'two', 'c': [3.0]})
+    assert tags.get_many(['a', 'b', 'c']) == {'a': 1, 'b': 'two', 'c': [3.0]}
+    assert tags.gets == 3
+    with pytest.raises(pdc.PDCError):
+        tags.get_many(['a', 'missing'])
+    assert tags.get_many(['a', 'missing'], default=None) == {'a': 1, 'missing': None}
+
+    tags.enable_cache()
+    assert tags.cache_enabled
+    tags.gets = 0
+    tags.get_many(['a', 'b'])
+    tags.get_many(['a', 'b'])
+    assert tags.gets == 2
+
+    #the cache belongs to the owner, not to the tags object
+    tags = DictTags(owner)
+    tags.tags = {b'a': KVTags._encode(5)}
+    assert tags['a'] == 1
+
+    #write-through
+    tags['a'] = 6
+    assert tags['a'] == 6
+    assert KVTags._decode(*tags.tags[b'a']) == 6
+    del tags['a']
+    with pytest.raises(pdc.PDCError):
+        tags['a']
+
+    #cached values are decoded each time, so they can't be changed through a returned value
+    tags['c'] = [1]
+    tags['c'].append(2)
+    assert tags['c'] == [1]
+
+    tags.disable_cache()
+    assert not tags.cache_enabled
+
+    with pytest.raises(TypeError):
+        tags.update({1: 'x'})
+
+def test_bulk_get_tags():
+    cont = pdc.Container('testbulktags', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    prop = pdc.Object.Properties(dims=(4,), type=pdc.Type.FLOAT)
+    objects = [cont.create_object(f'testbulktags{i}', prop) for i in range(5)]
+    for i, obj in enumerate(objects):
+        obj.tags.update({'index': i, 'energy': i / 2, 'name': f'o{i}', 'even': i % 2 == 0})
+        if i != 3:
+            obj.tags['extra'] = (i,)
+    objects[0].tags.enable_cache()
+
+    assert objects[1].tags.get_many(['index', 'name']) == {'index': 1, 'name': 'o1'}
+
+    columns = pdc.bulk_get_tags(objects, ['index', 'energy', 'name', 'even', 'extra'])
+    assert columns['index'].dtype == np.int64
+    assert np.array_equal(columns['index'], np.arange(5))
+    assert np.array_equal(columns['energy'], np.arange(5) / 2)
+    assert list(columns['name']) == ['o0', 'o1', 'o2', 'o3', 'o4']
+    assert np.array_equal(columns['even'], [True, False, True, False, True])
+    assert columns['extra'].dtype == object
+    assert list(columns['extra']) == [(0,), (1,), (2,), None, (4,)]
+
+    for obj in objects:
+        obj.tags.disable_cache()
@@ -1,10 +1,11 @@
 import pytest
 import pdc
-from pdc import Object, region
-import numpy as np
-import asyncio
+from pdc import Object
 
-async def main():
+def test_kvtag_query():
+    with pytest.raises(ValueError):
+        pdc.tag_query('key1', 'value1')
+    pdc.TagIndex.default = pdc.TagIndex()
     cont = pdc.Container('kvtag_query_cont', lifetime=pdc.Container.Lifetime.TRANSIENT)
     prop = Object.Properties(dims=(0,))
     obj1 = cont.create_object('o1', prop)
@@ -14,24 +15,45 @@ async def main():
     obj1.tags['key2'] = '2'
     obj2.tags['key2'] = '2'
     obj2.tags['key3'] = '3.45'
+    obj1.tags['key4'] = 3
+    obj2.tags['key4'] = 7.5
 
     def test_query(name, value, expected):
         objects = pdc.tag_query(name, value)
         print(f'found {len(objects)} objects with tag {name}={value}')
         assert len(objects) == expected
-        #for obj in objects:
-            #print(obj.name)
-        #    assert obj.tags[name] == value
+        for obj in objects:
+            assert obj.tags[name] == value
     
     test_query('key1', 'value1', 1)
     test_query('key2', '2', 2)
     test_query('key3', '3.45', 1)
     test_query('key4', '4', 0)
+    test_query('key4', 3, 1)
+    assert pdc.tag_query('key4', 3.0) == (obj1,)
+    assert pdc.tag_query('key4', 7.5) == (obj2,)
     test_query('key1', 'derp', 0)
 
-    assert False
+    assert pdc.tag_query('key4', low=0) == (obj1, obj2)
+    assert pdc.tag_query('key4', low=3, high=7.5) == (obj1,)
+    assert pdc.tag_query('key4', low=3, high=7.5, include_high=True) == (obj1, obj2)
+    with pytest.raises(ValueError):
+        pdc.tag_query('key4', 3, low=0)
 
-#TODO: once tang tells me how to query for tags and get the global id, I can implement this.
-@pytest.mark.skip
-def test_kvtag_query():
-    asyncio.run(main())
\ No newline at end of file
+    obj1.tags['key2'] = '5'
+    test_query('key2', '2', 1)
+    del obj2.tags['key2']
+    test_query('key2', '2', 0)
+
+    pdc.TagIndex.default.save(cont, 'index')
+    index = pdc.TagIndex.load(cont, 'index')
+    assert pdc.tag_query('key1', 'value1', index=index) == (obj1,)
+    assert pdc.tag_query('key4', low=5, index=index) == (obj2,)
+
+    #an index that only saw the objects through add_objects
+    index = pdc.TagIndex(['key3'])
+    index.add_objects([obj1, obj2], ['key1', 'key3'])
+    assert pdc.tag_query('key3', '3.45', index=index) == (obj2,)
+    assert pdc.tag_query('key1', 'value1', index=index) == ()
+    index.remove_object(obj2)
+    assert len(index) == 0
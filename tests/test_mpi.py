@@ -0,0 +1,57 @@
+import pytest
+import numpy as np
+import pdc
+from pdc.mpi import Block, BlockCyclic
+
+def test_decompositions():
+    dims = (10, 3)
+    for decomposition in [Block(), BlockCyclic(1), BlockCyclic(3), Block(axis=1), BlockCyclic(2, axis=1)]:
+        for size in [1, 3, 4]:
+            covered = np.zeros(dims, dtype=int)
+            for rank in range(size):
+                boxes = decomposition.boxes(dims, rank, size)
+                for offsets, sizes in boxes:
+                    covered[tuple(slice(o, o + s) for o, s in zip(offsets, sizes))] += 1
+                local = sum(sizes[decomposition.axis] for _, sizes in boxes)
+                assert decomposition.local_shape(dims, rank, size)[decomposition.axis] == local
+            assert (covered == 1).all()
+
+    assert Block().boxes((10,), 1, 3) == [((3,), (3,))]
+    assert BlockCyclic(2).boxes((10,), 0, 2) == [((0,), (2,)), ((4,), (2,)), ((8,), (2,))]
+    #adjacent parts are merged
+    assert BlockCyclic(2).boxes((10,), 0, 1) == [((0,), (10,))]
+    assert Block().boxes((2,), 2, 3) == []
+
+    with pytest.raises(ValueError):
+        BlockCyclic(0)
+    with pytest.raises(ValueError):
+        Block(axis=2).boxes((10, 3), 0, 1)
+
+def test_write_read_global():
+    MPI = pytest.importorskip('mpi4py.MPI')
+    comm = MPI.COMM_WORLD
+    rank, size = comm.Get_rank(), comm.Get_size()
+    cont = pdc.Container('testmpicont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    dims = (40, 6)
+    expected = np.arange(np.prod(dims), dtype=np.float64).reshape(dims)
+
+    for i, decomposition in enumerate([Block(), BlockCyclic(3), BlockCyclic(2, axis=1)]):
+        obj = pdc.mpi.create_global(cont, f'testmpiobj{i}', dims, pdc.Type.DOUBLE, comm)
+        boxes = decomposition.boxes(dims, rank, size)
+        parts = [expected[tuple(slice(o, o + s) for o, s in zip(offsets, sizes))] for offsets, sizes in boxes]
+        local = np.concatenate(parts, axis=decomposition.axis)
+        stats = pdc.mpi.write_global(obj, local, comm, decomposition)
+        assert stats.nbytes == expected.nbytes
+        assert stats.ranks == size
+
+        assert np.array_equal(obj.get_data().wait(), expected)
+        data, stats = pdc.mpi.read_global(obj, comm, decomposition)
+        assert np.array_equal(data, local)
+        assert stats.nbytes == expected.nbytes
+
+        with pytest.raises(ValueError):
+            pdc.mpi.write_global(obj, local[1:], comm, decomposition)
+
+        #an error on one rank is raised on every rank
+        with pytest.raises(ValueError if rank == 0 else pdc.PDCError):
+            pdc.mpi.write_global(obj, local[1:] if rank == 0 else local, comm, decomposition)
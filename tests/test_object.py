@@ -64,4 +64,47 @@ def test_get_object_multiple_times():
     obj1 = pdc.Object.get('multiget_obj')
     obj2 = pdc.Object.get('multiget_obj')
     assert obj1 is obj2
-    assert obj1._id == obj2._id
\ No newline at end of file
+    assert obj1._id == obj2._id
+
+def test_metadata_cached():
+    cont = pdc.Container('metadatacont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    prop = pdc.Object.Properties(dims=(3, 4), type=pdc.Type.INT64)
+    obj = cont.create_object('metadataobj', prop)
+    obj_id = obj._id
+
+    assert (obj.name, obj.dims, obj.type) == ('metadataobj', (3, 4), pdc.Type.INT64)
+    metadata = obj._metadata
+    assert pdc.object._metadata_by_id[obj_id] is metadata
+    assert metadata.dtype == np.int64
+    assert obj.dims is metadata.dims
+    with pytest.raises(AttributeError):
+        metadata.extra = 1
+
+    #closing the object forgets its metadata
+    del obj, metadata
+    assert obj_id not in pdc.object._metadata_by_id
+
+def test_export_and_object_from_file(tmp_path):
+    cont = pdc.Container('exportcont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    data = np.arange(40 * 12, dtype=np.float32).reshape(40, 12)
+    obj = cont.object_from_array('exportobj', data)
+
+    assert obj.export(tmp_path / 'all.npy', chunk_shape=(7,)) == (40, 12)
+    assert np.array_equal(np.load(tmp_path / 'all.npy'), data)
+
+    #chunks that aren't contiguous in the file
+    obj.export(tmp_path / 'part.raw', pdc.region[5:30, 2:10], chunk_shape=(4, 3))
+    assert np.array_equal(np.fromfile(tmp_path / 'part.raw', dtype=np.float32).reshape(25, 8), data[5:30, 2:10])
+
+    copy = cont.object_from_file('exportcopy', tmp_path / 'all.npy', chunk_shape=(9,))
+    assert copy.dims == (40, 12)
+    assert np.array_equal(copy.get_data().wait(), data)
+
+    raw = cont.object_from_file('exportraw', tmp_path / 'part.raw', dtype=np.float32, shape=(25, 8), type=pdc.Type.DOUBLE)
+    assert raw.type == pdc.Type.DOUBLE
+    assert np.array_equal(raw.get_data().wait(), data[5:30, 2:10])
+
+    with pytest.raises(ValueError):
+        cont.object_from_file('exportbad', tmp_path / 'part.raw')
+    with pytest.raises(ValueError):
+        obj.export(tmp_path / 'bad', format='csv')
@@ -1,3 +1,4 @@
+import io
 import numpy as np
 import pdc
 import pdc.main
@@ -61,4 +62,194 @@ def test_queries():
     obj.set_data(range(16)).wait()
     #print(obj.get_data().wait())
     #print(obj.get_data().wait())
-    assert (obj.data >= 8).get_result().hits == 8
\ No newline at end of file
+    assert (obj.data >= 8).get_result().hits == 8
+
+def test_num_hits_and_result():
+    cont = pdc.Container('queryresultcont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    a = cont.object_from_array('queryresult_a', np.array([1, 3, 5, 7], dtype=np.int32))
+    b = cont.object_from_array('queryresult_b', np.array([2, 3, 8, 0], dtype=np.int32))
+
+    query = (a.data > 3) | (b.data > 4)
+    assert query.get_num_hits() == 2
+
+    result = query.get_result()
+    assert result.hits == 2
+    assert np.array_equal(np.sort(result[a]), [5, 7])
+    assert np.array_equal(np.sort(result[b]), [0, 8])
+
+    coords = result.coords
+    assert coords.shape == (2, 1)
+    assert coords.dtype == np.uint64
+    assert not coords.flags.writeable
+    assert np.array_equal(np.sort(coords[:, 0]), [2, 3])
+
+    #the coordinates keep the result alive
+    del result
+    assert np.array_equal(np.sort(coords[:, 0]), [2, 3])
+
+    other = cont.object_from_array('queryresult_c', np.zeros(4, dtype=np.int32))
+    with pytest.raises(KeyError):
+        query.get_result()[other]
+
+def test_range_fusion():
+    cont = pdc.Container('rangefusioncont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    obj = cont.object_from_array('rangefusion_obj', np.arange(100, dtype=np.int64))
+    obj2 = cont.object_from_array('rangefusion_obj2', np.arange(100, dtype=np.int64))
+    ops = pdc.QueryComponent._CompareOp
+
+    query = (obj.data > 10) & (obj.data < 20)
+    assert query._range == (ops.GT, 10, ops.LT, 20)
+    query = (obj.data <= 20) & (obj.data >= 10)
+    assert query._range == (ops.GTE, 10, ops.LTE, 20)
+
+    #not fusable
+    assert ((obj.data > 10) & (obj.data > 20))._range is None
+    assert ((obj.data > 10) & (obj2.data < 20))._range is None
+    assert ((obj.data > 10) | (obj.data < 20))._range is None
+
+    assert obj.data.between(10, 20)._range == (ops.GTE, 10, ops.LTE, 20)
+    assert obj.data.between(10, 20, 'neither')._range == (ops.GT, 10, ops.LT, 20)
+    with pytest.raises(ValueError):
+        obj.data.between(10, 20, 'sometimes')
+    with pytest.raises(TypeError):
+        obj.data.between(1.0, 2.0)
+    
+    assert obj.data.between(10, 19).get_num_hits() == 10
+    assert ((obj.data > 10) & (obj.data < 20)).get_num_hits() == 9
+
+def test_statistics_and_plan():
+    cont = pdc.Container('plancont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    obj = cont.object_from_array('plan_obj', np.arange(100, dtype=np.int64))
+    obj2 = cont.object_from_array('plan_obj2', np.arange(100, dtype=np.int64) % 10)
+    assert obj.statistics is None
+
+    stats = obj.compute_statistics(nbins=10)
+    obj2.compute_statistics(nbins=10)
+    assert obj.statistics is stats
+    assert (stats.min, stats.max, stats.count, stats.nbin) == (0, 99, 100, 10)
+    assert stats.bin.sum() == 100
+    ops = pdc.QueryComponent._CompareOp
+    assert stats.truth(ops.GT, 99) is False
+    assert stats.truth(ops.GTE, 0) is True
+    assert stats.truth(ops.LT, 50) is None
+    assert abs(stats.selectivity(ops.LT, 50) - 0.5) < 0.05
+
+    #always false
+    assert (obj.data > 1000).plan() is None
+    assert ((obj.data > 1000) & (obj2.data < 5)).plan() is None
+    assert (obj.data > 1000).get_num_hits(plan=True) == 0
+    assert (obj.data > 1000).get_result(plan=True).hits == 0
+
+    #always true subqueries are dropped
+    planned = ((obj.data >= 0) & (obj2.data < 5)).plan()
+    assert planned._right is None and planned._left is obj2
+
+    #the more selective clause runs first
+    planned = ((obj2.data < 5) & (obj.data < 10)).plan()
+    assert planned._left._left is obj
+
+    #bounds are fused even when not adjacent
+    planned = ((obj.data > 10) & (obj2.data < 5) & (obj.data < 20)).plan()
+    assert any(q._range is not None for q in (planned._left, planned._right))
+
+    out = io.StringIO()
+    ((obj.data > 10) & (obj2.data < 5)).explain(file=out)
+    assert 'AND' in out.getvalue() and 'est. hits' in out.getvalue()
+
+    #setting data discards statistics
+    obj.set_data(np.arange(100, dtype=np.int64)).wait()
+    assert obj.statistics is None
+
+def test_region_does_not_change_query():
+    cont = pdc.Container('queryregioncont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    obj = cont.object_from_array('queryregion_obj', np.arange(100, dtype=np.int64))
+    query = obj.data < 50
+    assert query.get_num_hits(pdc.region[:10]) == 10
+    assert query.get_num_hits() == 50
+    assert (query & (obj.data >= 0)).get_num_hits() == 50
+
+def test_result_cache():
+    cont = pdc.Container('querycachecont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    a = cont.object_from_array('querycache_a', np.arange(100, dtype=np.int64))
+    b = cont.object_from_array('querycache_b', np.arange(100, dtype=np.int64))
+    pdc.Query.cache.clear()
+
+    result = ((a.data > 10) & (b.data < 50)).get_result(cache=True)
+    assert result.hits == 39
+    #equivalent tree, same region
+    assert ((b.data < 50) & (a.data > 10)).get_result(pdc.region[:], cache=True) is result
+    misses = pdc.Query.cache.misses
+    assert ((b.data < 50) & (a.data > 10)).get_num_hits(cache=True) == 39
+    assert pdc.Query.cache.misses == misses
+    #different region
+    assert ((a.data > 10) & (b.data < 50)).get_result(pdc.region[:20], cache=True) is not result
+    assert len(pdc.Query.cache) == 2
+
+    #a write that doesn't overlap the region of a result keeps it
+    b.set_data(np.arange(10, dtype=np.int64) + 20, pdc.region[90:]).wait()
+    assert ((a.data > 10) & (b.data < 50)).get_result(pdc.region[:20], cache=True).hits == 9
+    #a write that overlaps discards it
+    b.set_data(np.zeros(10, dtype=np.int64), pdc.region[:10]).wait()
+    assert ((a.data > 10) & (b.data < 50)).get_result(cache=True) is not result
+
+    #a result computed while a write is in flight is discarded when the write completes
+    request = b.set_data(np.full(10, 100, dtype=np.int64), pdc.region[20:30])
+    ((a.data > 10) & (b.data < 50)).get_result(cache=True)
+    request.wait()
+    assert ((a.data > 10) & (b.data < 50)).get_result(cache=True).hits == 39
+
+    pdc.Query.cache.max_bytes = 0
+    assert len(pdc.Query.cache) == 0
+    pdc.Query.cache.max_bytes = 64 * 1024 * 1024
+
+def test_local_engine():
+    cont = pdc.Container('localenginecont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    data_a = np.arange(100, dtype=np.int64).reshape(10, 10)
+    data_b = (np.arange(100, dtype=np.float64) % 7).reshape(10, 10)
+    a = cont.object_from_array('localengine_a', data_a)
+    b = cont.object_from_array('localengine_b', data_b)
+    query = ((a.data > 20) & (b.data < 3)) | (a.data == 5)
+
+    with pytest.raises(ValueError):
+        query.get_result(engine='local')
+    with pytest.raises(ValueError):
+        query.get_result(engine='gpu')
+
+    readonly = data_a.copy()
+    readonly.flags.writeable = False
+    with pytest.raises(ValueError):
+        a.pin(readonly)
+    assert a.pinned is None
+
+    assert a.pin(data_a) is not None
+    b.pin()
+    assert a.pinned is not None and np.array_equal(b.pinned, data_b)
+
+    for region in (None, pdc.region[2:7, 1:9]):
+        server = query.get_result(region, engine='server')
+        local = query.get_result(region, engine='local')
+        assert isinstance(local, pdc.Query.LocalResult)
+        assert isinstance(query.get_result(region), pdc.Query.LocalResult)
+        assert local.hits == server.hits == query.get_num_hits(region, engine='local')
+        order = np.lexsort(server.coords.T[::-1])
+        assert np.array_equal(local.coords, server.coords[order])
+        assert np.array_equal(local[a], server[a][order])
+        assert np.array_equal(local[b], server[b][order])
+
+    #planning drops the always true subquery on a, but a still has values
+    a.compute_statistics(nbins=10)
+    planned = ((a.data >= 0) & (b.data < 5))
+    assert planned.plan()._right is None
+    result = planned.get_result(plan=True)
+    assert isinstance(result, pdc.Query.LocalResult)
+    assert np.array_equal(result[a], data_a[data_b < 5])
+    assert np.array_equal(result[b], data_b[data_b < 5])
+    
+    #setting data also updates the pinned array
+    a.set_data(np.zeros((1, 10), dtype=np.int64), pdc.region[9:10, :]).wait()
+    assert not a.pinned[9].any()
+    assert query.get_num_hits(engine='local') == query.get_num_hits(engine='server')
+
+    a.unpin()
+    assert a.pinned is None
+    assert isinstance(query.get_result(), pdc.Query.Result)
@@ -2,6 +2,7 @@ import pdc
 from pdc import Region, region
 import pytest
 import os
+import numpy as np
 
 def test_region_validation():
     r1 = region[2]
@@ -23,7 +24,19 @@ def test_region_validation():
         region[:, -1:-2]
     
     with pytest.raises(ValueError):
-        region[::3]
+        region[::0]
+    
+    with pytest.raises(ValueError):
+        region[::-1]
+    
+    with pytest.raises(OverflowError):
+        region[[1, -2]]
+    
+    with pytest.raises(TypeError):
+        region[[1.5, 2]]
+    
+    with pytest.raises(ValueError):
+        region[[]]
     
     with pytest.raises(ValueError):
         region[5:4]
@@ -42,6 +55,14 @@ def test_absolute():
     assert region[2:3, 4:9].is_absolute()
     assert region[:].get_absolute((3, 4)).is_absolute()
 
+    #start values past the end of the dimension
+    with pytest.raises(ValueError):
+        region[5:]._bounds((3,))
+    with pytest.raises(ValueError):
+        region[3:]._bounds((3,))
+    with pytest.raises(ValueError):
+        region[:, 4:].get_absolute((3, 4))
+
 def test_hash_eq():
     assert region[:] == region[:]
     assert region[:] != region[:, :]
@@ -51,4 +72,52 @@ def test_hash_eq():
 
 def test_repr():
     assert repr(region[3, 4:, :5, 6:7]) == 'region[3:4, 4:, :5, 6:7]'
-    assert str(region[3, 4:, :5, 6:7]) == 'region[3:4, 4:, :5, 6:7]'
\ No newline at end of file
+    assert str(region[3, 4:, :5, 6:7]) == 'region[3:4, 4:, :5, 6:7]'
+
+def test_tiles():
+    assert list(region[:, 2:].tiles((4, 6), (3, 4))) == [region[0:3, 2:6], region[3:4, 2:6]]
+    assert list(region[:].tiles((4, 4), (2,))) == [region[0:2, 0:4], region[2:4, 0:4]]
+    assert len(list(region[1:9].tiles((10,), (3,)))) == 3
+
+    with pytest.raises(ValueError):
+        list(region[:].tiles((4,), (0,)))
+    with pytest.raises(ValueError):
+        list(region[:].tiles((4,), (1, 1)))
+
+def test_steps_and_indices():
+    assert region[1:9:1] == region[1:9]
+    assert region[1:9:1].is_box()
+    assert not region[::3].is_box()
+    assert not region[[1, 5], :].is_box()
+    assert region[[1, 5]] == region[np.array([1, 5])]
+    assert hash(region[[1, 5]]) == hash(region[np.array([1, 5])])
+    assert repr(region[::3, [1, 5]]) == 'region[::3, [1, 5]]'
+
+    with pytest.raises(ValueError):
+        region[::2].get_absolute((10,))
+
+    assert [c.tolist() for c in region[1::4, [5, 2]]._selection((10, 6, 2))] == [[1, 5, 9], [5, 2], [0, 1]]
+    with pytest.raises(ValueError):
+        region[[10]]._selection((10,))
+
+def test_decompose():
+    #every other row of a wide array is cheaper to read one row at a time
+    coords, segments, boxes = region[::2, :]._decompose((6, 100000), 8, False)
+    assert boxes.offsets.tolist() == [[0, 0], [2, 0], [4, 0]]
+    assert boxes.sizes.tolist() == [[1, 100000], [1, 100000], [1, 100000]]
+    assert segments == [[(0, 1), (2, 3), (4, 5)], [(0, 100000)]]
+
+    #every other element of a small array is cheaper to read as one box
+    coords, segments, boxes = region[::2]._decompose((100,), 8, False)
+    assert boxes.offsets.tolist() == [[0]]
+    assert boxes.sizes.tolist() == [[99]]
+
+    #writes never cover elements that are not selected
+    coords, segments, boxes = region[::2]._decompose((100,), 8, True)
+    assert len(boxes) == 50
+
+    #adjacent indices are merged into one box
+    coords, segments, boxes = region[[4, 1, 2, 3]]._decompose((100000,), 8, True)
+    assert boxes.offsets.tolist() == [[1]]
+    assert boxes.sizes.tolist() == [[4]]
+    assert coords[0].tolist() == [4, 1, 2, 3]
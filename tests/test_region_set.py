@@ -0,0 +1,114 @@
+import pdc
+import pytest
+import asyncio
+import numpy as np
+from pdc import region, RegionSet
+
+def test_region_set_construction():
+    regions = RegionSet([[0, 0], [4, 4]], (4, 4))
+    assert len(regions) == 2
+    assert regions.ndim == 2
+    assert list(regions) == [region[0:4, 0:4], region[4:8, 4:8]]
+    assert regions[1] == region[4:8, 4:8]
+
+    one_dim = RegionSet([0, 10, 20], [5, 5, 5])
+    assert one_dim.ndim == 1
+    assert list(one_dim)[2] == region[20:25]
+    
+    assert RegionSet.from_regions([region[1:3], region[5:]], (10,))[1] == region[5:10]
+
+    with pytest.raises(ValueError):
+        RegionSet([[0, 0]], [[0, 1]])
+    with pytest.raises(ValueError):
+        RegionSet([[0, 0], [1, 1]], [[1, 1, 1]])
+    with pytest.raises(OverflowError):
+        RegionSet([-1], [1])
+    with pytest.raises(TypeError):
+        RegionSet([0.5], [1])
+
+def test_coalesce():
+    #a 2x2 grid of tiles becomes one box
+    grid = RegionSet([[0, 0], [0, 4], [4, 0], [4, 4]], (4, 4))
+    assert list(grid.coalesce()) == [region[0:8, 0:8]]
+
+    overlapping = RegionSet([0, 3, 10], [5, 5, 2])
+    assert list(overlapping.coalesce()) == [region[0:8], region[10:12]]
+    assert len(overlapping.coalesce(overlap=False)) == 3
+
+    #boxes that don't line up are not merged
+    assert len(RegionSet([[0, 0], [0, 4]], [[4, 4], [3, 4]]).coalesce()) == 2
+
+def test_region_set_transfers():
+    cont = pdc.Container('regionsetcont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    data = np.arange(64 * 64, dtype=np.int32).reshape(64, 64)
+    obj = cont.object_from_array('regionsetobj', data)
+
+    starts = np.arange(0, 64, 8)
+    diagonal = RegionSet(np.stack([starts, starts], axis=1), (8, 8))
+    request = obj.get_data(diagonal)
+    assert isinstance(request, pdc.RegionSetRequest)
+    tiles = request.wait()
+    assert len(tiles) == 8
+    for i, tile in zip(starts, tiles):
+        assert np.array_equal(tile, data[i:i+8, i:i+8])
+
+    #rows 0-15 in 4 overlapping or adjacent pieces, fetched as one box
+    rows = RegionSet([[0, 0], [4, 0], [6, 0], [12, 0]], [[4, 64], [4, 64], [6, 64], [4, 64]])
+    request = obj.get_data(rows, coalesce=True)
+    assert len(request) == 1
+    pieces = request.wait()
+    for piece, (o, s) in zip(pieces, [(0, 4), (4, 4), (6, 6), (12, 4)]):
+        assert np.array_equal(piece, data[o:o+s])
+    
+    #set with coalescing
+    request = obj.set_data([np.zeros((8, 8), dtype=np.int32)] * 8, RegionSet([[0, i] for i in range(0, 64, 8)], (8, 8)), coalesce=True)
+    assert len(request) == 1
+    assert request.wait() is None
+    assert not obj.get_data(region[:8]).wait().any()
+
+    async def read():
+        return await obj.get_data(diagonal)
+    assert len(asyncio.run(read())) == 8
+
+    assert next(pdc.as_completed([obj.get_data(diagonal)])).done
+
+    with pytest.raises(ValueError):
+        obj.get_data(RegionSet([[60, 60]], (8, 8)))
+    with pytest.raises(ValueError):
+        obj.get_data(diagonal, out=np.empty(64))
+    with pytest.raises(ValueError):
+        obj.set_data([np.zeros((8, 8))], diagonal)
+
+def test_selection_transfers():
+    cont = pdc.Container('selectioncont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    data = np.arange(64 * 64, dtype=np.int32).reshape(64, 64)
+    obj = cont.object_from_array('selectionobj', data)
+
+    request = obj.get_data(region[::4, :])
+    assert isinstance(request, pdc.SelectionRequest)
+    assert np.array_equal(request.wait(), data[::4, :])
+
+    rows, cols = [40, 3, 4, 5], [63, 0]
+    assert np.array_equal(obj.get_data(region[rows, cols]).wait(), data[np.ix_(rows, cols)])
+    assert np.array_equal(obj.get_data(region[1:60:7, 5]).wait(), data[1:60:7, 5:6])
+
+    out = np.empty((16, 64), dtype=np.int64)
+    obj.get_data(region[::4], out=out).wait()
+    assert np.array_equal(out, data[::4])
+
+    #strided columns of one row are cheaper to read as a single box
+    assert len(obj.get_data(region[0, ::2])) == 1
+
+    obj.set_data(np.zeros((32, 64), dtype=np.int32), region[::2]).wait()
+    expected = data.copy()
+    expected[::2] = 0
+    assert np.array_equal(obj.get_data().wait(), expected)
+
+    obj.set_data(-1, region[[1, 63], [2, 3, 10]]).wait()
+    expected[np.ix_([1, 63], [2, 3, 10])] = -1
+    assert np.array_equal(obj.get_data().wait(), expected)
+
+    with pytest.raises(ValueError):
+        obj.get_data(region[[64]])
+    with pytest.raises(ValueError):
+        obj.get_data(region[::2], copy='never')
@@ -0,0 +1,44 @@
+import pdc
+import pytest
+import numpy as np
+from pdc import region
+
+def test_batch_set_get():
+    cont = pdc.Container('test_batch_cont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    prop = pdc.Object.Properties(dims=(8, 8), type=pdc.Type.INT32)
+    obj1 = cont.create_object('test_batch_obj1', prop)
+    obj2 = cont.create_object('test_batch_obj2', prop)
+
+    with pdc.TransferBatch() as batch:
+        for i in range(8):
+            batch.set(obj1, np.full(8, i, dtype=np.int32), region[i])
+        batch.set(obj2, np.arange(64, dtype=np.int32).reshape(8, 8))
+    
+    assert batch.done
+    assert len(batch) == 9
+    assert batch.nbytes == 2 * 64 * 4
+    assert batch.elapsed > 0
+
+    batch = pdc.TransferBatch()
+    batch.get(obj2, region[:2])
+    batch.get(obj1)
+    batch.get(obj2, region[7])
+    batch.submit()
+    a, b, c = batch.wait_all()
+
+    expected = np.arange(64, dtype=np.int32).reshape(8, 8)
+    assert np.array_equal(a, expected[:2])
+    assert np.array_equal(b, np.repeat(np.arange(8, dtype=np.int32), 8).reshape(8, 8))
+    assert np.array_equal(c, expected[7:8])
+
+def test_batch_request_wait():
+    cont = pdc.Container('test_batch_wait_cont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    obj = cont.object_from_array('test_batch_wait_obj', np.arange(10, dtype=np.int64))
+
+    batch = pdc.TransferBatch()
+    req = batch.get(obj, region[2:5])
+    assert not req.started
+    assert not req.done
+    #waiting on a single request starts it
+    assert np.array_equal(req.wait(), [2, 3, 4])
+    assert batch.wait_all()[0] is req.result
@@ -0,0 +1,23 @@
+import pdc
+import pytest
+import numpy as np
+from pdc import region
+from concurrent.futures import as_completed
+
+def test_executor_get_set():
+    cont = pdc.Container('test_executor_cont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    prop = pdc.Object.Properties(dims=(16, 16), type=pdc.Type.DOUBLE)
+    obj = cont.create_object('test_executor_obj', prop)
+    data = np.arange(256, dtype=np.double).reshape(16, 16)
+
+    with pdc.TransferExecutor(max_workers=1) as executor:
+        assert executor.set_data(obj, data).result() is None
+        futures = {executor.get_data(obj, region[i]): i for i in range(16)}
+        for future in as_completed(futures):
+            i = futures[future]
+            assert np.array_equal(future.result(), data[i:i+1])
+
+
+def test_executor_invalid_workers():
+    with pytest.raises(ValueError):
+        pdc.TransferExecutor(max_workers=0)
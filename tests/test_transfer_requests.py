@@ -1,4 +1,5 @@
 import re
+import asyncio
 import pdc
 import pytest
 import numpy as np
@@ -39,4 +40,182 @@ def test_transfer_color_by_number():
                                  [0, 2, 2, 0, 5, 0, 0, 0],
                                  [0, 2, 2, 0, 0, 6, 6, 0],
                                  [0, 2, 2, 0, 0, 0, 0, 0]])
-    assert np.array_equal(all_data, expected)
\ No newline at end of file
+    assert np.array_equal(all_data, expected)
+
+def test_transfer_await():
+    cont = pdc.Container('test_transfer_await', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    obj = cont.object_from_array('test_transfer_await_obj', np.arange(100, dtype=np.int32))
+
+    async def main():
+        await obj.set_data(np.full(10, 7, dtype=np.int32), region[10:20])
+        parts = await asyncio.gather(*(obj.get_data(region[i * 10:(i + 1) * 10]) for i in range(10)))
+        return np.concatenate(parts)
+    
+    expected = np.arange(100, dtype=np.int32)
+    expected[10:20] = 7
+    assert np.array_equal(asyncio.run(main()), expected)
+
+def test_as_completed_wait_any():
+    cont = pdc.Container('test_as_completed', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    obj = cont.object_from_array('test_as_completed_obj', np.arange(64, dtype=np.int64).reshape(8, 8))
+
+    requests = [obj.get_data(region[i]) for i in range(8)]
+    seen = set()
+    for req in pdc.as_completed(requests):
+        assert req.done
+        seen.add(int(req.result[0, 0]) // 8)
+    assert seen == set(range(8))
+
+    req = pdc.wait_any([obj.get_data(region[i]) for i in range(3)], timeout=60)
+    assert req.done
+
+    with pytest.raises(ValueError):
+        pdc.wait_any([])
+
+def test_get_data_out():
+    cont = pdc.Container('test_get_data_out', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    data = np.arange(24, dtype=np.int32).reshape(4, 6)
+    obj = cont.object_from_array('test_get_data_out_obj', data)
+
+    big = np.zeros((10, 6), dtype=np.int32)
+    result = obj.get_data(out=big[3:7], copy='never').wait()
+    assert np.shares_memory(result, big)
+    assert np.array_equal(big[3:7], data)
+
+    buf = bytearray(6 * 4)
+    obj.get_data(region[1], out=buf, copy='never').wait()
+    assert np.array_equal(np.frombuffer(buf, dtype=np.int32), data[1])
+
+    #a column is not contiguous, so it can only be filled by copying
+    cols = np.zeros((4, 8), dtype=np.int32)
+    with pytest.raises(ValueError):
+        obj.get_data(region[:, 2:4], out=cols[:, :2], copy='never')
+    obj.get_data(region[:, 2:4], out=cols[:, :2]).wait()
+    assert np.array_equal(cols[:, :2], data[:, 2:4])
+    #any shape with as many elements is filled in C order
+    flat = np.zeros(24, dtype=np.int64)
+    assert obj.get_data(out=flat).wait().shape == (4, 6)
+    assert np.array_equal(flat, data.ravel())
+    result = obj.get_data(region[:, 2:4], out=cols[:2, 4:]).wait()
+    assert np.shares_memory(result, cols)
+    assert np.array_equal(cols[:2, 4:], data[:, 2:4].reshape(2, 4))
+
+    with pytest.raises(ValueError):
+        obj.get_data(out=np.zeros(5, dtype=np.int32))
+    with pytest.raises(ValueError):
+        obj.get_data(copy='sometimes')
+
+def test_set_data_buffers():
+    cont = pdc.Container('test_set_data_buffers', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    prop = pdc.Object.Properties(dims=(4, 4), type=pdc.Type.INT16)
+    obj = cont.create_object('test_set_data_buffers_obj', prop)
+
+    data = np.arange(16, dtype=np.int16).reshape(4, 4)
+    obj.set_data(bytearray(data.tobytes()), copy='never').wait()
+    assert np.array_equal(obj.get_data().wait(), data)
+
+    obj.set_data(memoryview(data[2:]), region[:2], copy='never').wait()
+    assert np.array_equal(obj.get_data(region[:2]).wait(), data[2:])
+
+    with pytest.raises(ValueError):
+        obj.set_data(data[:, :2].T, region[:2, :], copy='never')
+    with pytest.raises(ValueError):
+        obj.set_data(data.astype(np.int64), copy='never')
+    obj.set_data(data.astype(np.int64)).wait()
+    assert np.array_equal(obj.get_data().wait(), data)
+
+def test_region_pool():
+    cont = pdc.Container('regionpoolcont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    obj = cont.object_from_array('regionpoolobj', np.arange(100, dtype=np.int32))
+    pool = pdc.Region.pool
+    pool.clear()
+    hits, misses = pool.hits, pool.misses
+
+    for _ in range(5):
+        assert np.array_equal(obj.get_data(pdc.region[10:20]).wait(), np.arange(10, 20))
+    #one remote region and one local region, created once each
+    assert pool.misses - misses == 2
+    assert pool.hits - hits == 8
+    
+    #the same shape at a different offset shares the local region
+    obj.set_data(np.zeros(10, dtype=np.int32), pdc.region[30:40]).wait()
+    assert pool.misses - misses == 3
+    assert pool.in_use == 0
+
+    pool.resize(1)
+    assert len(pool) == 1
+    pool.resize(0)
+    assert len(pool) == 0
+    assert np.array_equal(obj.get_data(pdc.region[30:40]).wait(), np.zeros(10))
+    assert len(pool) == 0
+    pool.resize(1024)
+
+    with pytest.raises(ValueError):
+        pool.release((0,), (5,))
+
+def test_write_buffer():
+    cont = pdc.Container('writebuffercont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    prop = pdc.Object.Properties(dims=(64, 16), type=pdc.Type.INT32)
+    obj = cont.create_object('writebufferobj', prop)
+    expected = np.zeros((64, 16), dtype=np.int32)
+    obj.set_data(expected).wait()
+
+    with obj.buffered_writer() as writer:
+        for i in range(32):
+            row = np.full(16, i, dtype=np.int32)
+            writer.set(row, region[i])
+            expected[i] = i
+            #the buffer keeps its own copy
+            row[:] = -1
+        #overlapping write, the later one wins
+        writer.set(np.full((2, 16), 100, dtype=np.int32), region[30:32])
+        expected[30:32] = 100
+        assert len(writer) == 33
+
+        #reads of buffered data flush and wait first
+        assert np.array_equal(obj.get_data(region[:32]).wait(), expected[:32])
+        assert len(writer) == 0
+        assert writer.transfers == 1
+        
+        writer.set(np.ones(16, dtype=np.int32), region[40])
+        expected[40] = 1
+    assert writer.writes == 34
+    assert writer.transfers == 2
+    assert np.array_equal(obj.get_data().wait(), expected)
+
+    small = obj.buffered_writer(max_bytes=2 * 16 * 4)
+    small.set(np.zeros(16, dtype=np.int32), region[0])
+    small.set(np.zeros(16, dtype=np.int32), region[1])
+    assert len(small) == 0
+    small.wait()
+
+    with pytest.raises(ValueError):
+        small.set(np.zeros(3, dtype=np.int32), region[0])
+
+def test_buffer_pool():
+    cont = pdc.Container('bufferpoolcont', lifetime=pdc.Container.Lifetime.TRANSIENT)
+    data = np.arange(64, dtype=np.double).reshape(8, 8)
+    obj = cont.object_from_array('bufferpoolobj', data)
+    pool = pdc.BufferPool()
+
+    results = []
+    for i in range(8):
+        with obj.get_data(region[i], pool=pool) as request:
+            assert np.array_equal(request.wait(), data[i:i+1])
+            results.append(id(request.result))
+        assert request.result is None
+    assert pool.allocations == 1
+    assert pool.allocations_avoided == 7
+    assert len(set(results)) == 1
+
+    request = obj.get_data(region[:2], pool=pool)
+    request.release()
+    assert len(pool) == 2
+
+    small = pdc.BufferPool(max_bytes=8 * 8)
+    small.release(np.empty(8))
+    small.release(np.empty(8))
+    assert len(small) == 1
+
+    with pytest.raises(ValueError):
+        obj.get_data(region[::2], pool=pool)